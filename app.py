@@ -1,19 +1,34 @@
-from insurancePrice.logger import logging
+from insurancePrice.utils.serving_utils import StartupTracker
+
+# Created first so the import time of everything below is part of the startup breakdown
+startup_tracker = StartupTracker()
+
+from insurancePrice.logger import logging, logging_pipeline, request_id_var
+import asyncio
+import json
+import os
 import sys
+import time
+import uuid
 from insurancePrice.exception import InsuranceException
 
 from fastapi import FastAPI, Request
-from typing import Optional
 from uvicorn import run as app_run
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from insurancePrice.utils.main_utils import MainUtils
 
-from insurancePrice.components.model_predictor import CostPredictor, insuranceData
-from insurancePrice.constants import APP_HOST, APP_PORT
-from insurancePrice.pipeline.training_pipeline import TrainPipeline
+from insurancePrice.components.model_cache import model_cache
+from insurancePrice.components.model_predictor import (CostPredictor, EncodedBatch, RequestValidationError,
+                                                       insuranceArrowData, insuranceRequestDecoder)
+from insurancePrice.components.prediction_batcher import PredictionBatcher
+from insurancePrice.constants import (APP_HOST, APP_PORT, ARROW_STREAM_MEDIA_TYPE, MICRO_BATCH_ENABLED, PRELOAD_MODEL,
+                                      SERVING_WORKERS)
+from insurancePrice.pipeline.training_job_runner import TrainingJobRunner
+from insurancePrice.utils.prefork_server import PreforkServer
+from insurancePrice.utils.serving_utils import (EventLoopLagMonitor, InferenceExecutor, get_child_pids,
+                                                get_process_memory, limit_inference_threads)
 
 
 app = FastAPI()
@@ -22,6 +37,31 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 templates = Jinja2Templates(directory="templates")
 
+# Built once per process, the model is shared through the process wide model cache
+cost_predictor = CostPredictor(cache=model_cache)
+
+# New model versions are warmed by the watcher before they are swapped in
+model_cache.warm_up_fn = cost_predictor.warm_up_model
+
+# Blocking inference and I/O runs in a bounded thread pool, never on the event loop
+limit_inference_threads()
+inference_executor = InferenceExecutor()
+loop_lag_monitor = EventLoopLagMonitor()
+
+# Training runs in its own worker process with a run isolated artifacts directory
+training_job_runner = TrainingJobRunner()
+
+# Parses and checks request fields against the schema file, read once per process
+request_decoder = insuranceRequestDecoder()
+
+# Coalesces concurrent single row predictions into one model call
+prediction_batcher = PredictionBatcher(
+    predict_fn=cost_predictor.predict_encoded_batch, executor=inference_executor, collate_fn=EncodedBatch.concat
+)
+
+
+startup_tracker.record("imports_seconds", time.perf_counter() - startup_tracker.created_at)
+
 
 origins = ["*"]
 
@@ -34,27 +74,88 @@ app.add_middleware(
 )
 
 
+def preload_model_in_master():
+    # Pre-fork mode: loaded and warmed once, the workers inherit the ready model
+    try:
+        for stage, seconds in cost_predictor.warm_up().items():
+            startup_tracker.record(stage, seconds)
+        startup_tracker.mark_ready()
+
+    except Exception as e:
+        startup_tracker.mark_failed(e)
+
+
+async def preload_model():
+    try:
+        timings = await inference_executor.run(cost_predictor.warm_up)
+        for stage, seconds in timings.items():
+            startup_tracker.record(stage, seconds)
+        startup_tracker.mark_ready()
+
+    except Exception as e:
+        # requests still load the model lazily, /ready keeps reporting the error
+        startup_tracker.mark_failed(e)
+
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    # Every log record written while handling the request carries its id
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["x-request-id"] = request_id
+    return response
+
+
+@app.on_event("startup")
+async def startup_event():
+    loop_lag_monitor.start()
+    if MICRO_BATCH_ENABLED:
+        await prediction_batcher.start()
+
+    # Loading in the background so /health answers while the model is fetched,
+    # pre-fork workers inherit the model the master already warmed
+    if not startup_tracker.ready:
+        if PRELOAD_MODEL:
+            app.state.preload_task = asyncio.get_running_loop().create_task(preload_model())
+        else:
+            startup_tracker.mark_ready()
+    model_cache.start_watcher()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    model_cache.stop_watcher()
+    await prediction_batcher.stop()
+    await loop_lag_monitor.stop()
+    inference_executor.shutdown()
+    training_job_runner.shutdown()
+
+
+def validation_error_response(e: ValueError) -> JSONResponse:
+    content = {"status": False, "error": f"{e}"}
+    if isinstance(e, RequestValidationError):
+        content["errors"] = e.errors
+    return JSONResponse(content, status_code=422)
+
+
+
 """
-Data Form
+health routes
 """
-class DataForm:
-    def __init__(self, request: Request):
-        self.request: Request = request
-        self.age: Optional[str] = None
-        self.sex: Optional[str] = None
-        self.bmi: Optional[str] = None
-        self.children: Optional[str] = None
-        self.smoker: Optional[str] = None
-        self.region: Optional[str] = None
-
-    async def get_shipping_data(self):
-        form = await self.request.form()
-        self.age = form.get("age")
-        self.sex = form.get("sex")
-        self.bmi = form.get("bmi")
-        self.children = form.get("children")
-        self.smoker = form.get("smoker")
-        self.region = form.get("region")
+
+@app.get("/health")
+async def healthRouteClient():
+    return {"status": True}
+
+
+@app.get("/ready")
+async def readyRouteClient():
+    startup = startup_tracker.snapshot()
+    return JSONResponse(startup, status_code=200 if startup["ready"] else 503)
 
 
 
@@ -63,17 +164,42 @@ train route
 """
 
 @app.get("/train")
+@app.post("/train")
 async def trainRouteClient():
     try:
-        train_pipeline = TrainPipeline()
+        training_job = await asyncio.get_running_loop().run_in_executor(None, training_job_runner.submit)
 
-        train_pipeline.run_pipeline()
+        return JSONResponse(training_job.to_dict(), status_code=202)
 
-        return Response("Training successful !!")
+    except RuntimeError as e:
+        return JSONResponse({"status": False, "error": f"{e}"}, status_code=409)
 
     except Exception as e:
         return Response(f"Error Occurred! {e}")
-    
+
+
+@app.get("/train/jobs")
+async def trainJobsRouteClient():
+    return [training_job.to_dict() for training_job in training_job_runner.list()]
+
+
+@app.get("/train/jobs/{job_id}")
+async def trainJobStatusRouteClient(job_id: str):
+    training_job = training_job_runner.get(job_id)
+    if training_job is None:
+        return JSONResponse({"status": False, "error": f"Unknown training job {job_id}"}, status_code=404)
+
+    return training_job.to_dict()
+
+
+@app.delete("/train/jobs/{job_id}")
+async def trainJobCancelRouteClient(job_id: str):
+    training_job = await asyncio.get_running_loop().run_in_executor(None, training_job_runner.cancel, job_id)
+    if training_job is None:
+        return JSONResponse({"status": False, "error": f"Unknown training job {job_id}"}, status_code=404)
+
+    return training_job.to_dict()
+
 
 
 @app.get("/predict")
@@ -94,31 +220,125 @@ async def predictGetRouteClient(request: Request):
 async def predictRouteClient(request: Request):
     try:
 
-        form = DataForm(request)
-        await form.get_shipping_data()
-
-        shipping_data = insuranceData(
-            age=form.age,
-            sex=form.sex,
-            bmi=form.bmi,
-            children=form.children,
-            smoker=form.smoker,
-            region=form.region,   
-        )
+        form = await request.form()
+        batch = request_decoder.decode_record(form)
 
-        cost_df = shipping_data.get_input_data_frame()
-        cost_predictor = CostPredictor()
-        cost_value = round(cost_predictor.predict(X=cost_df)[0], 2)
+        if MICRO_BATCH_ENABLED:
+            cost_value = round(await prediction_batcher.predict(batch), 2)
+        else:
+            cost_value = round(float((await inference_executor.run(cost_predictor.predict_encoded_batch, batch))[0]), 2)
 
         return templates.TemplateResponse(
             "index.html",
             {"request": request, "context": cost_value},
         )
 
+    except RequestValidationError as e:
+        return validation_error_response(e)
 
     except Exception as e:
         return {"status": False, "error": f"{e}"}
 
 
+"""
+batch predict route
+"""
+
+def predict_batch_body(body: bytes, is_ndjson: bool):
+    # NDJSON bodies carry one record per line, JSON bodies carry a list or {"records": [...]}
+    if is_ndjson:
+        records = [json.loads(line) for line in body.splitlines() if line.strip()]
+    else:
+        payload = json.loads(body)
+        records = payload.get("records") if isinstance(payload, dict) else payload
+
+    batch = request_decoder.decode_records(records)
+    return cost_predictor.predict_encoded_batch(batch).round(2)
+
+
+@app.post("/predict/batch")
+async def predictBatchRouteClient(request: Request):
+    try:
+        body = await request.body()
+        is_ndjson = "ndjson" in request.headers.get("content-type", "")
+
+        cost_values = await inference_executor.run(predict_batch_body, body, is_ndjson)
+
+        return {"status": True, "count": len(cost_values), "predictions": cost_values.tolist()}
+
+    except ValueError as e:
+        return validation_error_response(e)
+
+    except Exception as e:
+        return {"status": False, "error": f"{e}"}
+
+
+def predict_arrow_body(body: bytes, content_type: str) -> bytes:
+    # Categorical columns go from the Arrow dictionaries to category codes without Python strings per row
+    batch = request_decoder.check_batch(insuranceArrowData(body, content_type).get_encoded_batch())
+    return insuranceArrowData.to_ipc_stream(cost_predictor.predict_encoded_batch(batch).round(2))
+
+
+@app.post("/predict/arrow")
+async def predictArrowRouteClient(request: Request):
+    try:
+        body = await request.body()
+        content_type = request.headers.get("content-type", "")
+
+        predictions = await inference_executor.run(predict_arrow_body, body, content_type)
+
+        return Response(predictions, media_type=ARROW_STREAM_MEDIA_TYPE)
+
+    except ImportError as e:
+        return JSONResponse({"status": False, "error": f"Arrow bodies need pyarrow: {e}"}, status_code=501)
+
+    except ValueError as e:
+        return validation_error_response(e)
+
+    except Exception as e:
+        return {"status": False, "error": f"{e}"}
+
+
+@app.get("/model")
+async def modelRouteClient():
+    return model_cache.snapshot()
+
+
+@app.get("/metrics/memory")
+async def memoryMetricsRouteClient():
+    # In pre-fork mode every worker is a child of the master, reported next to each other
+    if SERVING_WORKERS > 1:
+        master_pid = os.getppid()
+        pids = [master_pid] + get_child_pids(master_pid)
+    else:
+        pids = [os.getpid()]
+    return {"pid": os.getpid(), "processes": [get_process_memory(pid) for pid in pids]}
+
+
+@app.get("/metrics/logging")
+async def loggingMetricsRouteClient():
+    return logging_pipeline.stats()
+
+
+@app.get("/metrics/batching")
+async def batchingMetricsRouteClient():
+    return prediction_batcher.metrics.snapshot()
+
+
+@app.get("/metrics/loop")
+async def loopMetricsRouteClient():
+    return loop_lag_monitor.snapshot()
+
+
 if __name__ == "__main__":
-    app_run(app, host=APP_HOST, port=APP_PORT)
+    if SERVING_WORKERS > 1:
+        PreforkServer(
+            app,
+            host=APP_HOST,
+            port=APP_PORT,
+            workers=SERVING_WORKERS,
+            preload_fn=preload_model_in_master if PRELOAD_MODEL else None,
+            post_fork_fn=model_cache.reset_after_fork,
+        ).run()
+    else:
+        app_run(app, host=APP_HOST, port=APP_PORT)
@@ -0,0 +1,104 @@
+"""
+Body size and scoring time of a large batch sent as JSON to /predict/batch
+against Arrow IPC (dictionary encoded categoricals) and Parquet sent to
+/predict/arrow. Times cover decoding, scoring and encoding the response.
+
+    python benchmarks/arrow_batch.py --model-path artifacts/<run>/ModelTrainerArtifacts/insurance_price_model.pkl
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from app import predict_arrow_body, predict_batch_body
+from insurancePrice.components.model_cache import ServedModel, model_cache
+from insurancePrice.components.tree_ensemble import FlatCostModel
+from insurancePrice.constants import ARROW_STREAM_MEDIA_TYPE, TARGET_COLUMN
+from insurancePrice.utils.main_utils import MainUtils
+
+
+def to_arrow_table(X):
+    table = pa.Table.from_pandas(X, preserve_index=False)
+    for column in X.select_dtypes(exclude="number").columns:
+        table = table.set_column(table.column_names.index(column), column, pc.dictionary_encode(table.column(column)))
+    return table
+
+
+def to_ipc_stream(table):
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def to_parquet(table):
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    return buffer.getvalue()
+
+
+def best_seconds(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", required=True, help="Local CostModel pickle")
+    parser.add_argument("--data-path", default="data/insurance.csv")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--backend", default="pickle", choices=["pickle", "flat"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    model = MainUtils.load_object(args.model_path)
+    if args.backend == "flat":
+        model = FlatCostModel.from_cost_model(model)
+    elif not model.is_compiled:
+        model.compile()
+    model_cache._served = ServedModel(model=model, version="benchmark")
+
+    data = pd.read_csv(args.data_path).drop(columns=[TARGET_COLUMN])
+    X = data.sample(args.rows, replace=True, random_state=0).reset_index(drop=True)
+    table = to_arrow_table(X)
+    bodies = {
+        "json": json.dumps(X.to_dict(orient="records")).encode(),
+        "arrow_ipc": to_ipc_stream(table),
+        "parquet": to_parquet(table),
+    }
+
+    report = {"model": repr(model), "rows": args.rows, "formats": {}}
+    predictions = {}
+    for name, body in bodies.items():
+        if name == "json":
+            seconds, result = best_seconds(lambda: predict_batch_body(body, False), args.repeat)
+            predictions[name] = np.asarray(result)
+        else:
+            content_type = ARROW_STREAM_MEDIA_TYPE if name == "arrow_ipc" else "application/vnd.apache.parquet"
+            seconds, result = best_seconds(lambda: predict_arrow_body(body, content_type), args.repeat)
+            predictions[name] = pa.ipc.open_stream(result).read_all().column("prediction").to_numpy()
+        report["formats"][name] = {"body_bytes": len(body), "seconds": seconds, "rows_per_second": args.rows / seconds}
+
+    report["max_abs_diff_to_json"] = {
+        name: float(np.max(np.abs(values - predictions["json"]))) for name, values in predictions.items()
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+XGBoost on the one-hot columns (onehot preprocessing profile) against native
+categorical splits on category codes (categorical profile): training time,
+model size, test R2 and inference latency of the compiled CostModel of each.
+
+    python benchmarks/categorical_encoding.py
+    python benchmarks/categorical_encoding.py --repeat-data 20 --n-estimators 300 --batch-sizes 1,256,4096
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import dill
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.compose import ColumnTransformer
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from insurancePrice.components.model_predictor import read_schema_config
+from insurancePrice.components.model_trainer import CostModel
+from insurancePrice.constants import TARGET_COLUMN, TEST_SIZE
+from insurancePrice.utils.main_utils import MainUtils
+
+
+def build_preprocessor(profile, schema_config):
+    # Same blocks as DataTransformation.get_data_transformer_object
+    if profile == "categorical":
+        encoder = ("OrdinalEncoder", OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=np.nan))
+    else:
+        encoder = ("OneHotEncoder", OneHotEncoder(handle_unknown="ignore"))
+    return ColumnTransformer([
+        (*encoder, schema_config["categorical_columns"]),
+        ("StandardScaler", StandardScaler(), schema_config["numerical_columns"]),
+    ])
+
+
+def time_calls(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1000
+    return float(np.median(timings)), float(np.percentile(timings, 95))
+
+
+def time_per_row(fn, records, repeat):
+    timings = []
+    for _ in range(repeat):
+        for record in records:
+            started = time.perf_counter()
+            fn(record)
+            timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1e6
+    return {"p50_us": float(np.percentile(timings, 50)), "p95_us": float(np.percentile(timings, 95))}
+
+
+def measure_profile(profile, X_train, y_train, X_test, y_test, params, args):
+    schema_config = read_schema_config()
+    preprocessor = build_preprocessor(profile, schema_config)
+    x_train = preprocessor.fit_transform(X_train)
+    model_params = {**params, **MainUtils.get_profile_params(profile, schema_config)}
+
+    fit_seconds, model = [], None
+    for _ in range(args.fit_repeat):
+        model = MainUtils.get_base_model("XGBRegressor").set_params(**model_params)
+        started = time.perf_counter()
+        model.fit(x_train, y_train)
+        fit_seconds.append(time.perf_counter() - started)
+
+    cost_model = CostModel(preprocessor, model).compile()
+    max_diff = cost_model.verify_compiled(X_test)
+    booster = model.get_booster()
+    report = {
+        "n_features": int(x_train.shape[1]),
+        "fit_seconds_median": float(np.median(fit_seconds)),
+        "fit_seconds_min": float(np.min(fit_seconds)),
+        "test_r2": MainUtils.get_model_score(y_test, cost_model.predict(X_test)),
+        "compiled": cost_model.is_compiled,
+        "max_abs_compiled_diff": max_diff,
+        "n_trees": len(booster.get_dump()),
+        "n_nodes": int(len(booster.trees_to_dataframe())),
+        "booster_bytes": len(booster.save_raw(raw_format="ubj")),
+        "cost_model_pickle_bytes": len(dill.dumps(cost_model)),
+        "latency": {},
+    }
+
+    records = X_test.head(args.rows).to_dict(orient="records")
+    cost_model.predict_record(records[0])
+    report["latency"]["predict_record"] = time_per_row(cost_model.predict_record, records, args.repeat)
+    for batch_size in args.batch_sizes:
+        X = pd.concat([X_test] * (batch_size // len(X_test) + 1), ignore_index=True).head(batch_size)
+        Xt = cost_model.transform(X)
+        repeat = max(3, min(args.repeat * 100, 100000 // batch_size))
+        cost_model.predict(X)
+        model_ms, model_p95_ms = time_calls(lambda: model.predict(Xt), repeat)
+        total_ms, total_p95_ms = time_calls(lambda: cost_model.predict(X), repeat)
+        report["latency"][f"batch_{batch_size}"] = {
+            "model_ms": model_ms,
+            "model_p95_ms": model_p95_ms,
+            "total_ms": total_ms,
+            "total_p95_ms": total_p95_ms,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-path", default="data/insurance.csv")
+    parser.add_argument("--repeat-data", type=int, default=1, help="Copies of the data set, to time larger fits")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=4)
+    parser.add_argument("--learning-rate", type=float, default=0.1)
+    parser.add_argument("--n-jobs", type=int, default=1)
+    parser.add_argument("--fit-repeat", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=200, help="Rows timed one by one with predict_record")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--batch-sizes", type=lambda value: [int(size) for size in value.split(",")],
+                        default=[1, 64, 1024])
+    args = parser.parse_args()
+
+    data = pd.concat([pd.read_csv(args.data_path)] * args.repeat_data, ignore_index=True)
+    X, y = data.drop(columns=[TARGET_COLUMN]), data[TARGET_COLUMN]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=0)
+    params = {
+        "n_estimators": args.n_estimators,
+        "max_depth": args.max_depth,
+        "learning_rate": args.learning_rate,
+        "n_jobs": args.n_jobs,
+        "tree_method": "hist",
+    }
+
+    report = {"train_rows": len(X_train), "params": params, "profiles": {}}
+    for profile in ("onehot", "categorical"):
+        report["profiles"][profile] = measure_profile(profile, X_train, y_train, X_test, y_test, params, args)
+
+    onehot, categorical = report["profiles"]["onehot"], report["profiles"]["categorical"]
+    report["categorical_vs_onehot"] = {
+        "fit_seconds_ratio": categorical["fit_seconds_median"] / onehot["fit_seconds_median"],
+        "booster_bytes_ratio": categorical["booster_bytes"] / onehot["booster_bytes"],
+        "n_nodes_ratio": categorical["n_nodes"] / onehot["n_nodes"],
+        "test_r2_diff": categorical["test_r2"] - onehot["test_r2"],
+        "predict_record_p50_ratio": (
+            categorical["latency"]["predict_record"]["p50_us"] / onehot["latency"]["predict_record"]["p50_us"]
+        ),
+        **{
+            f"batch_{batch_size}_total_ratio": (
+                categorical["latency"][f"batch_{batch_size}"]["total_ms"]
+                / onehot["latency"][f"batch_{batch_size}"]["total_ms"]
+            )
+            for batch_size in args.batch_sizes
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Per row latency of the sklearn ColumnTransformer path against the compiled
+CostModel path.
+
+    python benchmarks/compiled_cost_model.py --model-path artifacts/<run>/ModelTrainerArtifacts/insurance_price_model.pkl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insurancePrice.constants import TARGET_COLUMN
+from insurancePrice.utils.main_utils import MainUtils
+
+
+def time_per_row(fn, records, repeat):
+    timings = []
+    for _ in range(repeat):
+        for record in records:
+            started = time.perf_counter()
+            fn(record)
+            timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1e6
+    return {
+        "mean_us": float(timings.mean()),
+        "p50_us": float(np.percentile(timings, 50)),
+        "p95_us": float(np.percentile(timings, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", required=True, help="Local CostModel pickle")
+    parser.add_argument("--data-path", default="data/insurance.csv")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cost_model = MainUtils.load_object(args.model_path)
+    if not cost_model.is_compiled:
+        cost_model.compile()
+
+    X = pd.read_csv(args.data_path).drop(columns=[TARGET_COLUMN]).head(args.rows)
+    records = X.to_dict(orient="records")
+
+    preprocessor, regressor = cost_model.preprocessing_object, cost_model.trained_model_object
+    max_diff = cost_model.verify_compiled(X)
+
+    def sklearn_path(record):
+        return regressor.predict(preprocessor.transform(pd.DataFrame([record])))[0]
+
+    def compiled_path(record):
+        return regressor.predict(cost_model.compiled_preprocessor.transform_record(record))[0]
+
+    def sklearn_transform(record):
+        return preprocessor.transform(pd.DataFrame([record]))
+
+    def compiled_transform(record):
+        return cost_model.compiled_preprocessor.transform_record(record)
+
+    report = {
+        "model": repr(cost_model),
+        "rows": len(records),
+        "max_abs_prediction_diff": max_diff,
+        "transform": {
+            "sklearn": time_per_row(sklearn_transform, records, args.repeat),
+            "compiled": time_per_row(compiled_transform, records, args.repeat),
+        },
+        "predict": {
+            "sklearn": time_per_row(sklearn_path, records, args.repeat),
+            "compiled": time_per_row(compiled_path, records, args.repeat),
+        },
+    }
+    report["predict"]["speedup_p50"] = report["predict"]["sklearn"]["p50_us"] / report["predict"]["compiled"]["p50_us"]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Latency and artifact size of the flat array tree ensemble against the
+pickled CostModel it was exported from.
+
+    python benchmarks/flat_tree_ensemble.py --model-path artifacts/<run>/ModelTrainerArtifacts/insurance_price_model.pkl
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insurancePrice.components.tree_ensemble import FlatCostModel
+from insurancePrice.constants import TARGET_COLUMN
+from insurancePrice.utils.main_utils import MainUtils
+
+
+def time_per_row(fn, records, repeat):
+    timings = []
+    for _ in range(repeat):
+        for record in records:
+            started = time.perf_counter()
+            fn(record)
+            timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1e6
+    return {
+        "mean_us": float(timings.mean()),
+        "p50_us": float(np.percentile(timings, 50)),
+        "p95_us": float(np.percentile(timings, 95)),
+    }
+
+
+def time_batch(fn, X, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - started)
+    return {"best_ms": 1000 * min(timings), "rows_per_second": len(X) / min(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", required=True, help="Local CostModel pickle")
+    parser.add_argument("--data-path", default="data/insurance.csv")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--batch-rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cost_model = MainUtils.load_object(args.model_path)
+    flat_model = FlatCostModel.from_cost_model(cost_model)
+
+    data = pd.read_csv(args.data_path).drop(columns=[TARGET_COLUMN])
+    X = data.head(args.rows)
+    batch = data.sample(args.batch_rows, replace=True, random_state=0).reset_index(drop=True)
+    records = X.to_dict(orient="records")
+
+    report = {
+        "model": repr(cost_model),
+        "trees": flat_model.ensemble.n_trees,
+        "nodes": flat_model.ensemble.n_nodes,
+        "max_depth": flat_model.ensemble.max_depth,
+        "max_abs_prediction_diff": float(np.max(np.abs(flat_model.predict(data) - cost_model.predict(data)))),
+        "artifact_bytes": {
+            "pickle": len(pickle.dumps(cost_model)),
+            "flat": len(flat_model.to_bytes()),
+        },
+        "predict_record": {
+            "cost_model": time_per_row(cost_model.predict_record, records, args.repeat),
+            "flat": time_per_row(flat_model.predict_record, records, args.repeat),
+        },
+        "predict_batch": {
+            "cost_model": time_batch(cost_model.predict, batch, args.repeat),
+            "flat": time_batch(flat_model.predict, batch, args.repeat),
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Serving cost of the model.yaml candidates: CostModel.predict timed at every
+batch size, thread count and preprocessor (sklearn ColumnTransformer or the
+compiled form), split into preprocessing and model time.
+
+Candidates are trained here from the grids of config/model.yaml. Only the
+--vary parameters span their grid, the others keep their first value;
+--vary all trains the full grid. --model-path times trained artifacts instead.
+
+Results are written as one JSON file per run to --output-dir, named after the
+package version and git commit, with one flat row per measurement so runs of
+different releases can be concatenated and trended.
+
+    python benchmarks/inference_matrix.py --threads 1,4
+    python benchmarks/inference_matrix.py --model-path artifacts/<run>/ModelTrainerArtifacts/insurance_price_model.pkl
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from importlib import metadata
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from sklearn.compose import ColumnTransformer
+from sklearn.model_selection import ParameterGrid
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from threadpoolctl import threadpool_limits
+
+from insurancePrice.components.model_predictor import read_schema_config
+from insurancePrice.components.model_trainer import CostModel
+from insurancePrice.constants import MODEL_CONFIG_FILE, TARGET_COLUMN
+from insurancePrice.utils.main_utils import MainUtils
+from insurancePrice.utils.serving_utils import configure_inference_threads
+
+# Bumped when the layout of the rows changes
+RESULTS_SCHEMA_VERSION = 1
+
+
+def build_preprocessor():
+    schema_config = read_schema_config()
+    return ColumnTransformer([
+        ("OneHotEncoder", OneHotEncoder(handle_unknown="ignore"), schema_config["categorical_columns"]),
+        ("StandardScaler", StandardScaler(), schema_config["numerical_columns"]),
+    ])
+
+
+def train_candidates(X, y, models, vary):
+    model_config = MainUtils().read_yaml_file(filename=MODEL_CONFIG_FILE)
+    for model_name, param_grid in model_config["train_model"].items():
+        if models and model_name not in models:
+            continue
+        grid = {name: values if vary == ["all"] or name in vary else values[:1] for name, values in param_grid.items()}
+        for params in ParameterGrid(grid):
+            candidate = {"model": model_name, "params": params}
+            try:
+                preprocessor = build_preprocessor()
+                regressor = MainUtils.get_base_model(model_name)
+                regressor.set_params(**params)
+                started = time.perf_counter()
+                regressor.fit(preprocessor.fit_transform(X), y)
+                candidate["train_seconds"] = time.perf_counter() - started
+                yield candidate, CostModel(preprocessor, regressor)
+            except Exception as e:
+                # e.g. max_features "auto", removed from recent scikit-learn
+                candidate["error"] = str(e)
+                yield candidate, None
+
+
+def load_candidates(model_paths):
+    for model_path in model_paths:
+        cost_model = MainUtils.load_object(model_path)
+        regressor = cost_model.trained_model_object
+        params = {name: regressor.get_params().get(name) for name in ("n_estimators", "max_depth", "learning_rate")}
+        yield {"model": type(regressor).__name__, "params": params, "model_path": model_path}, cost_model
+
+
+def time_calls(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1000
+    return float(np.median(timings)), float(np.percentile(timings, 95))
+
+
+def measure(cost_model, batches, preprocessors, thread_counts, max_repeat):
+    rows = []
+    for preprocessor in preprocessors:
+        if preprocessor == "compiled":
+            cost_model.compile()
+        else:
+            cost_model.compiled_preprocessor = None
+
+        for n_threads in thread_counts:
+            configure_inference_threads(cost_model, n_threads)
+            with threadpool_limits(limits=n_threads):
+                for batch_size, X in batches.items():
+                    repeat = max(3, min(max_repeat, 100000 // batch_size))
+                    Xt = cost_model.transform(X)
+                    # Warm-up call, the first call allocates the thread pools
+                    cost_model.predict(X)
+                    preprocess_ms, preprocess_p95_ms = time_calls(lambda: cost_model.transform(X), repeat)
+                    model_ms, model_p95_ms = time_calls(lambda: cost_model.trained_model_object.predict(Xt), repeat)
+                    total_ms, total_p95_ms = time_calls(lambda: cost_model.predict(X), repeat)
+                    rows.append({
+                        "preprocessor": preprocessor,
+                        "threads": n_threads,
+                        "batch_size": batch_size,
+                        "repeat": repeat,
+                        "preprocess_ms": preprocess_ms,
+                        "preprocess_p95_ms": preprocess_p95_ms,
+                        "model_ms": model_ms,
+                        "model_p95_ms": model_p95_ms,
+                        "total_ms": total_ms,
+                        "total_p95_ms": total_p95_ms,
+                        "rows_per_second": batch_size / (total_ms / 1000),
+                    })
+    return rows
+
+
+def get_versions():
+    versions = {"python": platform.python_version()}
+    for package in ("insurancePrice_e2e", "numpy", "pandas", "scikit-learn", "xgboost"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        versions["git_commit"] = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        versions["git_commit"] = None
+    return versions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", action="append", help="Trained CostModel pickle, repeatable")
+    parser.add_argument("--data-path", default="data/insurance.csv")
+    parser.add_argument("--models", default="", help="Comma separated model.yaml entries, all by default")
+    parser.add_argument("--vary", default="max_depth,n_estimators",
+                        help="Grid parameters spanned, 'all' for the full grid")
+    parser.add_argument("--batch-sizes", default="1,8,64,1000,100000")
+    parser.add_argument("--threads", default="1,2,4")
+    parser.add_argument("--preprocessors", default="sklearn,compiled")
+    parser.add_argument("--max-repeat", type=int, default=200, help="Calls timed per small batch")
+    parser.add_argument("--output-dir", default=os.path.join("benchmarks", "results"))
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data_path)
+    X, y = data.drop(columns=[TARGET_COLUMN]), data[TARGET_COLUMN]
+    batches = {
+        int(size): X.sample(int(size), replace=True, random_state=0).reset_index(drop=True)
+        for size in args.batch_sizes.split(",")
+    }
+    candidates = (
+        load_candidates(args.model_path)
+        if args.model_path
+        else train_candidates(X, y, [name for name in args.models.split(",") if name], args.vary.split(","))
+    )
+
+    versions = get_versions()
+    report = {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "benchmark": "inference_matrix",
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "versions": versions,
+        "cpu_count": os.cpu_count(),
+        "machine": platform.machine(),
+        "candidates": [],
+        "rows": [],
+    }
+    for index, (candidate, cost_model) in enumerate(candidates):
+        candidate["candidate"] = index
+        report["candidates"].append(candidate)
+        if cost_model is None:
+            continue
+        for row in measure(cost_model, batches, args.preprocessors.split(","), [int(n) for n in args.threads.split(",")],
+                           args.max_repeat):
+            report["rows"].append({"candidate": index, "model": candidate["model"], **candidate["params"], **row})
+        print(f"{candidate['model']} {candidate['params']} done", file=sys.stderr, flush=True)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(
+        args.output_dir,
+        f"inference_matrix_{versions['insurancePrice_e2e'] or 'dev'}_{versions['git_commit'] or 'nogit'}"
+        f"_{time.strftime('%Y%m%d_%H%M%S')}.json",
+    )
+    with open(output_path, "w") as file_obj:
+        json.dump(report, file_obj, indent=2)
+
+    summary = pd.DataFrame(report["rows"])
+    if len(summary):
+        print(summary.pivot_table(
+            index=["candidate", "model", "preprocessor", "threads"], columns="batch_size", values="total_ms"
+        ).round(3).to_string())
+    print(json.dumps({"output": output_path, "candidates": len(report["candidates"]), "rows": len(report["rows"])}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Requests per second of POST /predict/batch with logging off, with the
+previous synchronous text file handler and with the queue backed, sampled
+JSON pipeline.
+
+    python benchmarks/logging_throughput.py --model-path artifacts/<run>/ModelTrainerArtifacts/insurance_price_model.pkl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from app import app
+from insurancePrice.components.model_cache import ServedModel, model_cache
+from insurancePrice.components.tree_ensemble import FlatCostModel
+from insurancePrice.constants import TARGET_COLUMN
+from insurancePrice.logger import logging_pipeline
+from insurancePrice.utils.main_utils import MainUtils
+
+
+def configure_mode(mode, log_file_path):
+    logging.disable(logging.NOTSET)
+    if mode == "off":
+        logging.disable(logging.CRITICAL)
+    elif mode == "sync":
+        logging_pipeline.configure(log_file_path, log_format="text", use_queue=False, sample_rates={}, rate_limits={})
+    else:
+        logging_pipeline.configure(log_file_path, log_format="json", use_queue=True)
+
+
+async def run_load(bodies, requests, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        sent = 0
+
+        async def worker():
+            nonlocal sent
+            while sent < requests:
+                body = bodies[sent % len(bodies)]
+                sent += 1
+                response = await client.post("/predict/batch", content=body, headers={"content-type": "application/json"})
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", required=True, help="Local CostModel pickle")
+    parser.add_argument("--data-path", default="data/insurance.csv")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--modes", default="off,sync,async")
+    parser.add_argument("--backend", default="flat", choices=["pickle", "flat"],
+                        help="flat keeps model time small so the logging cost is visible")
+    args = parser.parse_args()
+
+    # Served straight from the local pickle, no s3 access
+    model = MainUtils.load_object(args.model_path)
+    if args.backend == "flat":
+        model = FlatCostModel.from_cost_model(model)
+    model_cache._served = ServedModel(model=model, version="benchmark")
+    model_cache.revalidate_seconds = 0
+
+    data = pd.read_csv(args.data_path).drop(columns=[TARGET_COLUMN])
+    bodies = [json.dumps([record]) for record in data.to_dict(orient="records")]
+
+    report = {"backend": args.backend, "requests": args.requests, "concurrency": args.concurrency, "modes": {}}
+    with tempfile.TemporaryDirectory() as log_dir:
+        for mode in args.modes.split(","):
+            log_file_path = os.path.join(log_dir, f"{mode}.log")
+            configure_mode(mode, log_file_path)
+            asyncio.run(run_load(bodies, args.concurrency, args.concurrency))
+            seconds = asyncio.run(run_load(bodies, args.requests, args.concurrency))
+            logging_pipeline.stop()
+            report["modes"][mode] = {
+                "requests_per_second": args.requests / seconds,
+                "log_bytes": os.path.getsize(log_file_path) if os.path.exists(log_file_path) else 0,
+                "logging": logging_pipeline.stats(),
+            }
+
+    logging.disable(logging.NOTSET)
+    logging_pipeline.configure()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Size and load time of the model bundle against the dill pickled CostModel.
+
+Cold load is measured in a fresh interpreter (imports included) up to the
+first prediction, warm load in this process from bytes already in memory.
+
+    python benchmarks/model_bundle.py --model-path artifacts/<run>/ModelTrainerArtifacts/insurance_price_model.pkl
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from insurancePrice.components.model_bundle import ModelBundle
+from insurancePrice.components.tree_ensemble import FlatCostModel
+from insurancePrice.constants import TARGET_COLUMN
+from insurancePrice.utils.main_utils import MainUtils
+
+COLD_LOAD = {
+    "pickle": "import dill\nmodel = dill.load(open(path, 'rb'))",
+    "bundle": (
+        "from insurancePrice.components.model_bundle import ModelBundle\n"
+        "model = ModelBundle.unpack(open(path, 'rb').read(), unpack_dir).load_flat_model()"
+    ),
+}
+COLD_LOAD_SCRIPT = """
+import sys, time, tempfile
+started = time.perf_counter()
+sys.path.insert(0, {root_dir!r})
+path, unpack_dir = {path!r}, tempfile.mkdtemp()
+{load}
+loaded = time.perf_counter()
+model.predict_record({record!r})
+print(loaded - started, time.perf_counter() - started)
+"""
+
+
+def cold_load(kind, path, record, repeat):
+    script = COLD_LOAD_SCRIPT.format(root_dir=ROOT_DIR, path=path, load=COLD_LOAD[kind], record=record)
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.split()
+        runs.append([float(value) for value in output[-2:]])
+    load_seconds, first_prediction_seconds = np.min(runs, axis=0)
+    return {"load_ms": 1000 * load_seconds, "first_prediction_ms": 1000 * first_prediction_seconds}
+
+
+def best_ms(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return 1000 * min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", required=True, help="Local CostModel pickle")
+    parser.add_argument("--data-path", default="data/insurance.csv")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    cost_model = MainUtils.load_object(args.model_path)
+    data = pd.read_csv(args.data_path).drop(columns=[TARGET_COLUMN])
+    record = data.iloc[0].to_dict()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        bundle_path = ModelBundle.save(
+            FlatCostModel.from_cost_model(cost_model), os.path.join(work_dir, "model.bundle.tar"), cost_model=cost_model
+        )
+        with open(args.model_path, "rb") as file_obj:
+            pickle_bytes = file_obj.read()
+        with open(bundle_path, "rb") as file_obj:
+            bundle_bytes = file_obj.read()
+
+        bundle = ModelBundle.unpack(bundle_bytes, os.path.join(work_dir, "unpacked"))
+        bundle_model = bundle.load_flat_model()
+        unpack_dirs = iter(range(args.repeat))
+
+        report = {
+            "model": repr(cost_model),
+            "bundle": repr(bundle),
+            "files": {name: entry["bytes"] for name, entry in bundle.manifest["files"].items()},
+            "size_bytes": {"pickle": len(pickle_bytes), "bundle": len(bundle_bytes)},
+            "max_abs_prediction_diff": float(np.max(np.abs(bundle_model.predict(data) - cost_model.predict(data)))),
+            "cold_load": {
+                kind: cold_load(kind, path, record, args.repeat)
+                for kind, path in (("pickle", args.model_path), ("bundle", bundle_path))
+            },
+            "warm_load_ms": {
+                "pickle": best_ms(lambda: MainUtils.load_object(args.model_path), args.repeat),
+                "bundle_unpack": best_ms(
+                    lambda: ModelBundle.unpack(bundle_bytes, os.path.join(work_dir, f"run_{next(unpack_dirs)}")).load_flat_model(),
+                    args.repeat,
+                ),
+                "bundle_open": best_ms(lambda: ModelBundle.open(bundle.directory, verify=False).load_flat_model(), args.repeat),
+                "bundle_open_verified": best_ms(lambda: ModelBundle.open(bundle.directory).load_flat_model(), args.repeat),
+            },
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
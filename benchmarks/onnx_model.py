@@ -0,0 +1,90 @@
+"""
+Equivalence and latency of the onnxruntime backend against the native
+CostModel. Run it on the raw test split to repeat the trainer's check.
+
+    python benchmarks/onnx_model.py --model-path artifacts/<run>/ModelTrainerArtifacts/insurance_price_model.pkl \
+        --data-path artifacts/<run>/DataTransformationArtifacts/test.csv
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insurancePrice.components.onnx_model import OnnxCostModel
+from insurancePrice.constants import ONNX_MODEL_TOLERANCE, TARGET_COLUMN
+from insurancePrice.utils.main_utils import MainUtils
+
+
+def time_per_row(fn, records, repeat):
+    timings = []
+    for _ in range(repeat):
+        for record in records:
+            started = time.perf_counter()
+            fn(record)
+            timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1e6
+    return {
+        "mean_us": float(timings.mean()),
+        "p50_us": float(np.percentile(timings, 50)),
+        "p95_us": float(np.percentile(timings, 95)),
+        "p99_us": float(np.percentile(timings, 99)),
+    }
+
+
+def time_batch(fn, X, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - started)
+    return {"best_ms": 1000 * min(timings), "rows_per_second": len(X) / min(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", required=True, help="Local CostModel pickle")
+    parser.add_argument("--data-path", default="data/insurance.csv")
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--batch-rows", type=int, default=100000)
+    parser.add_argument("--threads", default="1,2,4", help="onnxruntime intra-op thread counts")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cost_model = MainUtils.load_object(args.model_path)
+    data = pd.read_csv(args.data_path)
+    data = data.drop(columns=[TARGET_COLUMN], errors="ignore")
+    onnx_model = OnnxCostModel.from_cost_model(cost_model, columns=list(data.columns))
+
+    expected = np.asarray(cost_model.predict(data), dtype=np.float64)
+    records = data.head(args.rows).to_dict(orient="records")
+    batch = data.sample(args.batch_rows, replace=True, random_state=0).reset_index(drop=True)
+
+    report = {
+        "model": repr(cost_model),
+        "onnx_bytes": len(onnx_model.model_bytes),
+        "equivalence": {
+            "rows": len(data),
+            "rtol": ONNX_MODEL_TOLERANCE,
+            "mismatch_ratio": onnx_model.verify(cost_model, data, rtol=ONNX_MODEL_TOLERANCE),
+            "max_abs_diff": float(np.max(np.abs(onnx_model.predict(data) - expected))),
+        },
+        "predict_record": {"native": time_per_row(cost_model.predict_record, records, args.repeat)},
+        "predict_batch": {"native": time_batch(cost_model.predict, batch, args.repeat)},
+    }
+    for n_threads in (int(value) for value in args.threads.split(",")):
+        threaded_model = OnnxCostModel(onnx_model.model_bytes, n_threads=n_threads)
+        report["predict_record"][f"onnx_{n_threads}_threads"] = time_per_row(
+            threaded_model.predict_record, records, args.repeat
+        )
+        report["predict_batch"][f"onnx_{n_threads}_threads"] = time_batch(threaded_model.predict, batch, args.repeat)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
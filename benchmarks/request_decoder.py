@@ -0,0 +1,107 @@
+"""
+Per request cost of the typed request decoder against the dataframe path it
+replaces: single quotes (form strings in, prediction out) and the decoding
+of a large JSON batch.
+
+    python benchmarks/request_decoder.py --model-path artifacts/<run>/ModelTrainerArtifacts/insurance_price_model.pkl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from insurancePrice.components.model_cache import ServedModel, model_cache
+from insurancePrice.components.model_predictor import CostPredictor, insuranceBatchData, insuranceRequestDecoder
+from insurancePrice.components.tree_ensemble import FlatCostModel
+from insurancePrice.constants import TARGET_COLUMN
+from insurancePrice.utils.main_utils import MainUtils
+
+
+def time_per_row(fn, records, repeat):
+    timings = []
+    for _ in range(repeat):
+        for record in records:
+            started = time.perf_counter()
+            fn(record)
+            timings.append(time.perf_counter() - started)
+    timings = np.array(timings) * 1e6
+    return {
+        "mean_us": float(timings.mean()),
+        "p50_us": float(np.percentile(timings, 50)),
+        "p95_us": float(np.percentile(timings, 95)),
+        "p99_us": float(np.percentile(timings, 99)),
+    }
+
+
+def best_seconds(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", required=True, help="Local CostModel pickle")
+    parser.add_argument("--data-path", default="data/insurance.csv")
+    parser.add_argument("--backend", default="flat", choices=["pickle", "flat"])
+    parser.add_argument("--rows", type=int, default=1000, help="Single quotes timed")
+    parser.add_argument("--batch-rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    model = MainUtils.load_object(args.model_path)
+    if args.backend == "flat":
+        model = FlatCostModel.from_cost_model(model)
+    elif not model.is_compiled:
+        model.compile()
+    model_cache._served = ServedModel(model=model, version="benchmark")
+    cost_predictor = CostPredictor(cache=model_cache)
+    decoder = insuranceRequestDecoder()
+
+    data = pd.read_csv(args.data_path).drop(columns=[TARGET_COLUMN])
+    # Submitted forms carry every field as a string
+    forms = [{column: str(value) for column, value in record.items()} for record in
+             data.sample(args.rows, replace=True, random_state=0).to_dict(orient="records")]
+    records = data.sample(args.batch_rows, replace=True, random_state=1).to_dict(orient="records")
+
+    feature_columns = insuranceBatchData(records=[]).get_feature_columns()
+
+    def dataframe_quote(form):
+        X = pd.DataFrame.from_records([form]).astype(feature_columns)
+        return float(cost_predictor.predict_batch(X)[0])
+
+    def decoded_quote(form):
+        return float(cost_predictor.predict_encoded_batch(decoder.decode_record(form))[0])
+
+    expected = np.array([dataframe_quote(form) for form in forms])
+    actual = np.array([decoded_quote(form) for form in forms])
+
+    report = {
+        "model": repr(model),
+        "single_quote": {
+            "dataframe": time_per_row(dataframe_quote, forms, args.repeat),
+            "decoder": time_per_row(decoded_quote, forms, args.repeat),
+            "max_abs_diff": float(np.max(np.abs(actual - expected))),
+        },
+        "batch_decode": {"rows": args.batch_rows},
+    }
+    for name, fn in {
+        "dataframe": lambda: pd.DataFrame.from_records(records).astype(feature_columns),
+        "decoder": lambda: decoder.decode_records(records),
+    }.items():
+        seconds = best_seconds(fn, args.repeat)
+        report["batch_decode"][name] = {"seconds": seconds, "rows_per_second": args.batch_rows / seconds}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Load test of the FastAPI app served by uvicorn in this process, against moto
+as the S3 bucket and mongomock as MongoDB, seeded with data/insurance.csv and
+a model (trained here unless --model-path is given). Every scenario runs at
+every concurrency and the latency percentiles and throughput are written to
+--output; with --baseline the run is compared to a previous output and exits
+with 1 when p99 latency or throughput regressed by more than --max-regression.
+
+    pip install moto mongomock httpx
+    python benchmarks/serving_load.py --backend flat --concurrency 1,8,32 --output serving_load.json
+    python benchmarks/serving_load.py --backend flat --baseline serving_load.json --output serving_load_new.json
+
+--url drives an already running server (e.g. SERVING_WORKERS > 1) instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import httpx
+
+
+def set_stand_in_environment(backend):
+    # Read by insurancePrice.constants at import time, nothing of the package is imported before
+    os.environ.setdefault("MONGO_DB_URL", "mongodb://stand-in:27017")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ["MODEL_SERVING_BACKEND"] = backend
+    os.environ["PRELOAD_MODEL"] = "true"
+
+
+def train_cost_model(data, n_estimators):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    from insurancePrice.components.model_trainer import CostModel
+    from insurancePrice.constants import TARGET_COLUMN
+    from insurancePrice.components.model_predictor import read_schema_config
+
+    schema_config = read_schema_config()
+    preprocessor = ColumnTransformer([
+        ("OneHotEncoder", OneHotEncoder(handle_unknown="ignore"), schema_config["categorical_columns"]),
+        ("StandardScaler", StandardScaler(), schema_config["numerical_columns"]),
+    ])
+    X, y = data.drop(columns=[TARGET_COLUMN]), data[TARGET_COLUMN]
+    regressor = RandomForestRegressor(n_estimators=n_estimators, max_depth=8, random_state=0, n_jobs=-1)
+    regressor.fit(preprocessor.fit_transform(X), y)
+    return CostModel(preprocessor, regressor)
+
+
+def save_model(cost_model, backend, file_path, columns):
+    from insurancePrice.components.model_bundle import ModelBundle
+    from insurancePrice.components.onnx_model import OnnxCostModel
+    from insurancePrice.components.tree_ensemble import FlatCostModel
+    from insurancePrice.utils.main_utils import MainUtils
+
+    if backend == "pickle":
+        return MainUtils.save_object(file_path, cost_model)
+    if backend == "flat":
+        return FlatCostModel.from_cost_model(cost_model).save(file_path)
+    if backend == "bundle":
+        return ModelBundle.save(FlatCostModel.from_cost_model(cost_model), file_path, cost_model=cost_model)
+    return OnnxCostModel.from_cost_model(cost_model, columns=columns).save(file_path)
+
+
+def start_stand_ins(data, cost_model, backend, work_dir):
+    from moto import mock_aws
+
+    mock = mock_aws()
+    mock.start()
+
+    import mongomock
+
+    import insurancePrice.configuration.mongo_operations as mongo_operations
+    from insurancePrice.components.model_cache import ModelCache
+    from insurancePrice.configuration.s3_operations import S3Operation
+    from insurancePrice.constants import BUCKET_NAME, COLLECTION_NAME, DB_NAME, TARGET_COLUMN
+
+    # Every MongoDBOperation of this process shares one in memory server
+    client = mongomock.MongoClient()
+    mongo_operations.MongoClient = lambda *args, **kwargs: client
+    mongo_operations.MongoDBOperation().insert_dataframe_as_record(data, DB_NAME, COLLECTION_NAME)
+
+    s3 = S3Operation()
+    s3.s3_client.create_bucket(Bucket=BUCKET_NAME)
+    columns = list(data.drop(columns=[TARGET_COLUMN]).columns)
+    model_file_path = save_model(cost_model, backend, os.path.join(work_dir, f"model.{backend}"), columns)
+    s3.upload_file(model_file_path, ModelCache(backend=backend).model_key, BUCKET_NAME, remove=False)
+    return mock
+
+
+def start_server():
+    import uvicorn
+
+    from app import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="uvicorn", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def wait_until_ready(url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/ready").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} was not ready after {timeout} seconds")
+
+
+def to_ipc_stream(X):
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(X, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def build_scenarios(X, names, batch_rows):
+    rng = np.random.default_rng(0)
+    forms = [{column: str(value) for column, value in record.items()} for record in X.to_dict(orient="records")]
+    batches = [X.sample(batch_rows, replace=True, random_state=int(seed)) for seed in rng.integers(0, 2 ** 31, 16)]
+
+    json_bodies = [json.dumps(batch.to_dict(orient="records")) for batch in batches]
+
+    scenarios = {
+        "predict": (1, lambda client, index: client.post("/predict", data=forms[index % len(forms)])),
+        "batch": (batch_rows, lambda client, index: client.post(
+            "/predict/batch", content=json_bodies[index % len(json_bodies)],
+            headers={"content-type": "application/json"},
+        )),
+    }
+    if "arrow" in names:
+        arrow_bodies = [to_ipc_stream(batch) for batch in batches]
+        scenarios["arrow"] = (batch_rows, lambda client, index: client.post(
+            "/predict/arrow", content=arrow_bodies[index % len(arrow_bodies)],
+            headers={"content-type": "application/vnd.apache.arrow.stream"},
+        ))
+    return {name: scenarios[name] for name in names}
+
+
+async def run_load(url, send, requests, concurrency):
+    latencies, status_codes = [], Counter()
+    next_index = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+
+        async def worker():
+            nonlocal next_index
+            while next_index < requests:
+                index = next_index
+                next_index += 1
+                started = time.perf_counter()
+                try:
+                    status_codes[(await send(client, index)).status_code] += 1
+                except httpx.HTTPError as e:
+                    status_codes[type(e).__name__] += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, status_codes, time.perf_counter() - started
+
+
+def summarize(latencies, status_codes, seconds, rows_per_request):
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for status, count in status_codes.items() if not str(status).startswith("2")),
+        "status_codes": {str(status): count for status, count in status_codes.items()},
+        "seconds": seconds,
+        "requests_per_second": len(latencies) / seconds,
+        "rows_per_second": len(latencies) * rows_per_request / seconds,
+        "latency_ms": {
+            "mean": float(latencies_ms.mean()),
+            "p50": float(np.percentile(latencies_ms, 50)),
+            "p95": float(np.percentile(latencies_ms, 95)),
+            "p99": float(np.percentile(latencies_ms, 99)),
+            "max": float(latencies_ms.max()),
+        },
+    }
+
+
+def compare_to_baseline(report, baseline, max_regression):
+    regressions = []
+    for scenario, levels in report["scenarios"].items():
+        for concurrency, result in levels.items():
+            previous = baseline.get("scenarios", {}).get(scenario, {}).get(concurrency)
+            if previous is None:
+                continue
+            change = {
+                "p99_latency": result["latency_ms"]["p99"] / previous["latency_ms"]["p99"] - 1,
+                "throughput": result["requests_per_second"] / previous["requests_per_second"] - 1,
+            }
+            result["change_to_baseline"] = change
+            if change["p99_latency"] > max_regression or -change["throughput"] > max_regression:
+                regressions.append(f"{scenario} at concurrency {concurrency}: {change}")
+    return regressions
+
+
+def get_git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-path", help="Local CostModel pickle, a random forest is trained when omitted")
+    parser.add_argument("--data-path", default="data/insurance.csv")
+    parser.add_argument("--backend", default="pickle", choices=["pickle", "flat", "bundle", "onnx"])
+    parser.add_argument("--trees", type=int, default=100, help="Trees of the trained random forest")
+    parser.add_argument("--scenarios", default="predict,batch", help="predict, batch and arrow")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario and concurrency")
+    parser.add_argument("--warmup-requests", type=int, default=50)
+    parser.add_argument("--batch-rows", type=int, default=100, help="Records per batch request")
+    parser.add_argument("--url", help="Drive this server instead of booting the app with stand-ins")
+    parser.add_argument("--ready-timeout", type=float, default=120)
+    parser.add_argument("--output", default="serving_load.json")
+    parser.add_argument("--baseline", help="Previous output to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative p99/throughput loss")
+    args = parser.parse_args()
+
+    set_stand_in_environment(args.backend)
+    data = pd.read_csv(args.data_path)
+
+    from insurancePrice.constants import TARGET_COLUMN
+    from insurancePrice.utils.main_utils import MainUtils
+
+    url, server, mock = args.url, None, None
+    with tempfile.TemporaryDirectory() as work_dir:
+        if url is None:
+            cost_model = MainUtils.load_object(args.model_path) if args.model_path else train_cost_model(data, args.trees)
+            mock = start_stand_ins(data, cost_model, args.backend, work_dir)
+            server, url = start_server()
+        wait_until_ready(url, args.ready_timeout)
+
+        X = data.drop(columns=[TARGET_COLUMN])
+        scenarios = build_scenarios(X, args.scenarios.split(","), args.batch_rows)
+        report = {
+            "git_commit": get_git_commit(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "url": args.url or "in-process",
+            "backend": args.backend,
+            "micro_batching": os.environ.get("MICRO_BATCH_ENABLED", "true"),
+            "batch_rows": args.batch_rows,
+            "scenarios": {},
+        }
+        for name, (rows_per_request, send) in scenarios.items():
+            report["scenarios"][name] = {}
+            for concurrency in (int(value) for value in args.concurrency.split(",")):
+                asyncio.run(run_load(url, send, args.warmup_requests, concurrency))
+                latencies, status_codes, seconds = asyncio.run(run_load(url, send, args.requests, concurrency))
+                report["scenarios"][name][str(concurrency)] = summarize(
+                    latencies, status_codes, seconds, rows_per_request
+                )
+        report["server_metrics"] = {
+            name: httpx.get(f"{url}/metrics/{name}").json() for name in ("batching", "loop")
+        }
+
+        if server is not None:
+            server.should_exit = True
+        if mock is not None:
+            mock.stop()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file_obj:
+            regressions = compare_to_baseline(report, json.load(file_obj), args.max_regression)
+        report["regressions"] = regressions
+
+    with open(args.output, "w") as file_obj:
+        json.dump(report, file_obj, indent=2)
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
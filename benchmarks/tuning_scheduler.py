@@ -0,0 +1,126 @@
+"""
+Wall clock of the model.yaml hyperparameter search: GridSearchCV model by
+model (the PARALLEL_TUNING=false path of ModelTrainer) against TuningScheduler
+fanning every fit out to one process pool, with the search_strategy entries of
+model.yaml or the --strategy given for all the models.
+
+    python benchmarks/tuning_scheduler.py --cpu-budget 8
+    python benchmarks/tuning_scheduler.py --cpu-budget 8 --threads-per-fit 2 --skip-sequential
+    python benchmarks/tuning_scheduler.py --strategy bayesian --n-iter 12 --max-seconds 60 --skip-sequential
+    TUNING_CACHE_PATH=/tmp/tuning_cache.sqlite3 python benchmarks/tuning_scheduler.py --cache --skip-sequential
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sklearn.compose import ColumnTransformer
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from insurancePrice.components.model_predictor import read_schema_config
+from insurancePrice.components.model_tuner import TuningScheduler
+from insurancePrice.components.tuning_cache import TuningCache
+from insurancePrice.constants import MODEL_CONFIG_FILE, TARGET_COLUMN, TEST_SIZE
+from insurancePrice.utils.main_utils import MainUtils
+
+
+def build_preprocessor(profile, schema_config):
+    # Same blocks as DataTransformation.get_data_transformer_object
+    if profile == "categorical":
+        encoder = ("OrdinalEncoder", OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=np.nan))
+    else:
+        encoder = ("OneHotEncoder", OneHotEncoder(handle_unknown="ignore"))
+    return ColumnTransformer([
+        (*encoder, schema_config["categorical_columns"]),
+        ("StandardScaler", StandardScaler(), schema_config["numerical_columns"]),
+    ])
+
+
+def load_split(data_path, repeat, profiles):
+    schema_config = read_schema_config()
+    data = pd.concat([pd.read_csv(data_path)] * repeat, ignore_index=True)
+    X, y = data.drop(columns=[TARGET_COLUMN]), data[TARGET_COLUMN]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=TEST_SIZE, random_state=0)
+    x_train, x_test = {}, {}
+    for profile in profiles:
+        preprocessor = build_preprocessor(profile, schema_config)
+        x_train[profile], x_test[profile] = preprocessor.fit_transform(X_train), preprocessor.transform(X_test)
+    return x_train, y_train.to_numpy(), x_test, y_test.to_numpy()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-path", default="data/insurance.csv")
+    parser.add_argument("--repeat", type=int, default=1, help="Copies of the data set, to time larger fits")
+    parser.add_argument("--cpu-budget", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads-per-fit", type=int, default=1)
+    parser.add_argument("--strategy", choices=["grid", "random", "halving", "bayesian"],
+                        help="Search strategy of all the models instead of the model.yaml ones")
+    parser.add_argument("--n-iter", type=int, help="Trials of the random and bayesian strategies")
+    parser.add_argument("--max-fits", type=int)
+    parser.add_argument("--max-seconds", type=float)
+    parser.add_argument("--checkpoint", help="Tuning checkpoint, reused by the next run with the same grids and data")
+    parser.add_argument("--cache", action="store_true",
+                        help="Use the tuning cache at TUNING_CACHE_PATH, a second run on the same data only refits")
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    utils = MainUtils()
+    model_config = utils.read_yaml_file(filename=MODEL_CONFIG_FILE)
+    model_grids = model_config["train_model"]
+    model_profiles = utils.get_preprocessing_profiles(model_config)
+    fixed_params = {name: utils.get_profile_params(profile, read_schema_config()) for name, profile in model_profiles.items()}
+    x_train, y_train, x_test, y_test = load_split(args.data_path, args.repeat, set(model_profiles.values()))
+    search_configs = {name: dict((model_config.get("search_strategy") or {}).get(name) or {}) for name in model_grids}
+    for search_config in search_configs.values():
+        if args.strategy:
+            search_config.clear()
+            search_config["strategy"] = args.strategy
+        for key in ("n_iter", "max_fits", "max_seconds"):
+            if getattr(args, key) is not None:
+                search_config[key] = getattr(args, key)
+    report = {"train_rows": len(y_train), "cpu_budget": args.cpu_budget}
+
+    scheduler = TuningScheduler(model_grids, search_configs=search_configs, cpu_budget=args.cpu_budget,
+                                threads_per_fit=args.threads_per_fit, checkpoint_path=args.checkpoint,
+                                tuning_cache=TuningCache() if args.cache else None,
+                                model_profiles=model_profiles, fixed_params=fixed_params)
+    started = time.perf_counter()
+    scheduled = scheduler.tune(x_train, y_train, x_test, y_test)
+    report["scheduler"] = {**scheduler.report, "wall_seconds": time.perf_counter() - started}
+
+    if not args.skip_sequential:
+        started = time.perf_counter()
+        sequential = [
+            utils.get_tuned_model(name, x_train[model_profiles[name]], y_train, x_test[model_profiles[name]], y_test,
+                                  use_tuning_cache=args.cache, fixed_params=fixed_params[name])
+            for name in model_grids
+        ]
+        report["sequential"] = {
+            "wall_seconds": time.perf_counter() - started,
+            "models": {
+                name: {"params": {key: model.get_params()[key] for key in model_grids[name]}, "test_score": score}
+                for (score, model, _), name in zip(sequential, model_grids)
+            },
+        }
+        report["speedup"] = report["sequential"]["wall_seconds"] / report["scheduler"]["wall_seconds"]
+        report["same_best_params"] = all(
+            report["sequential"]["models"][name]["params"] == report["scheduler"]["models"][name]["params"]
+            for name in model_grids
+        )
+        report["max_test_score_diff"] = float(max(
+            abs(s[0] - p[0]) for s, p in zip(sequential, scheduled)
+        ))
+
+    print(json.dumps(report, indent=2, default=lambda value: value.item() if isinstance(value, np.generic) else str(value)))
+
+
+if __name__ == "__main__":
+    main()
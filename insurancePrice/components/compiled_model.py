@@ -0,0 +1,223 @@
+import sys
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+
+
+
+class CompiledPreprocessor:
+    """
+    NumPy form of the fitted ColumnTransformer (OneHotEncoder or OrdinalEncoder
+    + StandardScaler).
+
+    The one-hot blocks are kept as category -> output column index tables, the
+    ordinal blocks (category codes of the native categorical profile) as the
+    output column of their codes, and the scaler as mean and scale vectors, so a feature matrix is written
+    directly from typed column values without pandas column dispatch. The
+    arithmetic is the same as sklearn's, so the output matches
+    ColumnTransformer.transform exactly.
+    """
+    def __init__(self,
+                 onehot_blocks: List[Tuple[str, int, List[str]]],
+                 numerical_columns: List[str],
+                 numerical_offset: int,
+                 mean: np.ndarray,
+                 scale: np.ndarray,
+                 n_features: int,
+                 ordinal_blocks: Optional[List[Tuple[str, int, List[str]]]] = None):
+        self.onehot_blocks = onehot_blocks
+        self.ordinal_blocks = ordinal_blocks or []
+        self.numerical_columns = numerical_columns
+        self.numerical_offset = numerical_offset
+        self.mean = mean
+        self.scale = scale
+        self.n_features = n_features
+        self.category_index = {
+            column: pd.Index(categories) for column, _, categories in self.categorical_blocks
+        }
+        self.category_lookup = {
+            column: {category: code for code, category in enumerate(categories)}
+            for column, _, categories in self.categorical_blocks
+        }
+
+    @property
+    def categorical_blocks(self) -> List[Tuple[str, int, List[str]]]:
+        # CompiledPreprocessor pickled before the ordinal blocks existed have no ordinal_blocks attribute
+        return [*self.onehot_blocks, *getattr(self, "ordinal_blocks", [])]
+
+    @property
+    def categorical_columns(self) -> List[str]:
+        return [column for column, _, _ in self.categorical_blocks]
+
+    @property
+    def categories(self) -> Dict[str, List[str]]:
+        return {column: list(categories) for column, _, categories in self.categorical_blocks}
+
+    @classmethod
+    def from_column_transformer(cls, preprocessor: object) -> "CompiledPreprocessor":
+
+        """
+        Method Name :   from_column_transformer
+
+        Description :   This method reads the fitted one-hot, ordinal and scaler parameters out of the ColumnTransformer.
+
+        Output      :   Compiled preprocessor
+        """
+        from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+        onehot_blocks, ordinal_blocks, numerical_columns = [], [], []
+        numerical_offset, mean, scale = None, None, None
+        offset = 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if name == "remainder":
+                if transformer != "drop":
+                    raise ValueError("Only ColumnTransformer with remainder='drop' can be compiled")
+                continue
+
+            if isinstance(transformer, OneHotEncoder):
+                if transformer.drop is not None or transformer.handle_unknown != "ignore":
+                    raise ValueError("Only OneHotEncoder(handle_unknown='ignore') without drop can be compiled")
+                for column, categories in zip(columns, transformer.categories_):
+                    onehot_blocks.append((column, offset, list(categories)))
+                    offset += len(categories)
+
+            elif isinstance(transformer, OrdinalEncoder):
+                encoded_values = [transformer.unknown_value, transformer.encoded_missing_value]
+                if transformer.handle_unknown != "use_encoded_value" or not np.isnan(encoded_values).all():
+                    raise ValueError("Only OrdinalEncoder encoding unknown and missing categories as nan can be compiled")
+                for column, categories in zip(columns, transformer.categories_):
+                    ordinal_blocks.append((column, offset, list(categories)))
+                    offset += 1
+
+            elif isinstance(transformer, StandardScaler):
+                if numerical_offset is not None:
+                    raise ValueError("Only a single StandardScaler block can be compiled")
+                numerical_columns = list(columns)
+                numerical_offset = offset
+                n = len(columns)
+                mean = transformer.mean_ if transformer.with_mean else np.zeros(n)
+                scale = transformer.scale_ if transformer.with_std else np.ones(n)
+                offset += n
+
+            else:
+                raise ValueError(f"{type(transformer).__name__} cannot be compiled")
+
+        return cls(
+            onehot_blocks=onehot_blocks,
+            numerical_columns=numerical_columns,
+            numerical_offset=numerical_offset if numerical_offset is not None else offset,
+            mean=np.asarray(mean if mean is not None else [], dtype=np.float64),
+            scale=np.asarray(scale if scale is not None else [], dtype=np.float64),
+            n_features=offset,
+            ordinal_blocks=ordinal_blocks,
+        )
+
+    def encode(self, column: str, values) -> np.ndarray:
+        """
+        Maps category values to their position in the fitted categories, -1 for unknown.
+        """
+        return self.category_index[column].get_indexer(np.asarray(values, dtype=object))
+
+    def transform_encoded(self, numerical: np.ndarray, codes: Dict[str, np.ndarray]) -> np.ndarray:
+
+        """
+        Method Name :   transform_encoded
+
+        Description :   This method builds the feature matrix from a (n, numerical columns) array and per column category codes.
+
+        Output      :   Feature matrix
+        """
+        numerical = np.asarray(numerical, dtype=np.float64)
+        n_rows = numerical.shape[0]
+        features = np.zeros((n_rows, self.n_features), dtype=np.float64)
+
+        # Same operation order as StandardScaler.transform
+        scaled = numerical - self.mean
+        scaled /= self.scale
+        features[:, self.numerical_offset:self.numerical_offset + len(self.numerical_columns)] = scaled
+
+        rows = np.arange(n_rows)
+        for column, offset, _ in self.onehot_blocks:
+            column_codes = np.asarray(codes[column])
+            known = column_codes >= 0
+            # Unknown categories are all zeros, like handle_unknown="ignore"
+            features[rows[known], offset + column_codes[known]] = 1.0
+        for column, offset, _ in getattr(self, "ordinal_blocks", []):
+            column_codes = np.asarray(codes[column])
+            # Unknown categories are missing values, like unknown_value=np.nan
+            features[:, offset] = np.where(column_codes >= 0, column_codes, np.nan)
+        return features
+
+    def transform_columns(self, numerical: Dict[str, np.ndarray], codes: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        transform_encoded on per column arrays, numerical columns are stacked in the fitted order.
+        """
+        n_rows = len(next(iter(codes.values()))) if codes else len(next(iter(numerical.values())))
+        stacked = np.column_stack(
+            [np.asarray(numerical[column], dtype=np.float64) for column in self.numerical_columns]
+        ) if self.numerical_columns else np.empty((n_rows, 0))
+        return self.transform_encoded(stacked, codes)
+
+    def transform(self, X: DataFrame) -> np.ndarray:
+
+        """
+        Method Name :   transform
+
+        Description :   This method transforms a dataframe with the compiled parameters.
+
+        Output      :   Feature matrix
+        """
+        try:
+            numerical = np.column_stack(
+                [np.asarray(X[column], dtype=np.float64) for column in self.numerical_columns]
+            ) if self.numerical_columns else np.empty((len(X), 0))
+            codes = {column: self.encode(column, X[column]) for column in self.categorical_columns}
+            return self.transform_encoded(numerical, codes)
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def transform_record(self, record: Dict) -> np.ndarray:
+
+        """
+        Method Name :   transform_record
+
+        Description :   This method builds the (1, n_features) feature row of a single record without pandas.
+
+        Output      :   Feature row
+        """
+        try:
+            features = np.zeros((1, self.n_features), dtype=np.float64)
+            numerical = np.array([float(record[column]) for column in self.numerical_columns], dtype=np.float64)
+            numerical -= self.mean
+            numerical /= self.scale
+            features[0, self.numerical_offset:self.numerical_offset + len(self.numerical_columns)] = numerical
+
+            for column, offset, _ in self.onehot_blocks:
+                code = self.category_lookup[column].get(record[column])
+                if code is not None:
+                    features[0, offset + code] = 1.0
+            for column, offset, _ in getattr(self, "ordinal_blocks", []):
+                code = self.category_lookup[column].get(record[column])
+                features[0, offset] = np.nan if code is None else code
+            return features
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def verify(self, preprocessor: object, X: DataFrame) -> float:
+        """
+        Largest absolute difference between the compiled and the sklearn transform on X.
+        """
+        expected = preprocessor.transform(X)
+        if hasattr(expected, "toarray"):
+            expected = expected.toarray()
+        difference = np.abs(self.transform(X) - expected)
+        # Unknown categories of the ordinal blocks are nan on both sides
+        difference[np.isnan(difference) & np.isnan(expected)] = 0.0
+        max_diff = float(np.max(np.nan_to_num(difference, nan=np.inf))) if len(X) else 0.0
+        logging.info(f"Compiled preprocessor max abs difference to sklearn transform: {max_diff}")
+        return max_diff
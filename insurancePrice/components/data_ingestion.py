@@ -8,7 +8,7 @@ from insurancePrice.exception import InsuranceException
 from insurancePrice.configuration.mongo_operations import MongoDBOperation
 from insurancePrice.entity.config_entity import DataIngestionConfig
 from insurancePrice.entity.artifact_entity import DataIngestionArtifact
-from insurancePrice.constants import TEST_SIZE
+from insurancePrice.constants import TEST_SIZE, TRAIN_TEST_SPLIT_SEED
 
 
 
@@ -63,7 +63,7 @@ class DataIngestion:
             os.makedirs(self.data_ingestion_config.DATA_INGESTION_ARTIFACTS_DIR, exist_ok= True)
 
             # Splitting data into train and test:
-            train_set, test_set = train_test_split(df, test_size=TEST_SIZE)
+            train_set, test_set = train_test_split(df, test_size=TEST_SIZE, random_state=TRAIN_TEST_SPLIT_SEED)
             logging.info("Performed train test split on the dataframe.")
 
             # Creating dir to store train data under data_ingestion_artifact dir:
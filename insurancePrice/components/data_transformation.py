@@ -5,7 +5,9 @@ from pandas import DataFrame
 import numpy as np
 import pandas as pd
 from sklearn.compose import ColumnTransformer
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+from typing import Dict
+from insurancePrice.constants import DEFAULT_PREPROCESSING_PROFILE, MODEL_CONFIG_FILE
 from insurancePrice.entity.config_entity import DataTransformationConfig
 from insurancePrice.entity.artifact_entity import DataIngestionArtifact, DataTransformationArtifact
 from insurancePrice.exception import InsuranceException
@@ -24,11 +26,12 @@ class DataTransformation:
         self.test_set = pd.read_csv(self.data_ingestion_artifacts.test_data_file_path)
 
     # this method is used to get the transformer object
-    def get_data_transformer_object(self)->object:
+    def get_data_transformer_object(self, profile: str = DEFAULT_PREPROCESSING_PROFILE)->object:
         """
         Method Name :   get_data_transformer_object
 
-        Description :   This method gives preprocessor object. 
+        Description :   This method gives preprocessor object of a preprocessing profile: one-hot encoded categories,
+                        or integer category codes for the models with native categorical splits.
         
         Output      :   Preprocessor Object.
         """
@@ -42,13 +45,21 @@ class DataTransformation:
 
             # Creating transformer objects:
             numeric_transformer = StandardScaler()
-            oh_transformer = OneHotEncoder(handle_unknown="ignore")
-            logging.info("Initialized Standard Scaler and OneHotEncoder.")
+            if profile == "categorical":
+                # One column of codes per category, unknown categories are missing values
+                categorical_transformer = (
+                    "OrdinalEncoder",
+                    OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=np.nan),
+                    onehot_columns,
+                )
+            else:
+                categorical_transformer = ("OneHotEncoder", OneHotEncoder(handle_unknown="ignore"), onehot_columns)
+            logging.info(f"Initialized Standard Scaler and {categorical_transformer[0]}.")
 
             # Using the transformer objects in columns transformer
             preprocessor = ColumnTransformer(
                 [
-                    ("OneHotEncoder", oh_transformer, onehot_columns),
+                    categorical_transformer,
                     ("StandardScaler",numeric_transformer, numerical_columns)
                 ]
             )
@@ -62,34 +73,53 @@ class DataTransformation:
         
 
     
-    # This method is used to initialize data transformation
-    def initiate_data_transformation(self) -> DataTransformationArtifact:
+    # This method is used to get the artifact file paths of a preprocessing profile
+    def get_profile_file_paths(self, profile: str) -> Dict[str, str]:
+        config = self.data_transformation_config
+        file_paths = {
+            "preprocessor": config.PREPROCESSOR_FILE_PATH,
+            "train": config.TRANSFORMED_TRAIN_FILE_PATH,
+            "test": config.TRANSFORMED_TEST_FILE_PATH,
+        }
+        if profile == DEFAULT_PREPROCESSING_PROFILE:
+            return file_paths
+        # DataTransformationArtifacts/<profile>/ mirrors the layout of the default profile
+        return {
+            name: os.path.join(
+                config.DATA_TRANSFORMATION_ARTIFACTS_DIR, profile,
+                os.path.relpath(file_path, config.DATA_TRANSFORMATION_ARTIFACTS_DIR)
+            )
+            for name, file_path in file_paths.items()
+        }
+
+
+    # This method is used to transform the train and test sets with the preprocessor of a profile
+    def transform_profile(self, profile: str) -> Dict[str, str]:
         """
-        Method Name :   initiate_data_transformation
+        Method Name :   transform_profile
 
-        Description :   This method initiates data transformation. 
+        Description :   This method fits the preprocessor of a profile and saves it with the transformed train and test arrays.
         
-        Output      :   Data Transformation Artifacts.
+        Output      :   Preprocessor, transformed train and transformed test file paths.
         """
+        logging.info(f"Entered transform_profile method of Data_Transformation class for the {profile} profile")
         try:
-            # creating directory for data transformation artifacts
-            os.makedirs(self.data_transformation_config.DATA_TRANSFORMATION_ARTIFACTS_DIR, exist_ok=True)
-            logging.info("Created Data Transformation artifacts directory")
+            file_paths = self.get_profile_file_paths(profile)
 
             # Getting preprocessor object
-            preprocessor = self.get_data_transformer_object()
+            preprocessor = self.get_data_transformer_object(profile)
             logging.info("Got the preprocessor object.")
 
             target_column_name = self.data_transformation_config.SCHEMA_CONFIG["target_column"]
             
             # Getting the input features and target feature of Training Dataset.
-            input_feature_train_df = self.train_set.drop(columns=[target_column_name], axis=1)
+            input_feature_train_df = self.train_set.drop(columns=[target_column_name])
 
             target_feature_train_df = self.train_set[target_column_name]
             logging.info("Got train features and target column.")
 
             # Getting the input features and target feature of Test Dataset.
-            input_feature_test_df = self.test_set.drop(columns=[target_column_name], axis=1)
+            input_feature_test_df = self.test_set.drop(columns=[target_column_name])
 
             target_feature_test_df = self.test_set[target_column_name]
             logging.info("Got test features and target column.")
@@ -104,10 +134,10 @@ class DataTransformation:
             logging.info("Created train array.")
 
             #Creating directory for transformed train dataset array and saving the dataset
-            os.makedirs(self.data_transformation_config.TRANSFORMED_TRAIN_DATA_DIR, exist_ok=True)
+            os.makedirs(os.path.dirname(file_paths["train"]), exist_ok=True)
 
             transformed_train_file = self.data_transformation_config.UTILS.save_numpy_array_data(
-                self.data_transformation_config.TRANSFORMED_TRAIN_FILE_PATH, train_arr
+                file_paths["train"], train_arr
             )
 
             logging.info("Saved train array to transformed train file path.")
@@ -117,27 +147,61 @@ class DataTransformation:
             logging.info("Created test array.")
 
             #Creating directory for transformed train dataset array and saving the dataset
-            os.makedirs(self.data_transformation_config.TRANSFORMED_TEST_DATA_DIR, exist_ok=True)
+            os.makedirs(os.path.dirname(file_paths["test"]), exist_ok=True)
 
             transformed_test_file = self.data_transformation_config.UTILS.save_numpy_array_data(
-                self.data_transformation_config.TRANSFORMED_TEST_FILE_PATH, test_arr
+                file_paths["test"], test_arr
             )
 
             logging.info("Saved test array to transformed test file path.")
 
             #saving preprocessor object to data transformation artifacts dir
+            os.makedirs(os.path.dirname(file_paths["preprocessor"]), exist_ok=True)
             preprocessor_obj_file = self.data_transformation_config.UTILS.save_object(
-                self.data_transformation_config.PREPROCESSOR_FILE_PATH, preprocessor
+                file_paths["preprocessor"], preprocessor
             )
 
             logging.info("Saved the preprocessor object in DataTransformation artifacts directory.")
+            logging.info("Exited transform_profile method of Data_Transformation class")
+            return {"preprocessor": preprocessor_obj_file, "train": transformed_train_file, "test": transformed_test_file}
+
+        except Exception as e:
+            raise InsuranceException(e,sys) from e
+
+
+    # This method is used to initialize data transformation
+    def initiate_data_transformation(self) -> DataTransformationArtifact:
+        """
+        Method Name :   initiate_data_transformation
+
+        Description :   This method initiates data transformation for every preprocessing profile of model.yaml. 
+        
+        Output      :   Data Transformation Artifacts.
+        """
+        try:
+            # creating directory for data transformation artifacts
+            os.makedirs(self.data_transformation_config.DATA_TRANSFORMATION_ARTIFACTS_DIR, exist_ok=True)
+            logging.info("Created Data Transformation artifacts directory")
+
+            # The default profile is always written, it is the preprocessor of the artifact
+            model_config = self.data_transformation_config.UTILS.read_yaml_file(filename=MODEL_CONFIG_FILE)
+            model_profiles = self.data_transformation_config.UTILS.get_preprocessing_profiles(model_config)
+            profiles = [DEFAULT_PREPROCESSING_PROFILE] + sorted(
+                set(model_profiles.values()) - {DEFAULT_PREPROCESSING_PROFILE}
+            )
+            profile_file_paths = {profile: self.transform_profile(profile) for profile in profiles}
+            logging.info(f"Transformed the data sets for the {profiles} preprocessing profiles")
             logging.info("Exited initiate_data_transformation method of Data_Transformation class")
 
             # saving data transformation artifacts:
+            default_file_paths = profile_file_paths[DEFAULT_PREPROCESSING_PROFILE]
             data_transformation_artifacts = DataTransformationArtifact(
-                transformed_object_file_path=preprocessor_obj_file,
-                transformed_train_file_path=transformed_train_file,
-                transformed_test_file_path=transformed_test_file
+                transformed_object_file_path=default_file_paths["preprocessor"],
+                transformed_train_file_path=default_file_paths["train"],
+                transformed_test_file_path=default_file_paths["test"],
+                test_data_file_path=self.data_ingestion_artifacts.test_data_file_path,
+                train_data_file_path=self.data_ingestion_artifacts.train_data_file_path,
+                profile_file_paths=profile_file_paths,
             )
 
             return data_transformation_artifacts
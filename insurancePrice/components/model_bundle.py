@@ -0,0 +1,269 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tarfile
+from datetime import datetime
+from typing import Dict, Optional
+import numpy as np
+from insurancePrice.components.compiled_model import CompiledPreprocessor
+from insurancePrice.components.tree_ensemble import FlatCostModel
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+
+BUNDLE_FORMAT = "insurance-price-model-bundle"
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE_NAME = "manifest.json"
+TREE_ARRAYS = ("feature", "threshold", "left", "right", "value", "roots")
+
+
+
+class ModelBundle:
+    """
+    Versioned, pickle free form of the served model.
+
+    A bundle is a directory (shipped as one uncompressed tar) holding
+    manifest.json, the flat tree arrays as .npy files, the scaler mean and
+    scale of the training preprocessor as .npy files and, for xgboost models,
+    the booster in its native ubj format. The manifest records the format
+    version, the library versions at export and the sha256 of every file; the
+    checksum over those digests names the bundle.
+
+    Opening a bundle only parses the manifest. The arrays are memory mapped
+    when the model is first built from them, so load time does not grow with
+    the tree count and the pages are shared between processes.
+    """
+    def __init__(self, directory: str, manifest: Dict):
+        self.directory = directory
+        self.manifest = manifest
+
+    @property
+    def checksum(self) -> str:
+        return self.manifest["checksum"]
+
+    @staticmethod
+    def get_checksum(files: Dict[str, Dict]) -> str:
+        digest = hashlib.sha256()
+        for file_name in sorted(files):
+            digest.update(f"{file_name}:{files[file_name]['sha256']}\n".encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _npy_bytes(array: np.ndarray) -> bytes:
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(array))
+        return buffer.getvalue()
+
+    @staticmethod
+    def _library_versions() -> Dict[str, Optional[str]]:
+        versions = {"numpy": np.__version__}
+        for library in ("sklearn", "xgboost"):
+            module = sys.modules.get(library)
+            versions[library] = getattr(module, "__version__", None)
+        return versions
+
+    @classmethod
+    def get_files(cls, flat_model: FlatCostModel, cost_model: Optional[object] = None) -> Dict[str, bytes]:
+
+        """
+        Method Name :   get_files
+
+        Description :   This method serializes the flat model arrays, the scaler parameters and the native booster.
+
+        Output      :   Bundle file name to bytes
+        """
+        files = {f"trees/{name}.npy": cls._npy_bytes(array) for name, array in flat_model.ensemble.to_arrays().items()}
+
+        if cost_model is not None:
+            compiled = getattr(cost_model, "compiled_preprocessor", None) or CompiledPreprocessor.from_column_transformer(
+                cost_model.preprocessing_object
+            )
+            files["preprocessor/mean.npy"] = cls._npy_bytes(compiled.mean)
+            files["preprocessor/scale.npy"] = cls._npy_bytes(compiled.scale)
+
+            if hasattr(cost_model.trained_model_object, "get_booster"):
+                files["booster.ubj"] = bytes(cost_model.trained_model_object.get_booster().save_raw(raw_format="ubj"))
+        return files
+
+    @classmethod
+    def build_manifest(cls, flat_model: FlatCostModel, files: Dict[str, bytes]) -> Dict:
+        file_entries = {
+            file_name: {"sha256": hashlib.sha256(data).hexdigest(), "bytes": len(data)}
+            for file_name, data in files.items()
+        }
+        return {
+            "format": BUNDLE_FORMAT,
+            "format_version": BUNDLE_FORMAT_VERSION,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "model_name": flat_model.model_name,
+            "flat_model": flat_model.get_metadata(),
+            "libraries": cls._library_versions(),
+            "files": file_entries,
+            "checksum": cls.get_checksum(file_entries),
+        }
+
+    @classmethod
+    def save(cls, flat_model: FlatCostModel, file_path: str, cost_model: Optional[object] = None) -> str:
+
+        """
+        Method Name :   save
+
+        Description :   This method writes the bundle of the flat model (and of the cost model it came from) as one tar file.
+
+        Output      :   Bundle file path
+        """
+        logging.info("Entered the save method of ModelBundle class")
+        try:
+            files = cls.get_files(flat_model, cost_model)
+            manifest = cls.build_manifest(flat_model, files)
+            files = {MANIFEST_FILE_NAME: json.dumps(manifest, indent=2).encode(), **files}
+
+            # Uncompressed, the arrays are already dense and the reader can stream it
+            with tarfile.open(file_path, "w") as tar:
+                for file_name, data in files.items():
+                    info = tarfile.TarInfo(file_name)
+                    info.size = len(data)
+                    tar.addfile(info, io.BytesIO(data))
+
+            logging.info(f"Saved model bundle {manifest['checksum']} with {len(files)} files to {file_path}")
+            logging.info("Exited the save method of ModelBundle class")
+            return file_path
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    @classmethod
+    def unpack(cls, data: bytes, root_dir: str) -> "ModelBundle":
+
+        """
+        Method Name :   unpack
+
+        Description :   This method checks the tar bytes against the manifest and extracts them into root_dir/<checksum>.
+
+        Output      :   Model bundle
+        """
+        logging.info("Entered the unpack method of ModelBundle class")
+        try:
+            with tarfile.open(fileobj=io.BytesIO(data), mode="r") as tar:
+                manifest = json.load(tar.extractfile(MANIFEST_FILE_NAME))
+                cls.check_format(manifest)
+                directory = os.path.join(root_dir, manifest["checksum"])
+
+                # Every worker unpacking the same bundle maps the same files, a complete bundle is never rewritten
+                if not os.path.exists(os.path.join(directory, MANIFEST_FILE_NAME)):
+                    files = {file_name: tar.extractfile(file_name).read() for file_name in manifest["files"]}
+                    cls.verify_files(manifest, files)
+
+                    partial_directory = f"{directory}.{os.getpid()}.part"
+                    for file_name, file_data in files.items():
+                        file_path = os.path.join(partial_directory, file_name)
+                        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                        with open(file_path, "wb") as file_obj:
+                            file_obj.write(file_data)
+                    with open(os.path.join(partial_directory, MANIFEST_FILE_NAME), "w") as file_obj:
+                        json.dump(manifest, file_obj, indent=2)
+
+                    try:
+                        os.rename(partial_directory, directory)
+                    except OSError:
+                        # Another process finished the same bundle first
+                        shutil.rmtree(partial_directory, ignore_errors=True)
+
+            logging.info("Exited the unpack method of ModelBundle class")
+            return cls(directory, manifest)
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    @classmethod
+    def open(cls, directory: str, verify: bool = True) -> "ModelBundle":
+
+        """
+        Method Name :   open
+
+        Description :   This method reads the manifest of an unpacked bundle, hashing its files when verify is set.
+
+        Output      :   Model bundle
+        """
+        try:
+            with open(os.path.join(directory, MANIFEST_FILE_NAME)) as file_obj:
+                manifest = json.load(file_obj)
+            cls.check_format(manifest)
+            bundle = cls(directory, manifest)
+            if verify:
+                bundle.verify()
+            return bundle
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    @staticmethod
+    def check_format(manifest: Dict) -> None:
+        if manifest.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"Not a model bundle: {manifest.get('format')}")
+        if manifest.get("format_version", 0) > BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Model bundle format version {manifest['format_version']} is newer than this reader")
+
+    @classmethod
+    def verify_files(cls, manifest: Dict, files: Dict[str, bytes]) -> None:
+        for file_name, entry in manifest["files"].items():
+            if hashlib.sha256(files[file_name]).hexdigest() != entry["sha256"]:
+                raise ValueError(f"Model bundle file {file_name} does not match its checksum")
+        if cls.get_checksum(manifest["files"]) != manifest["checksum"]:
+            raise ValueError("Model bundle manifest does not match its checksum")
+
+    def verify(self) -> None:
+        files = {}
+        for file_name in self.manifest["files"]:
+            with open(os.path.join(self.directory, file_name), "rb") as file_obj:
+                files[file_name] = file_obj.read()
+        self.verify_files(self.manifest, files)
+
+    def load_array(self, file_name: str, mmap: bool = True) -> np.ndarray:
+        return np.load(os.path.join(self.directory, file_name), mmap_mode="r" if mmap else None, allow_pickle=False)
+
+    def load_flat_model(self, mmap: bool = True) -> FlatCostModel:
+
+        """
+        Method Name :   load_flat_model
+
+        Description :   This method builds the flat cost model on memory mapped tree arrays of the bundle.
+
+        Output      :   Flat cost model
+        """
+        arrays = {"metadata": np.array(json.dumps(self.manifest["flat_model"]))}
+        for name in TREE_ARRAYS:
+            arrays[name] = self.load_array(f"trees/{name}.npy", mmap)
+        return FlatCostModel.from_arrays(arrays)
+
+    def load_preprocessor(self) -> CompiledPreprocessor:
+        """
+        Compiled preprocessor with the training scaler, the input of the native booster.
+        """
+        metadata = self.manifest["flat_model"]
+        return CompiledPreprocessor(
+            onehot_blocks=[tuple(block) for block in metadata["onehot_blocks"]],
+            numerical_columns=metadata["numerical_columns"],
+            numerical_offset=metadata["numerical_offset"],
+            mean=self.load_array("preprocessor/mean.npy", mmap=False),
+            scale=self.load_array("preprocessor/scale.npy", mmap=False),
+            n_features=metadata["n_features"],
+        )
+
+    def load_booster(self) -> object:
+        """
+        Native xgboost booster of the bundle, None for other models.
+        """
+        if "booster.ubj" not in self.manifest["files"]:
+            return None
+        import xgboost
+
+        booster = xgboost.Booster()
+        with open(os.path.join(self.directory, "booster.ubj"), "rb") as file_obj:
+            booster.load_model(bytearray(file_obj.read()))
+        return booster
+
+    def __repr__(self):
+        return f"ModelBundle({self.manifest['model_name']}, checksum={self.checksum[:12]})"
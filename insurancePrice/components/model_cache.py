@@ -0,0 +1,319 @@
+import sys
+import threading
+import hashlib
+import json
+import os
+import pickle
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+from insurancePrice.components.model_bundle import ModelBundle
+from insurancePrice.components.onnx_model import OnnxCostModel
+from insurancePrice.components.premium_table import PremiumLookupTable
+from insurancePrice.components.tree_ensemble import FlatCostModel
+from insurancePrice.configuration.s3_operations import S3Operation
+from insurancePrice.constants import *
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+from insurancePrice.utils.serving_utils import configure_inference_threads
+
+
+
+@dataclass(frozen=True)
+class ServedModel:
+    model: object
+    version: str
+    premium_table: Optional[PremiumLookupTable] = None
+    loaded_at: float = field(default_factory=time.time)
+
+
+
+class ModelCache:
+    """
+    Process wide holder for the model that is served from the s3 bucket.
+
+    The model is fetched once and shared by every request. Concurrent first
+    requests wait on the same fetch, and once the revalidation interval has
+    passed the S3 object version (VersionId, or ETag and LastModified) is
+    checked with a HEAD request on a background thread, so steady state
+    predictions never touch the network. start_watcher runs the same check on
+    a fixed interval without waiting for traffic.
+
+    A new version is downloaded and warmed off the request path and then
+    swapped in as one ServedModel, so a request sees either the old or the new
+    model (with its premium table) and in-flight requests finish on the one
+    they started with. If the new version fails to load or warm up the
+    previous model keeps serving.
+
+    With the "flat" backend the FlatCostModel arrays are served instead of the
+    pickled CostModel, so neither sklearn nor xgboost is loaded. Its arrays are
+    memory mapped from FLAT_MODEL_MMAP_DIR and shared by every worker. The
+    "bundle" backend serves the same model from the checksummed model bundle,
+    unpacked once into MODEL_BUNDLE_LOCAL_DIR and memory mapped from there.
+    The "onnx" backend runs the exported pipeline with onnxruntime.
+
+    A premium lookup table in the bucket is loaded (memory mapped) along with
+    the model, but only when it was built from the exact model bytes served.
+    """
+    def __init__(self,
+                 bucket_name: str = BUCKET_NAME,
+                 model_key: Optional[str] = None,
+                 revalidate_seconds: float = MODEL_CACHE_REVALIDATE_SECONDS,
+                 backend: str = MODEL_SERVING_BACKEND,
+                 serve_premium_table: bool = SERVE_PREMIUM_TABLE):
+        model_keys = {
+            "pickle": S3_MODEL_NAME,
+            "flat": S3_FLAT_MODEL_NAME,
+            "bundle": S3_MODEL_BUNDLE_NAME,
+            "onnx": S3_ONNX_MODEL_NAME,
+        }
+        if backend not in model_keys:
+            raise ValueError(f"Unknown model serving backend {backend}")
+        self.bucket_name = bucket_name
+        self.backend = backend
+        self.model_key = model_key or model_keys[backend]
+        self.deserializer = {
+            "pickle": pickle.loads,
+            "flat": self._deserialize_flat,
+            "bundle": self._deserialize_bundle,
+            "onnx": OnnxCostModel.from_bytes,
+        }[backend]
+        self.serve_premium_table = serve_premium_table
+        self.revalidate_seconds = revalidate_seconds
+        self.warm_up_fn: Optional[Callable[[object], None]] = None
+        self._s3: Optional[S3Operation] = None
+        self._served: Optional[ServedModel] = None
+        self.load_timings: Dict[str, float] = {}
+        self._last_checked: float = 0.0
+        self._load_lock = threading.Lock()
+        self._revalidate_lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_stopped = threading.Event()
+        self.swaps = 0
+        self.failed_refreshes = 0
+        self.last_error: Optional[str] = None
+        self._failed_version: Optional[str] = None
+
+    @property
+    def s3(self) -> S3Operation:
+        if self._s3 is None:
+            self._s3 = S3Operation()
+        return self._s3
+
+    @property
+    def version(self) -> Optional[str]:
+        served = self._served
+        return served.version if served is not None else None
+
+    @property
+    def premium_table(self) -> Optional[PremiumLookupTable]:
+        served = self._served
+        return served.premium_table if served is not None else None
+
+    def get_model(self) -> object:
+
+        """
+        Method Name :   get_model
+
+        Description :   This method returns the cached model, loading it on first use and scheduling a revalidation when it is stale.
+
+        Output      :   Model
+        """
+        return self.get_served().model
+
+    def get_served(self) -> ServedModel:
+
+        """
+        Method Name :   get_served
+
+        Description :   This method returns the served model together with its version and premium table as one snapshot.
+
+        Output      :   Served model
+        """
+        try:
+            served = self._served
+            if served is None:
+                with self._load_lock:
+                    # Another request may have finished the fetch while we were waiting
+                    if self._served is None:
+                        self._served = self._fetch()
+                        self._last_checked = time.monotonic()
+                    served = self._served
+
+            elif (
+                self.revalidate_seconds > 0
+                and time.monotonic() - self._last_checked >= self.revalidate_seconds
+                and self._revalidate_lock.acquire(blocking=False)
+            ):
+                threading.Thread(
+                    target=self._revalidate, name="model-cache-revalidate", daemon=True
+                ).start()
+
+            return served
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def _fetch(self) -> ServedModel:
+        logging.info("Entered the _fetch method of ModelCache class")
+        digests, timings = [], {}
+        started = time.perf_counter()
+
+        def deserialize(data: bytes) -> object:
+            fetched = time.perf_counter()
+            timings["model_fetch_seconds"] = fetched - started
+            digests.append(hashlib.sha256(data).hexdigest())
+            model = self.deserializer(data)
+            timings["model_deserialize_seconds"] = time.perf_counter() - fetched
+            return model
+
+        model, version = self.s3.load_model_with_version(
+            self.model_key, self.bucket_name, deserializer=deserialize
+        )
+        configure_inference_threads(model)
+
+        table_started = time.perf_counter()
+        premium_table = self._load_premium_table(digests[0]) if self.serve_premium_table else None
+        timings["premium_table_seconds"] = time.perf_counter() - table_started
+
+        self.load_timings = timings
+        logging.info(f"Fetched model {self.model_key} with version {version} from s3 bucket")
+        return ServedModel(model=model, version=version, premium_table=premium_table)
+
+    @staticmethod
+    def _deserialize_flat(data: bytes) -> FlatCostModel:
+        # One directory per model version, workers loading the same version map the same files
+        directory = os.path.join(FLAT_MODEL_MMAP_DIR, hashlib.sha256(data).hexdigest())
+        return FlatCostModel.from_bytes(data).to_mmap(directory)
+
+    @staticmethod
+    def _deserialize_bundle(data: bytes) -> FlatCostModel:
+        # Checked against the manifest checksums before anything is written
+        return ModelBundle.unpack(data, MODEL_BUNDLE_LOCAL_DIR).load_flat_model()
+
+    def _load_premium_table(self, model_digest: str) -> Optional[PremiumLookupTable]:
+        try:
+            meta_file_path = self.s3.download_file(
+                S3_PREMIUM_TABLE_META_NAME, self.bucket_name,
+                os.path.join(PREMIUM_TABLE_LOCAL_DIR, S3_PREMIUM_TABLE_META_NAME),
+            )
+            with open(meta_file_path) as file_obj:
+                model_digests = json.load(file_obj).get("model_digests", [])
+            if model_digest not in model_digests:
+                logging.info("Premium table in the bucket was built for another model, not serving it")
+                return None
+
+            table_file_path = self.s3.download_file(
+                S3_PREMIUM_TABLE_NAME, self.bucket_name,
+                os.path.join(PREMIUM_TABLE_LOCAL_DIR, S3_PREMIUM_TABLE_NAME),
+            )
+            return PremiumLookupTable.load(table_file_path, meta_file_path)
+
+        except Exception as e:
+            # predictions fall back to the model
+            logging.info(f"No premium table loaded: {e}")
+            return None
+
+    def refresh(self) -> bool:
+
+        """
+        Method Name :   refresh
+
+        Description :   This method checks the model version with a HEAD request and swaps in a downloaded and warmed new version.
+
+        Output      :   True when a new model was swapped in
+        """
+        logging.info("Entered the refresh method of ModelCache class")
+        version = None
+        try:
+            version = self.s3.get_object_version(self.bucket_name, self.model_key)
+            self._last_checked = time.monotonic()
+            if self._served is not None and version in (self._served.version, self._failed_version):
+                # A version that failed to load is not downloaded again until the object changes
+                return False
+
+            with self._load_lock:
+                # A first load or another refresh may have swapped in this version while we were waiting
+                if self._served is not None and version in (self._served.version, self._failed_version):
+                    return False
+
+                logging.info(f"Model version changed from {self.version} to {version}, loading it")
+                served = self._fetch()
+                if self.warm_up_fn is not None:
+                    self.warm_up_fn(served.model)
+
+                # One reference assignment, requests read either the old or the new snapshot
+                self._served = served
+                self.swaps += 1
+                self.last_error = None
+            logging.info(f"Swapped in model version {served.version}")
+            return True
+
+        except Exception as e:
+            # keep serving the cached model, the next check will retry
+            self._last_checked = time.monotonic()
+            self.failed_refreshes += 1
+            self._failed_version = version
+            self.last_error = str(e)
+            logging.info(f"Model refresh failed, keeping model version {self.version}: {e}")
+            return False
+
+    def _revalidate(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            self._revalidate_lock.release()
+
+    def start_watcher(self, interval_seconds: float = MODEL_WATCH_INTERVAL_SECONDS) -> None:
+
+        """
+        Method Name :   start_watcher
+
+        Description :   This method starts a daemon thread that polls the model object version every interval_seconds.
+
+        Output      :   None
+        """
+        if interval_seconds <= 0 or self._watcher is not None:
+            return
+        self._watcher_stopped.clear()
+
+        def watch() -> None:
+            while not self._watcher_stopped.wait(interval_seconds):
+                # Skipping the round when a request triggered revalidation is already running
+                if self._revalidate_lock.acquire(blocking=False):
+                    self._revalidate()
+
+        self._watcher = threading.Thread(target=watch, name="model-cache-watcher", daemon=True)
+        self._watcher.start()
+        logging.info(f"Started model watcher polling {self.model_key} every {interval_seconds} seconds")
+
+    def stop_watcher(self) -> None:
+        self._watcher_stopped.set()
+        self._watcher = None
+
+    def snapshot(self) -> Dict:
+        served = self._served
+        return {
+            "model": repr(served.model) if served is not None else None,
+            "version": served.version if served is not None else None,
+            "loaded_at": served.loaded_at if served is not None else None,
+            "premium_table": served is not None and served.premium_table is not None,
+            "backend": self.backend,
+            "swaps": self.swaps,
+            "failed_refreshes": self.failed_refreshes,
+            "last_error": self.last_error,
+        }
+
+    def reset_after_fork(self) -> None:
+        """
+        Drops the s3 client and watcher state inherited from the pre-fork master, the served model is kept.
+        """
+        self._s3 = None
+        self._load_lock = threading.Lock()
+        self._revalidate_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_stopped = threading.Event()
+
+
+
+model_cache = ModelCache()
@@ -1,106 +1,467 @@
 from insurancePrice.logger import logging
 import sys
-from typing import Dict
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from pandas import DataFrame
 import pandas as pd
 from insurancePrice.constants import *
-from insurancePrice.configuration.s3_operations import S3Operation
+from insurancePrice.utils.main_utils import MainUtils
+from insurancePrice.components.model_cache import ModelCache, model_cache
 from insurancePrice.exception import InsuranceException
 
 
 
-class insuranceData:
-    def __init__(
-        self,
-        age,
-        sex,
-        bmi,
-        children,
-        smoker,
-        region,
-        
-    ):
-        self.age = age
-        self.sex = sex
-        self.bmi = bmi
-        self.children = children
-        self.smoker = smoker
-        self.region = region
-        
+@lru_cache(maxsize=None)
+def read_schema_config(file_path: str = SCHEMA_FILE_PATH) -> Dict:
+    # Parsed once per process, every request shares the same (read only) dict
+    return MainUtils().read_yaml_file(filename=file_path)
 
 
-    def get_data(self) -> Dict:
+class insuranceBatchData:
+    def __init__(self, records: List[Dict]):
+        self.records = records
+        self.schema_config = read_schema_config()
+
+    def get_feature_columns(self) -> Dict[str, str]:
 
         """
-        Method Name :   get_data
+        Method Name :   get_feature_columns
+
+        Description :   This method gets the input feature columns and their dtypes from the schema file.
 
-        Description :   This method gets data. 
-        
-        Output      :    Input data in dictionary
+        Output      :    Dictionary of column name to dtype
         """
-        logging.info("Entered get_data method of insuranceData class")
-        try:
-            # Saving the features as dictionary
-            input_data = {
-                "age": [self.age],
-                "sex": [self.sex],
-                "bmi": [self.bmi],
-                "children": [self.children],
-                "smoker": [self.smoker],
-                "region": [self.region]
-            }
-
-            logging.info("Exited get_data method of SensorData class")
-            return input_data
+        columns = {}
+        for column in self.schema_config["columns"]:
+            columns.update(column)
+        columns.pop(self.schema_config["target_column"], None)
+        return columns
+
+    def get_synthetic_data_frame(self, n_rows: int, seed: int = 0) -> DataFrame:
+
+        """
+        Method Name :   get_synthetic_data_frame
+
+        Description :   This method draws n_rows random rows from the domain block of the schema file.
+
+        Output      :    DataFrame
+        """
+        rng = np.random.default_rng(seed)
+        domain = self.schema_config["domain"]
+        data = {}
+        for column, dtype in self.get_feature_columns().items():
+            values = domain[column]
+            if isinstance(values, list):
+                data[column] = rng.choice(np.asarray(values, dtype=object), size=n_rows)
+            elif dtype.startswith("int"):
+                data[column] = rng.integers(values["min"], values["max"] + 1, size=n_rows).astype(dtype)
+            else:
+                data[column] = np.round(rng.uniform(values["min"], values["max"], size=n_rows), 1).astype(dtype)
+        return pd.DataFrame(data)
 
-        except Exception as e:
-            raise InsuranceException(e, sys)
 
-    def get_input_data_frame(self) -> DataFrame:
+@dataclass
+class EncodedBatch:
+    """
+    Columnar batch: numerical columns as float64 arrays, categorical columns
+    as dictionary indices (-1 for unknown) with their small dictionaries.
+    """
+    numerical: Dict[str, np.ndarray]
+    indices: Dict[str, np.ndarray]
+    dictionaries: Dict[str, List[str]]
+    n_rows: int
 
+    def get_codes(self, categories: Dict[str, List[str]]) -> Dict[str, np.ndarray]:
         """
-        Method Name :   get_input_data_frame
+        Positions in categories of every row, mapping each dictionary once and the rows with a single take.
+        """
+        codes = {}
+        for column, column_categories in categories.items():
+            positions = {category: code for code, category in enumerate(column_categories)}
+            # The extra last entry maps the -1 indices to -1
+            mapping = np.array(
+                [positions.get(value, -1) for value in self.dictionaries[column]] + [-1], dtype=np.int64
+            )
+            codes[column] = mapping.take(self.indices[column])
+        return codes
 
-        Description :   This method converts dictionary data into dataframe. 
-        
-        Output      :    DataFrame 
+    def take(self, mask: np.ndarray) -> "EncodedBatch":
+        return EncodedBatch(
+            numerical={column: values[mask] for column, values in self.numerical.items()},
+            indices={column: values[mask] for column, values in self.indices.items()},
+            dictionaries=self.dictionaries,
+            n_rows=int(np.count_nonzero(mask)),
+        )
+
+    @classmethod
+    def concat(cls, batches: List["EncodedBatch"]) -> "EncodedBatch":
+        """
+        Rows of batches sharing the same dictionaries (as decoded by one insuranceRequestDecoder), in order.
         """
-        logging.info(
-            "Entered get_input_data_frame method of  class"
+        first = batches[0]
+        if len(batches) == 1:
+            return first
+        return cls(
+            numerical={column: np.concatenate([batch.numerical[column] for batch in batches]) for column in first.numerical},
+            indices={column: np.concatenate([batch.indices[column] for batch in batches]) for column in first.indices},
+            dictionaries=first.dictionaries,
+            n_rows=sum(batch.n_rows for batch in batches),
         )
+
+    def to_data_frame(self) -> DataFrame:
+        # Categorical columns keep their codes, for models that only take dataframes
+        data = dict(self.numerical)
+        for column, indices in self.indices.items():
+            data[column] = pd.Categorical.from_codes(indices, categories=self.dictionaries[column])
+        return pd.DataFrame(data)
+
+
+class RequestValidationError(ValueError):
+    """
+    Request fields failing the schema checks, one {"field", "error"} entry per
+    field (with the first failing "rows" for batches).
+    """
+    def __init__(self, errors: List[Dict]):
+        self.errors = errors
+        super().__init__("Invalid request - " + "; ".join(
+            f"{error['field']}: {error['error']}" + (f" at rows {error['rows']}" if "rows" in error else "")
+            for error in errors
+        ))
+
+
+class insuranceRequestDecoder:
+    """
+    Typed decoder of prediction requests, built once per process from the
+    schema file.
+
+    Numerical fields are parsed to float64 and checked against the
+    request_limits block (and to be whole numbers for the int columns), the
+    categorical fields are mapped to their position in the domain block. The
+    result is an EncodedBatch, scored by the model without a dataframe. Bad
+    input raises a RequestValidationError naming every failing field.
+    """
+    def __init__(self, schema_config: Optional[Dict] = None):
+        self.schema_config = schema_config or read_schema_config()
+        feature_columns = insuranceBatchData(records=[]).get_feature_columns()
+        limits = self.schema_config["request_limits"]
+        domain = self.schema_config["domain"]
+
+        # column -> (whole numbers only, min, max)
+        self.numerical_columns = {
+            column: (dtype.startswith("int"), float(limits[column]["min"]), float(limits[column]["max"]))
+            for column, dtype in feature_columns.items()
+            if dtype != "object"
+        }
+        self.categories = {
+            column: list(domain[column]) for column, dtype in feature_columns.items() if dtype == "object"
+        }
+        self.category_codes = {
+            column: {category: code for code, category in enumerate(categories)}
+            for column, categories in self.categories.items()
+        }
+
+    @staticmethod
+    def to_number(value: object) -> float:
+        # nan for anything that is not a number or a numeric string, rejected by the range check
         try:
-            # Getting the data in dictionary format
-            input_dict = self.get_data()
+            return float(value)
+        except (TypeError, ValueError, OverflowError):
+            return np.nan
 
-            logging.info("Got data as dict")
-            logging.info(
-                "Exited get_input_data_frame method of  class"
-            )
-            return pd.DataFrame(input_dict)
+    def get_error(self, column: str, value: object = 0) -> str:
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return "missing"
+        if column in self.category_codes:
+            return f"expected one of {self.categories[column]}"
+        is_integer, low, high = self.numerical_columns[column]
+        return f"expected {'an integer' if is_integer else 'a number'} between {low:g} and {high:g}"
+
+    def get_invalid_rows(self, column: str, values: np.ndarray) -> np.ndarray:
+        is_integer, low, high = self.numerical_columns[column]
+        # nan compares False and fails the range check
+        valid = (values >= low) & (values <= high)
+        if is_integer:
+            valid &= values == np.floor(values)
+        return np.flatnonzero(~valid)
+
+    def decode_record(self, record: object) -> EncodedBatch:
+
+        """
+        Method Name :   decode_record
+
+        Description :   This method parses and checks the fields of a single request (a dict or a submitted form) once.
+
+        Output      :   Encoded batch of one row
+        """
+        errors = []
+        numerical, indices = {}, {}
+        for column, (is_integer, low, high) in self.numerical_columns.items():
+            value = record.get(column)
+            number = self.to_number(value)
+            if not (low <= number <= high) or (is_integer and not number.is_integer()):
+                errors.append({"field": column, "error": self.get_error(column, value)})
+                continue
+            numerical[column] = np.array([number])
+
+        for column, category_codes in self.category_codes.items():
+            value = record.get(column)
+            code = category_codes.get(value) if isinstance(value, str) else None
+            if code is None:
+                errors.append({"field": column, "error": self.get_error(column, value)})
+                continue
+            indices[column] = np.array([code], dtype=np.int64)
+
+        if errors:
+            raise RequestValidationError(errors)
+        return EncodedBatch(numerical, indices, self.categories, 1)
+
+    def decode_records(self, records: object) -> EncodedBatch:
+
+        """
+        Method Name :   decode_records
+
+        Description :   This method parses and checks a list of records column by column into preallocated arrays.
+
+        Output      :   Encoded batch
+        """
+        logging.info("Entered decode_records method of insuranceRequestDecoder class")
+        if not isinstance(records, list) or len(records) == 0:
+            raise ValueError("Expected a non empty list of records")
+        if len(records) > BATCH_PREDICTION_MAX_ROWS:
+            raise ValueError(f"Batch has {len(records)} records, the limit is {BATCH_PREDICTION_MAX_ROWS}")
+        if not all(isinstance(record, dict) for record in records):
+            raise ValueError("Every record must be a JSON object")
+
+        n_rows = len(records)
+        errors = []
+        numerical, indices = {}, {}
+        for column in self.numerical_columns:
+            values = [record.get(column) for record in records]
+            numerical[column] = column_values = np.empty(n_rows, dtype=np.float64)
+            try:
+                # numpy converts numbers and numeric strings in one pass, None becomes nan
+                column_values[:] = values
+            except (TypeError, ValueError, OverflowError):
+                column_values[:] = [self.to_number(value) for value in values]
+
+            invalid_rows = self.get_invalid_rows(column, column_values)
+            if len(invalid_rows):
+                errors.append({"field": column, "error": self.get_error(column), "rows": invalid_rows[:10].tolist()})
+
+        for column, category_codes in self.category_codes.items():
+            values = [record.get(column) for record in records]
+            indices[column] = column_indices = np.empty(n_rows, dtype=np.int64)
+            column_indices[:] = [category_codes.get(value, -1) if isinstance(value, str) else -1 for value in values]
+            invalid_rows = np.flatnonzero(column_indices < 0)
+            if len(invalid_rows):
+                errors.append({"field": column, "error": self.get_error(column), "rows": invalid_rows[:10].tolist()})
+
+        if errors:
+            raise RequestValidationError(errors)
+
+        logging.info("Exited decode_records method of insuranceRequestDecoder class")
+        return EncodedBatch(numerical, indices, self.categories, n_rows)
+
+    def encode_data_frame(self, X: DataFrame) -> Tuple[EncodedBatch, np.ndarray]:
+
+        """
+        Method Name :   encode_data_frame
+
+        Description :   This method encodes the columns of a dataframe with the same checks, flagging the failing rows instead of raising.
+
+        Output      :   Encoded batch and the mask of the valid rows
+        """
+        missing = [column for column in [*self.numerical_columns, *self.categories] if column not in X.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {missing}")
+
+        valid = np.ones(len(X), dtype=bool)
+        numerical, indices = {}, {}
+        for column in self.numerical_columns:
+            values = pd.to_numeric(X[column], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            valid[self.get_invalid_rows(column, values)] = False
+            numerical[column] = values
+
+        for column, categories in self.categories.items():
+            # Values outside the domain (or not strings) get the code -1
+            indices[column] = pd.Categorical(X[column], categories=categories).codes.astype(np.int64)
+            valid &= indices[column] >= 0
+
+        return EncodedBatch(numerical, indices, self.categories, len(X)), valid
+
+    def check_batch(self, batch: EncodedBatch) -> EncodedBatch:
+
+        """
+        Method Name :   check_batch
+
+        Description :   This method applies the same checks to a batch decoded elsewhere, such as an Arrow body.
+
+        Output      :   The same encoded batch
+        """
+        errors = []
+        for column in self.numerical_columns:
+            invalid_rows = self.get_invalid_rows(column, batch.numerical[column])
+            if len(invalid_rows):
+                errors.append({"field": column, "error": self.get_error(column), "rows": invalid_rows[:10].tolist()})
+
+        for column, codes in batch.get_codes(self.categories).items():
+            invalid_rows = np.flatnonzero(codes < 0)
+            if len(invalid_rows):
+                errors.append({"field": column, "error": self.get_error(column), "rows": invalid_rows[:10].tolist()})
+
+        if errors:
+            raise RequestValidationError(errors)
+        return batch
+
+
+class insuranceArrowData:
+    """
+    Arrow IPC (stream or file) or Parquet request body. pyarrow is imported
+    lazily, only this endpoint needs it.
+    """
+    def __init__(self, body: bytes, content_type: str = ""):
+        self.body = body
+        self.content_type = content_type
+        self.batch_data = insuranceBatchData(records=[])
+        self.schema_config = self.batch_data.schema_config
+
+    def read_table(self) -> object:
+
+        """
+        Method Name :   read_table
+
+        Description :   This method reads the body as a Parquet file, an Arrow IPC file or an Arrow IPC stream.
+
+        Output      :   Arrow table
+        """
+        import pyarrow as pa
+
+        # Wraps the request bytes, the IPC readers hand out buffers pointing into them
+        source = pa.BufferReader(self.body)
+        if "parquet" in self.content_type or self.body[:4] == b"PAR1":
+            import pyarrow.parquet as pq
+
+            return pq.read_table(source, read_dictionary=self.schema_config["categorical_columns"])
+        if self.body[:6] == b"ARROW1":
+            return pa.ipc.open_file(source).read_all()
+        return pa.ipc.open_stream(source).read_all()
+
+    @staticmethod
+    def is_string_type(arrow_type: object) -> bool:
+        import pyarrow as pa
+
+        return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+    def get_encoded_batch(self) -> EncodedBatch:
+
+        """
+        Method Name :   get_encoded_batch
+
+        Description :   This method validates the Arrow columns against the schema file and takes their buffers without building Python objects per row.
+
+        Output      :   Encoded batch
+        """
+        logging.info("Entered get_encoded_batch method of insuranceArrowData class")
+        try:
+            import pyarrow as pa
+            import pyarrow.compute as pc
+
+            table = self.read_table()
+            if table.num_rows == 0:
+                raise ValueError("Expected a non empty batch")
+            if table.num_rows > BATCH_PREDICTION_MAX_ROWS:
+                raise ValueError(f"Batch has {table.num_rows} rows, the limit is {BATCH_PREDICTION_MAX_ROWS}")
+
+            feature_columns = self.batch_data.get_feature_columns()
+            missing = [column for column in feature_columns if column not in table.column_names]
+            if missing:
+                raise ValueError(f"Missing columns: {missing}")
+            # Chunks read from several record batches may carry different dictionaries
+            table = table.select(list(feature_columns)).unify_dictionaries()
+
+            errors = []
+            numerical, indices, dictionaries = {}, {}, {}
+            for column, dtype in feature_columns.items():
+                values = table.column(column).combine_chunks()
+                if values.null_count:
+                    errors.append(f"{column}: {values.null_count} null values")
+                    continue
+
+                if dtype == "object":
+                    if self.is_string_type(values.type):
+                        values = pc.dictionary_encode(values)
+                    if not (pa.types.is_dictionary(values.type) and self.is_string_type(values.type.value_type)):
+                        errors.append(f"{column}: expected string or dictionary of strings, got {values.type}")
+                        continue
+                    dictionary = values.dictionary.to_pylist()
+                    column_indices = values.indices.to_numpy(zero_copy_only=False)
+                    empty = [position for position, value in enumerate(dictionary) if not value]
+                    if empty and np.isin(column_indices, empty).any():
+                        errors.append(f"{column}: empty strings")
+                        continue
+                    indices[column], dictionaries[column] = column_indices, dictionary
+
+                else:
+                    if not (pa.types.is_integer(values.type) or pa.types.is_floating(values.type)):
+                        errors.append(f"{column}: expected {dtype}, got {values.type}")
+                        continue
+                    # Zero copy for float64 columns, one cast for the others
+                    column_values = values.to_numpy(zero_copy_only=False).astype(np.float64, copy=False)
+                    if np.isnan(column_values).any() or (
+                        dtype.startswith("int") and not np.array_equal(column_values, np.floor(column_values))
+                    ):
+                        errors.append(f"{column}: expected {dtype}")
+                        continue
+                    numerical[column] = column_values
+
+            if errors:
+                raise ValueError("Invalid batch columns - " + "; ".join(errors))
+
+            logging.info("Exited get_encoded_batch method of insuranceArrowData class")
+            return EncodedBatch(numerical, indices, dictionaries, table.num_rows)
+
+        except (ValueError, ImportError):
+            raise
 
         except Exception as e:
             raise InsuranceException(e, sys) from e
 
+    @staticmethod
+    def to_ipc_stream(predictions: np.ndarray) -> bytes:
+        """
+        Predictions as an Arrow IPC stream of one record batch with a float64 prediction column.
+        """
+        import pyarrow as pa
+
+        batch = pa.record_batch([pa.array(predictions, type=pa.float64())], names=["prediction"])
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
 
 class CostPredictor:
-    def __init__(self):
-        self.s3 = S3Operation()
-        self.bucket_name = BUCKET_NAME
+    def __init__(self, cache: ModelCache = model_cache):
+        self.model_cache = cache
+        self.bucket_name = cache.bucket_name
 
     def predict(self, X) -> float:
 
         """
         Method Name :   predict
 
-        Description :   This method predicts the data. 
-        
-        Output      :   Predictions 
+        Description :   This method predicts the data.
+
+        Output      :   Predictions
         """
         logging.info("Entered predict method of the class")
         try:
-            # Loading the best model from s3 bucket
-            best_model = self.s3.load_model(MODEL_FILE_NAME, self.bucket_name)
-            logging.info("Loaded best model from s3 bucket")
+            # Getting the best model from the process wide model cache
+            best_model = self.model_cache.get_model()
+            logging.info("Got best model from model cache")
 
             # Predicting with best model
             result = best_model.predict(X)
@@ -109,3 +470,159 @@ class CostPredictor:
 
         except Exception as e:
             raise InsuranceException(e, sys) from e
+
+    def predict_batch(self, X: DataFrame, chunk_size: int = BATCH_PREDICTION_CHUNK_SIZE) -> np.ndarray:
+
+        """
+        Method Name :   predict_batch
+
+        Description :   This method answers the rows on the premium table grid from the table, dedupes the other rows and predicts them in chunks with one model call per chunk.
+
+        Output      :   Predictions in the order of the input rows
+        """
+        logging.info("Entered predict_batch method of CostPredictor class")
+        try:
+            served = self.model_cache.get_served()
+            best_model, premium_table = served.model, served.premium_table
+
+            if premium_table is not None:
+                premiums, on_grid = premium_table.lookup(X)
+                logging.info(f"Answered {on_grid.sum()} of {len(X)} rows from the premium table")
+                if not on_grid.all():
+                    premiums[~on_grid] = self.predict_batch_with_model(best_model, X.loc[~on_grid], chunk_size)
+                return premiums
+
+            return self.predict_batch_with_model(best_model, X, chunk_size)
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def predict_encoded_batch(self, batch: EncodedBatch, chunk_size: int = BATCH_PREDICTION_CHUNK_SIZE) -> np.ndarray:
+
+        """
+        Method Name :   predict_encoded_batch
+
+        Description :   This method answers the on grid rows of an encoded batch from the premium table and predicts the others from the codes.
+
+        Output      :   Predictions in the order of the input rows
+        """
+        logging.info("Entered predict_encoded_batch method of CostPredictor class")
+        try:
+            served = self.model_cache.get_served()
+            best_model, premium_table = served.model, served.premium_table
+
+            if premium_table is not None:
+                premiums, on_grid = premium_table.lookup_encoded(
+                    batch.numerical, batch.get_codes(premium_table.categories), batch.n_rows
+                )
+                logging.info(f"Answered {on_grid.sum()} of {batch.n_rows} rows from the premium table")
+                if not on_grid.all():
+                    premiums[~on_grid] = self.predict_encoded_with_model(best_model, batch.take(~on_grid), chunk_size)
+                return premiums
+
+            return self.predict_encoded_with_model(best_model, batch, chunk_size)
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    @staticmethod
+    def predict_encoded_with_model(best_model: object, batch: EncodedBatch, chunk_size: int) -> np.ndarray:
+
+        """
+        Method Name :   predict_encoded_with_model
+
+        Description :   This method predicts an encoded batch in chunks from its category codes, through a dataframe for models without an encoded path.
+
+        Output      :   Predictions in the order of the input rows
+        """
+        categories = getattr(best_model, "categories", None)
+        if categories is None:
+            # Uncompiled pickles and ONNX graphs take the categories as values
+            return CostPredictor.predict_batch_with_model(best_model, batch.to_data_frame(), chunk_size)
+
+        codes = batch.get_codes(categories)
+        if batch.n_rows == 1:
+            return np.asarray(best_model.predict_encoded(batch.numerical, codes), dtype=np.float64)
+
+        # Scoring every distinct row once and fanning the result back out, as for dataframes
+        keys = pd.DataFrame({**batch.numerical, **codes})
+        row_codes = keys.groupby(list(keys.columns), sort=False).ngroup().to_numpy()
+        unique_rows = np.flatnonzero(~keys.duplicated().to_numpy())
+        numerical = {column: values[unique_rows] for column, values in batch.numerical.items()}
+        codes = {column: values[unique_rows] for column, values in codes.items()}
+
+        unique_preds = np.concatenate([
+            np.asarray(best_model.predict_encoded(
+                {column: values[start:start + chunk_size] for column, values in numerical.items()},
+                {column: values[start:start + chunk_size] for column, values in codes.items()},
+            ), dtype=np.float64)
+            for start in range(0, len(unique_rows), chunk_size)
+        ])
+        logging.info(f"Predicted {len(unique_rows)} unique rows out of {batch.n_rows} rows")
+        return unique_preds[row_codes]
+
+    def warm_up(self, n_rows: int = WARMUP_BATCH_SIZE) -> Dict[str, float]:
+
+        """
+        Method Name :   warm_up
+
+        Description :   This method loads the model and runs a synthetic batch through the batch, model and single record paths.
+
+        Output      :   Model load and warm up timings in seconds
+        """
+        logging.info("Entered warm_up method of CostPredictor class")
+        try:
+            best_model = self.model_cache.get_model()
+            timings = dict(self.model_cache.load_timings)
+
+            started = time.perf_counter()
+            self.warm_up_model(best_model, n_rows)
+            X = insuranceBatchData(records=[]).get_synthetic_data_frame(n_rows)
+            self.predict_batch(X)
+            timings["warm_up_seconds"] = time.perf_counter() - started
+
+            logging.info(f"Warmed up {best_model} with {n_rows} synthetic rows")
+            logging.info("Exited warm_up method of CostPredictor class")
+            return timings
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    @staticmethod
+    def warm_up_model(best_model: object, n_rows: int = WARMUP_BATCH_SIZE) -> None:
+
+        """
+        Method Name :   warm_up_model
+
+        Description :   This method runs a synthetic batch and record through a model before it serves traffic.
+
+        Output      :   None
+        """
+        X = insuranceBatchData(records=[]).get_synthetic_data_frame(n_rows)
+        best_model.predict(X)
+        best_model.predict_record(X.iloc[0].to_dict())
+
+    @staticmethod
+    def predict_batch_with_model(best_model: object, X: DataFrame, chunk_size: int) -> np.ndarray:
+
+        """
+        Method Name :   predict_batch_with_model
+
+        Description :   This method dedupes identical rows and predicts the unique rows in chunks with one model call per chunk.
+
+        Output      :   Predictions in the order of the input rows
+        """
+        try:
+            # Scoring every distinct row once and fanning the result back out
+            row_codes = X.groupby(list(X.columns), sort=False, dropna=False).ngroup().to_numpy()
+            unique_rows = X.loc[~X.duplicated()]
+
+            unique_preds = np.concatenate([
+                np.asarray(best_model.predict(unique_rows.iloc[start:start + chunk_size]), dtype=np.float64)
+                for start in range(0, len(unique_rows), chunk_size)
+            ])
+            logging.info(f"Predicted {len(unique_rows)} unique rows out of {len(X)} rows")
+            return unique_preds[row_codes]
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
@@ -1,5 +1,6 @@
 import sys
 from insurancePrice.configuration.s3_operations import S3Operation
+from insurancePrice.constants import MODEL_SERVING_BACKEND
 from insurancePrice.entity.artifact_entity import (
     DataTransformationArtifact,
     ModelTrainerArtifact,
@@ -25,6 +26,13 @@ class ModelPusher:
         self.data_transformation_artifacts = data_transformation_artifacts
         self.s3 = s3
 
+    # this method is used to upload an artifact, or delete the stale one of an earlier run
+    def push_file(self, file_path: str, s3_key: str) -> None:
+        if file_path is None:
+            self.s3.delete_file(s3_key, self.model_pusher_config.BUCKET_NAME)
+        else:
+            self.s3.upload_file(file_path, s3_key, self.model_pusher_config.BUCKET_NAME, remove=False)
+
     # this is method is used to initiate model pusher
     def initiate_model_pusher(self) -> ModelPusherArtifact:
 
@@ -37,14 +45,33 @@ class ModelPusher:
         """
         logging.info("Entered initiate_model_pusher method of ModelTrainer class")
         try:
-            # Uploading the best model to s3 bucket
-            self.s3.upload_file(
-                self.model_trainer_artifacts.trained_model_file_path,
-                self.model_pusher_config.S3_MODEL_KEY_PATH,
-                self.model_pusher_config.BUCKET_NAME,
-                remove=False,
-            )
-            logging.info("Uploaded best model to s3 bucket")
+            # Serving form of every backend and the s3 key it is pushed to
+            serving_forms = {
+                "pickle": (self.model_trainer_artifacts.trained_model_file_path, self.model_pusher_config.S3_MODEL_KEY_PATH),
+                "flat": (self.model_trainer_artifacts.flat_model_file_path, self.model_pusher_config.S3_FLAT_MODEL_KEY_PATH),
+                "bundle": (self.model_trainer_artifacts.model_bundle_file_path, self.model_pusher_config.S3_MODEL_BUNDLE_KEY_PATH),
+                "onnx": (self.model_trainer_artifacts.onnx_model_file_path, self.model_pusher_config.S3_ONNX_MODEL_KEY_PATH),
+            }
+            # The deployment would keep serving the previous model next to the new pickle, nothing is pushed
+            if serving_forms.get(MODEL_SERVING_BACKEND, (None, None))[0] is None:
+                raise ValueError(
+                    f"The trainer did not export the {MODEL_SERVING_BACKEND} form of the model, "
+                    f"the one MODEL_SERVING_BACKEND serves"
+                )
+
+            # Pushing every serving form of this model, the forms the trainer could not export are
+            # deleted so that no backend serves the previous model once the new pickle is pushed
+            for backend, (file_path, s3_key) in serving_forms.items():
+                self.push_file(file_path, s3_key)
+                logging.info(f"Pushed the {backend} form of the model to s3 bucket")
+
+            # Uploading the premium lookup table built for this model
+            for file_path, s3_key in (
+                (self.model_trainer_artifacts.premium_table_file_path, self.model_pusher_config.S3_PREMIUM_TABLE_KEY_PATH),
+                (self.model_trainer_artifacts.premium_table_meta_file_path, self.model_pusher_config.S3_PREMIUM_TABLE_META_KEY_PATH),
+            ):
+                self.push_file(file_path, s3_key)
+            logging.info("Pushed premium table to s3 bucket")
             logging.info("Exited initiate_model_pusher method of ModelTrainer class")
 
             # Saving the model pusher artifacts
@@ -3,10 +3,22 @@
 import os
 from insurancePrice.logger import logging
 import sys
+import numpy as np
 import pandas as pd
-from typing import List,Tuple
+from typing import Dict,List,Optional,Tuple
 from pandas import DataFrame
-from insurancePrice.constants import MODEL_CONFIG_FILE
+from insurancePrice.components.compiled_model import CompiledPreprocessor
+from insurancePrice.components.model_bundle import ModelBundle
+from insurancePrice.components.model_tuner import TuningScheduler
+from insurancePrice.components.tuning_cache import TuningCache
+from insurancePrice.components.onnx_model import OnnxCostModel
+from insurancePrice.components.premium_table import PremiumLookupTable
+from insurancePrice.components.tree_ensemble import FlatCostModel
+from insurancePrice.constants import (MODEL_CONFIG_FILE, TARGET_COLUMN, COMPILE_COST_MODEL, COMPILED_MODEL_TOLERANCE,
+                                      EXPORT_FLAT_MODEL, FLAT_MODEL_TOLERANCE, EXPORT_MODEL_BUNDLE,
+                                      EXPORT_ONNX_MODEL, ONNX_MODEL_TOLERANCE, BUILD_PREMIUM_TABLE,
+                                      PREMIUM_TABLE_CHUNK_SIZE, PARALLEL_TUNING,
+                                      TUNING_CACHE_ENABLED, DEFAULT_PREPROCESSING_PROFILE)
 from insurancePrice.entity.config_entity import ModelTrainerConfig
 from insurancePrice.entity.artifact_entity import DataTransformationArtifact, ModelTrainerArtifact
 from insurancePrice.exception import InsuranceException
@@ -18,8 +30,73 @@ class CostModel:
                  trained_model_object: object):
         self.preprocessing_object = preprocessing_object
         self.trained_model_object = trained_model_object
+        self.compiled_preprocessor = None
     
 
+    @property
+    def is_compiled(self) -> bool:
+        # models pickled before compilation existed have no compiled_preprocessor attribute
+        return getattr(self, "compiled_preprocessor", None) is not None
+
+
+    def compile(self) -> "CostModel":
+        """
+        Method Name :   compile
+
+        Description :   This method builds the NumPy form of the preprocessor used by the fast prediction path.
+
+        Output      :   Compiled cost model
+        """
+        logging.info("Entered the compile method of CostModel class.")
+        try:
+            self.compiled_preprocessor = CompiledPreprocessor.from_column_transformer(self.preprocessing_object)
+            logging.info("Exited the compile method of CostModel class.")
+            return self
+
+        except Exception as e:
+            raise InsuranceException(e,sys) from e
+
+
+    def verify_compiled(self, X: DataFrame, tolerance: float = COMPILED_MODEL_TOLERANCE) -> float:
+        """
+        Method Name :   verify_compiled
+
+        Description :   This method compares the compiled and sklearn predictions on X and drops the compiled form if they differ.
+
+        Output      :   Max absolute prediction difference
+        """
+        logging.info("Entered the verify_compiled method of CostModel class.")
+        try:
+            if not self.is_compiled or len(X) == 0:
+                return 0.0
+
+            self.compiled_preprocessor.verify(self.preprocessing_object, X)
+            expected = self.trained_model_object.predict(self.preprocessing_object.transform(X))
+            compiled = self.trained_model_object.predict(self.compiled_preprocessor.transform(X))
+            max_diff = float(np.max(np.abs(np.asarray(compiled) - np.asarray(expected))))
+
+            if max_diff > tolerance:
+                logging.info(f"Compiled predictions differ by {max_diff}, dropping the compiled form")
+                self.compiled_preprocessor = None
+            logging.info(f"Compiled predictions max abs difference: {max_diff}")
+            return max_diff
+
+        except Exception as e:
+            raise InsuranceException(e,sys) from e
+
+
+    @property
+    def categories(self) -> Optional[Dict[str, List[str]]]:
+        # Only the compiled form can score category codes
+        return self.compiled_preprocessor.categories if self.is_compiled else None
+
+
+    def transform(self, X) -> np.ndarray:
+        if self.is_compiled:
+            return self.compiled_preprocessor.transform(X)
+        return self.preprocessing_object.transform(X)
+
+
     def predict(self, X) -> float:
         """
         Method Name :   predict
@@ -32,14 +109,49 @@ class CostModel:
         logging.info("Entered the predict method class.")
         try:
             # Using the trained model to get predictions
-            transformed_feature = self.preprocessing_object.transform(X)
+            transformed_feature = self.transform(X)
             logging.info("Used the trained model to get predictions")
             return self.trained_model_object.predict(transformed_feature)
         
         except Exception as e:
             raise InsuranceException(e,sys) from e
+
+
+    def predict_record(self, record: Dict) -> float:
+        """
+        Method Name :   predict_record
+
+        Description :   This method predicts a single record, without pandas when the model is compiled.
+
+        Output      :   Prediction
+        """
+        try:
+            if self.is_compiled:
+                transformed_feature = self.compiled_preprocessor.transform_record(record)
+            else:
+                transformed_feature = self.preprocessing_object.transform(pd.DataFrame([record]))
+            return float(self.trained_model_object.predict(transformed_feature)[0])
+
+        except Exception as e:
+            raise InsuranceException(e,sys) from e
         
 
+    def predict_encoded(self, numerical: Dict[str, np.ndarray], codes: Dict[str, np.ndarray]) -> np.ndarray:
+        """
+        Method Name :   predict_encoded
+
+        Description :   This method predicts numerical column arrays and category codes through the compiled preprocessor.
+
+        Output      :   Predictions
+        """
+        try:
+            transformed_feature = self.compiled_preprocessor.transform_columns(numerical, codes)
+            return self.trained_model_object.predict(transformed_feature)
+
+        except Exception as e:
+            raise InsuranceException(e,sys) from e
+
+
     def __repr__(self):
         return f"{type(self.trained_model_object).__name__}()"
 
@@ -56,14 +168,40 @@ class ModelTrainer:
         self.model_trainer_config = model_trainer_config
     
 
+    # This method is used to get the preprocessor and transformed data file paths of every preprocessing profile
+    def get_profile_file_paths(self) -> Dict[str, Dict[str, str]]:
+        # Artifacts written before the preprocessing profiles only have the default one
+        return self.data_transformation_artifact.profile_file_paths or {
+            DEFAULT_PREPROCESSING_PROFILE: {
+                "preprocessor": self.data_transformation_artifact.transformed_object_file_path,
+                "train": self.data_transformation_artifact.transformed_train_file_path,
+                "test": self.data_transformation_artifact.transformed_test_file_path,
+            }
+        }
+
+
+    # This method is used to get the transformed train and test sets of every preprocessing profile
+    def get_profile_data(self) -> Dict[str, Tuple[DataFrame, DataFrame]]:
+        return {
+            profile: (
+                pd.DataFrame(self.model_trainer_config.UTILS.load_numpy_array_data(file_paths["train"])),
+                pd.DataFrame(self.model_trainer_config.UTILS.load_numpy_array_data(file_paths["test"])),
+            )
+            for profile, file_paths in self.get_profile_file_paths().items()
+        }
+
+
     #getting the trained model
     def get_trained_models(self,
-                           x_data: DataFrame,
-                           y_data: DataFrame
+                           x_data: Dict[str, DataFrame],
+                           y_data: Dict[str, DataFrame]
                            ) ->List[Tuple[float, object, str]]:
         """
-        
-        
+        Method Name :   get_trained_models
+
+        Description :   This method tunes every model of model.yaml on the transformed train and test sets of its preprocessing profile.
+
+        Output      :   List of test score, model and model name
         """
         logging.info("Entered get_trained_models method of ModelTrainer class.")
         try:
@@ -72,19 +210,54 @@ class ModelTrainer:
             models_list = list(model_config["train_model"].keys())
             logging.info("Got models list from config file.")
 
-            # Splitting data in x_train, x_test, y_train, y_test
-            x_train, y_train, x_test, y_test = (
-                x_data.drop(x_data.columns[len(x_data.columns) - 1], axis = 1),
-                x_data.iloc[:, -1],
-                y_data.drop(y_data.columns[len(y_data.columns) - 1], axis = 1),
-                y_data.iloc[:, -1]
-            )
+            # Preprocessing profile of every model and the estimator params it needs
+            model_profiles = self.model_trainer_config.UTILS.get_preprocessing_profiles(model_config)
+            fixed_params = {
+                model_name: self.model_trainer_config.UTILS.get_profile_params(profile, self.model_trainer_config.SCHEMA_CONFIG)
+                for model_name, profile in model_profiles.items()
+            }
+
+            # Splitting data in x_train, x_test, y_train, y_test for every profile, the rows are the same in all of them
+            x_train, x_test = {}, {}
+            for profile in set(model_profiles.values()):
+                train_df, test_df = x_data[profile], y_data[profile]
+                x_train[profile], y_train, x_test[profile], y_test = (
+                    train_df.drop(train_df.columns[len(train_df.columns) - 1], axis = 1),
+                    train_df.iloc[:, -1],
+                    test_df.drop(test_df.columns[len(test_df.columns) - 1], axis = 1),
+                    test_df.iloc[:, -1]
+                )
+
+            # Tuning all the models in one process pool, with the search strategy of every model
+            if PARALLEL_TUNING:
+                tuning_cache = TuningCache() if TUNING_CACHE_ENABLED else None
+                try:
+                    tuning_scheduler = TuningScheduler(
+                        model_config["train_model"],
+                        search_configs=model_config.get("search_strategy"),
+                        checkpoint_path=self.model_trainer_config.TUNING_CHECKPOINT_FILE_PATH,
+                        tuning_cache=tuning_cache,
+                        model_profiles=model_profiles,
+                        fixed_params=fixed_params,
+                    )
+                    tuned_model_list = tuning_scheduler.tune(x_train, y_train, x_test, y_test)
+                finally:
+                    if tuning_cache is not None:
+                        tuning_cache.close()
+                logging.info(f"Tuning report: {tuning_scheduler.report}")
+                logging.info("Exited the get_trained_models method of ModelFinder class")
+                return tuned_model_list
 
             # Getting the trained models list:
             tuned_model_list = [
                 (
                     self.model_trainer_config.UTILS.get_tuned_model(
-                        model_name, x_train, y_train, x_test, y_test
+                        model_name,
+                        x_train[model_profiles[model_name]],
+                        y_train,
+                        x_test[model_profiles[model_name]],
+                        y_test,
+                        fixed_params=fixed_params[model_name],
                     )
                 )
                 for model_name in models_list
@@ -100,6 +273,170 @@ class ModelTrainer:
         
 
 
+    # This method is used to compile the cost model
+    def compile_cost_model(self, cost_model: CostModel) -> CostModel:
+        """
+        Method Name :   compile_cost_model
+
+        Description :   This method compiles the cost model and verifies it on the raw test split.
+
+        Output      :   Cost model
+        """
+        logging.info("Entered compile_cost_model method of ModelTrainer class")
+        try:
+            cost_model.compile()
+
+            if self.data_transformation_artifact.test_data_file_path is not None:
+                test_df = pd.read_csv(self.data_transformation_artifact.test_data_file_path)
+                cost_model.verify_compiled(test_df.drop(columns=[TARGET_COLUMN]))
+
+            logging.info("Exited compile_cost_model method of ModelTrainer class")
+            return cost_model
+
+        except Exception as e:
+            # the sklearn path keeps working without the compiled form
+            cost_model.compiled_preprocessor = None
+            logging.info(f"Could not compile cost model: {e}")
+            return cost_model
+
+
+
+    # This method is used to export the flat serving form of the cost model
+    def export_flat_model(self, cost_model: CostModel) -> Optional[str]:
+        """
+        Method Name :   export_flat_model
+
+        Description :   This method flattens the tree ensemble of the cost model and saves it when it matches the cost model on the raw test split.
+
+        Output      :   Flat model file path or None
+        """
+        logging.info("Entered export_flat_model method of ModelTrainer class")
+        try:
+            flat_model = FlatCostModel.from_cost_model(cost_model)
+
+            if self.data_transformation_artifact.test_data_file_path is not None:
+                test_df = pd.read_csv(self.data_transformation_artifact.test_data_file_path)
+                mismatch_ratio = flat_model.verify(
+                    cost_model, test_df.drop(columns=[TARGET_COLUMN]), rtol=FLAT_MODEL_TOLERANCE
+                )
+                if mismatch_ratio > 0:
+                    logging.info(f"Flat model mismatches on {mismatch_ratio:.2%} of the test rows, not exporting it")
+                    return None
+
+            flat_model_path = flat_model.save(self.model_trainer_config.FLAT_MODEL_FILE_PATH)
+            logging.info(f"Saved flat model to {flat_model_path}")
+            logging.info("Exited export_flat_model method of ModelTrainer class")
+            return flat_model_path
+
+        except Exception as e:
+            # models that cannot be flattened are still served as pickles
+            logging.info(f"Could not export flat model: {e}")
+            return None
+
+
+
+    # This method is used to export the model bundle
+    def export_model_bundle(self, cost_model: CostModel, flat_model_file_path: str) -> Optional[str]:
+        """
+        Method Name :   export_model_bundle
+
+        Description :   This method writes the model bundle of the verified flat model together with the scaler and the native booster.
+
+        Output      :   Model bundle file path or None
+        """
+        logging.info("Entered export_model_bundle method of ModelTrainer class")
+        try:
+            model_bundle_path = ModelBundle.save(
+                FlatCostModel.load(flat_model_file_path),
+                self.model_trainer_config.MODEL_BUNDLE_FILE_PATH,
+                cost_model=cost_model,
+            )
+            logging.info("Exited export_model_bundle method of ModelTrainer class")
+            return model_bundle_path
+
+        except Exception as e:
+            # the pickle and the flat model are still pushed
+            logging.info(f"Could not export model bundle: {e}")
+            return None
+
+
+
+    # This method is used to export the cost model to ONNX
+    def export_onnx_model(self, cost_model: CostModel) -> Optional[str]:
+        """
+        Method Name :   export_onnx_model
+
+        Description :   This method exports the preprocessor and regressor to ONNX and saves it when onnxruntime matches the cost model on the raw test split.
+
+        Output      :   ONNX model file path or None
+        """
+        logging.info("Entered export_onnx_model method of ModelTrainer class")
+        try:
+            if self.data_transformation_artifact.test_data_file_path is None:
+                logging.info("No raw test split to verify the ONNX model on, not exporting it")
+                return None
+
+            test_df = pd.read_csv(self.data_transformation_artifact.test_data_file_path)
+            X_test = test_df.drop(columns=[TARGET_COLUMN])
+            onnx_model = OnnxCostModel.from_cost_model(cost_model, columns=list(X_test.columns))
+
+            mismatch_ratio = onnx_model.verify(cost_model, X_test, rtol=ONNX_MODEL_TOLERANCE)
+            if mismatch_ratio > 0:
+                logging.info(f"ONNX model mismatches on {mismatch_ratio:.2%} of the test rows, not exporting it")
+                return None
+
+            onnx_model_path = onnx_model.save(self.model_trainer_config.ONNX_MODEL_FILE_PATH)
+            logging.info(f"Saved ONNX model to {onnx_model_path}")
+            logging.info("Exited export_onnx_model method of ModelTrainer class")
+            return onnx_model_path
+
+        except Exception as e:
+            # the other serving forms do not depend on the ONNX export
+            logging.info(f"Could not export ONNX model: {e}")
+            return None
+
+
+
+    # This method is used to precompute the premium lookup table
+    def build_premium_table(self, cost_model: CostModel, model_file_paths: List[str]) -> Tuple[str, str]:
+        """
+        Method Name :   build_premium_table
+
+        Description :   This method scores the whole input grid with the cost model and saves it next to the model.
+
+        Output      :   Premium table file path and its metadata file path
+        """
+        logging.info("Entered build_premium_table method of ModelTrainer class")
+        try:
+            schema_config = self.model_trainer_config.SCHEMA_CONFIG
+            train_df = pd.read_csv(self.data_transformation_artifact.train_data_file_path)
+
+            # The table is only served together with the model files it was built from
+            model_digests = [
+                self.model_trainer_config.UTILS.get_file_digest(file_path)
+                for file_path in model_file_paths if file_path is not None
+            ]
+            premium_table = PremiumLookupTable.build(
+                cost_model,
+                train_df.drop(columns=[TARGET_COLUMN]),
+                resolution=schema_config["premium_table_resolution"],
+                categorical_columns=schema_config["categorical_columns"],
+                chunk_size=PREMIUM_TABLE_CHUNK_SIZE,
+                model_digests=model_digests,
+            )
+            table_paths = premium_table.save(
+                self.model_trainer_config.PREMIUM_TABLE_FILE_PATH,
+                self.model_trainer_config.PREMIUM_TABLE_META_FILE_PATH,
+            )
+            logging.info(f"Saved premium table of shape {premium_table.shape}")
+            logging.info("Exited build_premium_table method of ModelTrainer class")
+            return table_paths
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+
+
     # This method is used to initialize model training
     def initiate_model_trainer(self) -> ModelTrainerArtifact:
 
@@ -120,26 +457,17 @@ class ModelTrainer:
                 f"Created artifacts directory for Model Trainer."
             )
 
-            # Loading the train array data and reading it as a DataFrame
-            train_array = self.model_trainer_config.UTILS.load_numpy_array_data(
-                self.data_transformation_artifact.transformed_train_file_path
-            )
-            train_df = pd.DataFrame(train_array)
-            logging.info(
-                f"Loaded train array from DataTransformationArtifacts directory and converted into Dataframe."
-            )
-
-            # Loading the test array data and reading it as a DataFrame
-            test_array = self.model_trainer_config.UTILS.load_numpy_array_data(
-                self.data_transformation_artifact.transformed_test_file_path
-            )
-            test_df = pd.DataFrame(test_array)
+            # Loading the train and test arrays of every preprocessing profile as DataFrames
+            profile_data = self.get_profile_data()
             logging.info(
-                f"Loaded test array from DataTransformationArtifacts directory and converted into Dataframe."
+                f"Loaded train and test arrays of the {list(profile_data)} profiles from DataTransformationArtifacts directory."
             )
 
             # getting the models list and finding the best model with score
-            list_of_trained_models = self.get_trained_models(train_df, test_df)
+            list_of_trained_models = self.get_trained_models(
+                {profile: train_df for profile, (train_df, _) in profile_data.items()},
+                {profile: test_df for profile, (_, test_df) in profile_data.items()},
+            )
             logging.info("Got a list of tuple of model score,model and model name")
             (
                 best_model,
@@ -149,21 +477,22 @@ class ModelTrainer:
             )
             logging.info("Got best model score,model and model name")
 
-            # Loading the preoprocessor object
-            preprocessor_obj_file_path = (
-                self.data_transformation_artifact.transformed_object_file_path
-            )
-            preprocessing_obj = self.model_trainer_config.UTILS.load_object(
-                preprocessor_obj_file_path
-            )
-            logging.info("Loaded preprocessing object")
-
             # Reading model config file for getting the best model score
             model_config = self.model_trainer_config.UTILS.read_yaml_file(
                 filename=MODEL_CONFIG_FILE
             )
             base_model_score = float(model_config["base_model_score"])
 
+            # Loading the preoprocessor object of the preprocessing profile the best model was trained on
+            best_model_profile = self.model_trainer_config.UTILS.get_preprocessing_profiles(model_config).get(
+                type(best_model).__name__, DEFAULT_PREPROCESSING_PROFILE
+            )
+            preprocessor_obj_file_path = self.get_profile_file_paths()[best_model_profile]["preprocessor"]
+            preprocessing_obj = self.model_trainer_config.UTILS.load_object(
+                preprocessor_obj_file_path
+            )
+            logging.info(f"Loaded preprocessing object of the {best_model_profile} profile")
+
             # Updating the model score to model config file if the the model score is greater than the base model score
             if best_model_score >= base_model_score:
                 # self.model_trainer_config.UTILS.update_model_score(best_model_score)
@@ -174,6 +503,10 @@ class ModelTrainer:
                 logging.info(
                     "Created cost model object with preprocessor and model"
                 )
+
+                # Compiling the preprocessor for the fast prediction path and checking it against sklearn
+                if COMPILE_COST_MODEL:
+                    self.compile_cost_model(cost_model)
                 trained_model_path = self.model_trainer_config.TRAINED_MODEL_FILE_PATH
                 logging.info("Created best model file path")
 
@@ -182,13 +515,36 @@ class ModelTrainer:
                     trained_model_path, cost_model
                 )
                 logging.info("Saved the best model object path")
+
+                # Exporting the tree ensemble as flat arrays for serving without sklearn/xgboost
+                flat_model_file_path = self.export_flat_model(cost_model) if EXPORT_FLAT_MODEL else None
+
+                # Bundling the verified flat model with its manifest and checksums
+                model_bundle_file_path = (
+                    self.export_model_bundle(cost_model, flat_model_file_path)
+                    if EXPORT_MODEL_BUNDLE and flat_model_file_path is not None else None
+                )
+
+                # Exporting the whole pipeline to ONNX for the onnxruntime backend
+                onnx_model_file_path = self.export_onnx_model(cost_model) if EXPORT_ONNX_MODEL else None
+
+                # Precomputing the premiums of the whole discrete input grid
+                premium_table_file_path, premium_table_meta_file_path = (
+                    self.build_premium_table(cost_model, [model_file_path, flat_model_file_path, model_bundle_file_path, onnx_model_file_path])
+                    if BUILD_PREMIUM_TABLE else (None, None)
+                )
             else:
                 logging.info("No best model found with score more than base score")
                 raise "No best model found with score more than base score "
 
             # saving the Model trainer artifacts
             model_trainer_artifacts = ModelTrainerArtifact(
-                trained_model_file_path=model_file_path
+                trained_model_file_path=model_file_path,
+                flat_model_file_path=flat_model_file_path,
+                model_bundle_file_path=model_bundle_file_path,
+                onnx_model_file_path=onnx_model_file_path,
+                premium_table_file_path=premium_table_file_path,
+                premium_table_meta_file_path=premium_table_meta_file_path,
             )
 
             return model_trainer_artifacts
@@ -0,0 +1,617 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple, Union
+import numpy as np
+from insurancePrice.components.search_strategy import SearchStrategy, get_search_strategy, get_trial_key
+from insurancePrice.components.tuning_cache import TuningCache
+from insurancePrice.constants import *
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+from insurancePrice.utils.main_utils import MainUtils
+from insurancePrice.utils.serving_utils import configure_inference_threads, limit_inference_threads
+
+
+
+# Shipped once per pool worker by init_tuning_worker instead of with every fit,
+# _worker_x holds the train split of every preprocessing profile
+_worker_x: Dict[str, np.ndarray] = {}
+_worker_y: Optional[np.ndarray] = None
+_worker_threads: int = 1
+# Base estimators by model name, get_base_model scans all the sklearn estimators on every call
+_worker_base_models: Dict[str, object] = {}
+# xgboost QuantileDMatrix (train, early stopping, validation) of every fold, by profile, fold, rows, held out share and max_bin
+_worker_fold_matrices: Dict[Tuple, Tuple[object, object, object]] = {}
+
+
+def init_tuning_worker(x_train: Dict[str, np.ndarray], y_train: np.ndarray, threads_per_fit: int) -> None:
+    global _worker_x, _worker_y, _worker_threads
+
+    limit_inference_threads(threads_per_fit)
+    _worker_x, _worker_y, _worker_threads = x_train, y_train, threads_per_fit
+
+
+def get_worker_base_model(model_name: str) -> object:
+    if model_name not in _worker_base_models:
+        _worker_base_models[model_name] = MainUtils.get_base_model(model_name)
+    return _worker_base_models[model_name]
+
+
+def fit_estimator(model_name: str, params: Dict, profile: str, train_index: Optional[np.ndarray] = None) -> object:
+    """
+    Fits a fresh model.yaml estimator with params on the worker data of its profile, or on the train_index rows of it.
+    """
+    from sklearn.base import clone
+
+    model = configure_inference_threads(clone(get_worker_base_model(model_name)).set_params(**params), _worker_threads)
+    if train_index is None:
+        return model.fit(_worker_x[profile], _worker_y)
+    return model.fit(_worker_x[profile][train_index], _worker_y[train_index])
+
+
+def get_fold_matrices(task: Dict, max_bin: int, early_stopping_fraction: float,
+                      feature_types: Optional[List[str]] = None) -> Tuple[object, object, object]:
+    """
+    Quantized train, early stopping and validation rows of a fold, built once per worker and shared by every trial of the fold.
+    """
+    import xgboost
+
+    key = (task["profile"], task["fold"], len(task["train_index"]), early_stopping_fraction, max_bin)
+    if key not in _worker_fold_matrices:
+        x_train, train_index, test_index = _worker_x[task["profile"]], task["train_index"], task["test_index"]
+        # The last rows of the training fold pick the boosting rounds, the train split is already shuffled
+        n_stopping = min(max(1, int(len(train_index) * early_stopping_fraction)), len(train_index) - 1)
+        fit_index, stopping_index = train_index[:-n_stopping], train_index[-n_stopping:]
+        # feature_types marks the category code columns of the categorical profile
+        categorical = {"feature_types": feature_types, "enable_categorical": feature_types is not None}
+        dtrain = xgboost.QuantileDMatrix(x_train[fit_index], _worker_y[fit_index], max_bin=max_bin, **categorical)
+        # The other rows are binned with the cuts of the train rows
+        dstopping = xgboost.QuantileDMatrix(x_train[stopping_index], _worker_y[stopping_index], ref=dtrain, **categorical)
+        dvalid = xgboost.QuantileDMatrix(x_train[test_index], _worker_y[test_index], ref=dtrain, **categorical)
+        _worker_fold_matrices[key] = (dtrain, dstopping, dvalid)
+    return _worker_fold_matrices[key]
+
+
+def fit_and_score_boosting(task: Dict) -> Tuple[float, int]:
+    """
+    R2 of an xgboost trial on its validation fold, boosted up to n_estimators rounds with early stopping on a held
+    out share of its training fold, so the number of rounds is not picked on the rows it is scored on.
+    """
+    import xgboost
+    from sklearn.base import clone
+    from sklearn.metrics import r2_score
+
+    params = dict(task["params"])
+    early_stopping_rounds = params.pop("early_stopping_rounds")
+    early_stopping_fraction = params.pop("early_stopping_fraction")
+    max_rounds = params.pop("n_estimators")
+    model = clone(get_worker_base_model(task["model_name"])).set_params(**params, n_jobs=_worker_threads)
+    booster_params = {name: value for name, value in model.get_xgb_params().items() if value is not None}
+    feature_types = model.get_params()["feature_types"] if model.get_params().get("enable_categorical") else None
+    dtrain, dstopping, dvalid = get_fold_matrices(
+        task, booster_params.get("max_bin", 256), early_stopping_fraction, feature_types
+    )
+
+    booster = xgboost.train(
+        booster_params, dtrain, num_boost_round=max_rounds, evals=[(dstopping, "stopping")],
+        early_stopping_rounds=early_stopping_rounds, verbose_eval=False,
+    )
+    n_rounds = booster.best_iteration + 1
+    predictions = booster.predict(dvalid, iteration_range=(0, n_rounds))
+    return float(r2_score(_worker_y[task["test_index"]], predictions)), n_rounds
+
+
+def fit_and_score(task: Dict) -> Dict:
+    """
+    R2 of one grid point on one validation fold, nan when the fit fails like GridSearchCV's error_score.
+    """
+    started = time.perf_counter()
+    n_rounds = None
+    try:
+        if "early_stopping_rounds" in task["params"]:
+            score, n_rounds = fit_and_score_boosting(task)
+        else:
+            model = fit_estimator(task["model_name"], task["params"], task["profile"], task["train_index"])
+            score = float(model.score(_worker_x[task["profile"]][task["test_index"]], _worker_y[task["test_index"]]))
+    except Exception as e:
+        logging.info(f"Fit of {task['model_name']} with {task['params']} failed: {e}")
+        score = np.nan
+    result = {key: task[key] for key in ("model_name", "candidate", "params", "fold")}
+    return {**result, "score": score, "n_rounds": n_rounds, "seconds": time.perf_counter() - started}
+
+
+def refit_best(task: Dict) -> Dict:
+    """
+    Best grid point of a model refitted on the whole train split, with the n_jobs of the base estimator.
+    """
+    started = time.perf_counter()
+    model = fit_estimator(task["model_name"], task["params"], task["profile"])
+    base_n_jobs = get_worker_base_model(task["model_name"]).get_params().get("n_jobs")
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=base_n_jobs)
+    return {**task, "model": model, "seconds": time.perf_counter() - started}
+
+
+def refit_in_process(x_train: Dict[str, np.ndarray], y_train: np.ndarray, task: Dict) -> Dict:
+    """
+    refit_best in the calling process, for the models left without a refit when the pool was interrupted.
+    """
+    global _worker_x, _worker_y
+
+    _worker_x, _worker_y = x_train, y_train
+    return refit_best(task)
+
+
+
+class ModelSearch:
+    """
+    Search state of one model: its strategy and budget, the trials in flight
+    and the trials scored so far.
+    """
+    def __init__(self, model_name: str, strategy: SearchStrategy, search_config: Dict, config_hash: str,
+                 cached_trials: List[Dict], profile: str, fingerprint: str):
+        self.model_name = model_name
+        # Preprocessing profile of the model and the fingerprint of its train split, the tuning cache key
+        self.profile = profile
+        self.fingerprint = fingerprint
+        self.strategy = strategy
+        self.strategy_name = search_config.get("strategy", "grid")
+        self.max_fits = search_config.get("max_fits")
+        self.max_seconds = search_config.get("max_seconds")
+        self.early_stop_margin = search_config.get("early_stop_margin", TUNING_EARLY_STOP_MARGIN)
+        self.config_hash = config_hash
+        # Trials of an interrupted run of the same search, answered without fitting again
+        self.cache = {get_trial_key(trial): trial for trial in cached_trials}
+        self.running: Dict[str, Dict] = {}
+        self.trials: List[Dict] = []
+        self.fits = 0
+        self.fit_seconds = 0.0
+        self.cached_trials = 0
+        # max_seconds counts from the first trial of the model, the pool takes a while to start
+        self.started: Optional[float] = None
+        self.stopped = False
+        self.refit: Optional[Dict] = None
+
+    @property
+    def exhausted(self) -> bool:
+        return (self.strategy.finished or self.stopped) and not self.running
+
+    def get_best_trial(self, rung: Optional[int] = None) -> Optional[Dict]:
+        # Highest rung first, then the score, then the grid order; pruned and failed trials never win
+        trials = [
+            trial for trial in self.trials
+            if not trial["pruned"] and not np.isnan(trial["score"]) and (rung is None or trial["rung"] == rung)
+        ]
+        if not trials:
+            return None
+        best_trial = max(trials, key=lambda trial: (trial["rung"], trial["score"], -trial["candidate"]))
+        params = best_trial.get("refit_params") or self.strategy.get_final_params(best_trial["params"])
+        return {**best_trial, "params": params}
+
+    def get_state(self) -> Dict:
+        return {
+            "config_hash": self.config_hash,
+            "strategy": self.strategy_name,
+            "fits": self.fits,
+            "completed": self.exhausted,
+            "best": self.get_best_trial(),
+            "trials": self.trials,
+        }
+
+
+
+class TuningScheduler:
+    """
+    Hyperparameter search of every model of model.yaml in one process pool.
+
+    The search_strategy entry of a model picks how its grid is explored (grid,
+    random, halving or bayesian, see search_strategy.py) and its budget:
+    max_fits fold fits and max_seconds of wall clock. Every fold fit of a
+    trial is a task of the pool; a trial whose fold score is early_stop_margin
+    below the best mean score of its rung is pruned and its other folds are
+    cancelled.
+
+    The pool gets cpu_budget // threads_per_fit workers and every fit runs
+    with threads_per_fit OpenMP/BLAS threads and n_jobs, so xgboost does not
+    start a thread per core in each worker. The best trial of a model is
+    refitted on the whole train split as soon as its search is over, while
+    the other models are still being tuned, and that refit is the returned
+    model.
+
+    Every scored trial is written to the checkpoint: an interrupted run
+    refits the best trials so far, and a rerun with the same checkpoint, grid
+    and data does not fit them again. With a tuning cache, the trials scored
+    on every fold are also kept across runs: a trial already scored on the
+    same data is not fitted again, and on new data the best params of the
+    previous data set are tried first.
+
+    An xgboost model with early_stopping_rounds in its search_strategy is
+    tuned with the hist tree method on QuantileDMatrix folds built once per
+    worker: its n_estimators is a ceiling instead of a grid axis, every trial
+    stops boosting once a held out share (early_stopping_fraction) of its
+    training fold stops improving and is scored on its validation fold, and
+    the best trial is refitted with the mean number of rounds of its folds.
+
+    Every model is tuned on the train split of its preprocessing profile
+    (model_profiles), with the fixed_params of the profile on every trial.
+    """
+    def __init__(self,
+                 model_grids: Dict[str, Dict[str, List]],
+                 search_configs: Optional[Dict[str, Dict]] = None,
+                 cpu_budget: int = TUNING_CPU_BUDGET,
+                 threads_per_fit: int = TUNING_THREADS_PER_FIT,
+                 cv_folds: int = TUNING_CV_FOLDS,
+                 checkpoint_path: Optional[str] = None,
+                 tuning_cache: Optional[TuningCache] = None,
+                 model_profiles: Optional[Dict[str, str]] = None,
+                 fixed_params: Optional[Dict[str, Dict]] = None):
+        self.model_grids = model_grids
+        self.search_configs = search_configs or {}
+        self.model_profiles = {
+            model_name: (model_profiles or {}).get(model_name, DEFAULT_PREPROCESSING_PROFILE) for model_name in model_grids
+        }
+        self.fixed_params = fixed_params or {}
+        self.threads_per_fit = max(1, min(threads_per_fit, cpu_budget))
+        self.workers = max(1, cpu_budget // self.threads_per_fit)
+        self.cv_folds = cv_folds
+        self.checkpoint_path = checkpoint_path
+        self.tuning_cache = tuning_cache
+        # The folds GridSearchCV uses for a regressor, trials are cached under this splitter
+        self.cv_config = {"n_splits": cv_folds, "shuffle": False}
+        self.searches: Dict[str, ModelSearch] = {}
+        self.report: Dict = {}
+
+    def get_config_hash(self, model_name: str, fingerprint: str) -> str:
+        config = {
+            "param_grid": self.model_grids[model_name],
+            "fixed_params": self.fixed_params.get(model_name) or {},
+            "search_config": self.search_configs.get(model_name) or {},
+            "cv_folds": self.cv_folds,
+            "data": fingerprint,
+        }
+        return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get_param_grid(self, model_name: str, search_config: Dict) -> Dict[str, List]:
+        # The fixed params of the preprocessing profile are single value axes of the grid
+        fixed_params = self.fixed_params.get(model_name) or {}
+        param_grid = {**self.model_grids[model_name], **{name: [value] for name, value in fixed_params.items()}}
+        early_stopping_rounds = search_config.get("early_stopping_rounds")
+        if not early_stopping_rounds:
+            return param_grid
+        if not model_name.startswith("XGB"):
+            raise ValueError(f"early_stopping_rounds is only supported for the xgboost models, not {model_name}")
+        # n_estimators becomes the ceiling of the boosting rounds
+        max_rounds = search_config.get("max_n_estimators", max(param_grid.get("n_estimators", [100])))
+        return {
+            **param_grid,
+            "n_estimators": [max_rounds],
+            "tree_method": ["hist"],
+            "early_stopping_rounds": [early_stopping_rounds],
+            "early_stopping_fraction": [search_config.get("early_stopping_fraction", TUNING_EARLY_STOPPING_FRACTION)],
+        }
+
+    @staticmethod
+    def get_refit_params(params: Dict, rounds: List[int]) -> Optional[Dict]:
+        # An early stopped trial is refitted with the mean number of rounds of its folds
+        if not rounds:
+            return None
+        refit_params = {
+            name: value for name, value in params.items()
+            if name not in ("early_stopping_rounds", "early_stopping_fraction")
+        }
+        refit_params["n_estimators"] = int(round(np.mean(rounds)))
+        return refit_params
+
+    def load_checkpoint(self) -> Dict:
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return {}
+        with open(self.checkpoint_path) as file_obj:
+            return json.load(file_obj)["models"]
+
+    def save_checkpoint(self) -> None:
+        if self.checkpoint_path is None:
+            return
+        # Replaced atomically, a crash leaves the previous checkpoint
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w") as file_obj:
+            json.dump({"models": {name: search.get_state() for name, search in self.searches.items()}}, file_obj)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def get_searches(self, x_train: Dict[str, np.ndarray], y_train: np.ndarray, max_rows: int) -> Dict[str, ModelSearch]:
+
+        """
+        Method Name :   get_searches
+
+        Description :   This method creates the search strategy of every model, warm started from the tuning cache, and reloads its trials from the checkpoint when the grid, search config and data did not change.
+
+        Output      :   Search of every model
+        """
+        fingerprints = {profile: TuningCache.get_fingerprint(x, y_train) for profile, x in x_train.items()}
+        checkpoint = self.load_checkpoint()
+        searches = {}
+        for model_name in self.model_grids:
+            profile = self.model_profiles[model_name]
+            fingerprint = fingerprints[profile]
+            search_config = self.search_configs.get(model_name) or {}
+            config_hash = self.get_config_hash(model_name, fingerprint)
+            state = checkpoint.get(model_name, {})
+            cached_trials = state.get("trials", []) if state.get("config_hash") == config_hash else []
+            if cached_trials:
+                logging.info(f"Resuming the search of {model_name} with {len(cached_trials)} trials of the checkpoint")
+            strategy = get_search_strategy(self.get_param_grid(model_name, search_config), search_config, max_rows)
+            if self.tuning_cache is not None:
+                previous_best_params = self.tuning_cache.get_previous_best_params(
+                    fingerprint, model_name, self.cv_config, TUNING_WARM_START_TRIALS
+                )
+                if previous_best_params:
+                    logging.info(f"Warm starting the search of {model_name} from {previous_best_params}")
+                    strategy.prioritize(previous_best_params)
+            searches[model_name] = ModelSearch(
+                model_name, strategy, search_config, config_hash, cached_trials, profile, fingerprint
+            )
+        return searches
+
+    def complete_trial(self, search: ModelSearch, trial: Dict, score: float, pruned: bool,
+                       refit_params: Optional[Dict] = None) -> None:
+        search.running.pop(get_trial_key(trial), None)
+        search.trials.append({
+            "candidate": trial["candidate"],
+            "params": trial["params"],
+            "rung": trial["rung"],
+            "n_samples": trial["n_samples"],
+            "score": score,
+            "pruned": pruned,
+            "refit_params": refit_params,
+        })
+        search.strategy.tell(trial, score)
+        self.save_checkpoint()
+
+    def stop_search(self, search: ModelSearch, futures: Dict[Future, Tuple[ModelSearch, str]]) -> None:
+        # Fold fits not started yet are dropped, the trials already fitting finish with the folds they have
+        search.stopped = True
+        if search.get_best_trial() is None:
+            # Nothing to refit yet, the trials in flight are the model
+            return
+        for key, trial in list(search.running.items()):
+            for future in list(trial["futures"]):
+                if future.cancel():
+                    trial["futures"].discard(future)
+                    futures.pop(future, None)
+            if not trial["futures"]:
+                self.complete_trial(search, trial, float(np.mean(trial["scores"])) if trial["scores"] else np.nan, True)
+
+    def submit_trials(self,
+                      search: ModelSearch,
+                      executor: ProcessPoolExecutor,
+                      futures: Dict[Future, Tuple[ModelSearch, str]],
+                      folds: List[Tuple[np.ndarray, np.ndarray]]) -> None:
+
+        """
+        Method Name :   submit_trials
+
+        Description :   This method keeps up to one trial per worker of the model in flight, within its budget, and answers the trials of the checkpoint from it.
+
+        Output      :   None
+        """
+        if search.started is None:
+            search.started = time.perf_counter()
+        while not search.stopped and not search.strategy.finished:
+            n_trials = self.workers - len(search.running)
+            if search.max_fits is not None:
+                n_trials = min(n_trials, (search.max_fits - search.fits) // len(folds))
+            over_time = search.max_seconds is not None and time.perf_counter() - search.started >= search.max_seconds
+            if over_time or (search.max_fits is not None and search.fits + len(folds) > search.max_fits):
+                logging.info(f"Search budget of {search.model_name} reached after {search.fits} fits")
+                self.stop_search(search, futures)
+                return
+
+            trials = search.strategy.ask(n_trials) if n_trials > 0 else []
+            if not trials:
+                return
+            for trial in trials:
+                key = get_trial_key(trial)
+                if key in search.cache:
+                    self.complete_trial(search, trial, search.cache[key]["score"], search.cache[key]["pruned"],
+                                        search.cache[key].get("refit_params"))
+                    continue
+                cached = self.tuning_cache.get(
+                    search.fingerprint, search.model_name, trial["params"], self.cv_config, trial["n_samples"]
+                ) if self.tuning_cache is not None else None
+                if cached is not None:
+                    search.cached_trials += 1
+                    self.complete_trial(search, trial, cached["score"], False, cached["refit_params"])
+                    continue
+
+                trial = {**trial, "scores": [], "rounds": [], "seconds": 0.0, "futures": set()}
+                search.running[key] = trial
+                for fold, (train_index, test_index) in enumerate(folds):
+                    task = {
+                        "model_name": search.model_name,
+                        "candidate": trial["candidate"],
+                        "params": trial["params"],
+                        "profile": search.profile,
+                        "fold": fold,
+                        "train_index": train_index[:trial["n_samples"]] if trial["n_samples"] else train_index,
+                        "test_index": test_index,
+                    }
+                    future = executor.submit(fit_and_score, task)
+                    futures[future] = (search, key)
+                    trial["futures"].add(future)
+                search.fits += len(folds)
+
+    def collect_fold(self, search: ModelSearch, key: str, future: Future,
+                     futures: Dict[Future, Tuple[ModelSearch, str]]) -> None:
+
+        """
+        Method Name :   collect_fold
+
+        Description :   This method records a fold score and prunes the trial when it clearly loses against the best trial of its rung.
+
+        Output      :   None
+        """
+        result = future.result()
+        search.fit_seconds += result["seconds"]
+        trial = search.running.get(key)
+        if trial is None:
+            # Fold of a trial pruned while it was fitting
+            return
+
+        trial["futures"].discard(future)
+        trial["scores"].append(result["score"])
+        if result["n_rounds"] is not None:
+            trial["rounds"].append(result["n_rounds"])
+        trial["seconds"] += result["seconds"]
+        best_trial = search.get_best_trial(trial["rung"])
+        losing = np.isnan(result["score"]) or (
+            best_trial is not None and result["score"] < best_trial["score"] - search.early_stop_margin
+        )
+        if losing and trial["futures"]:
+            for pending in trial["futures"]:
+                if pending.cancel():
+                    futures.pop(pending, None)
+            if np.isnan(result["score"]) and self.tuning_cache is not None:
+                # Failed fits (invalid params) fail again on the same data
+                self.tuning_cache.put(search.fingerprint, search.model_name, trial["params"], self.cv_config,
+                                      trial["scores"], trial["seconds"], trial["n_samples"])
+            logging.info(f"Pruned {search.model_name} trial {trial['params']} with fold score {result['score']}")
+            self.complete_trial(search, trial, float(np.mean(trial["scores"])), True)
+        elif not trial["futures"]:
+            # Fewer scores than folds when the budget cancelled the other folds
+            pruned = len(trial["scores"]) < self.cv_folds
+            refit_params = self.get_refit_params(trial["params"], trial["rounds"])
+            if not pruned and self.tuning_cache is not None:
+                self.tuning_cache.put(search.fingerprint, search.model_name, trial["params"], self.cv_config,
+                                      trial["scores"], trial["seconds"], trial["n_samples"], refit_params)
+            self.complete_trial(search, trial, float(np.mean(trial["scores"])), pruned, refit_params)
+
+    def tune(self,
+             x_train: Union[np.ndarray, Dict[str, np.ndarray]],
+             y_train: np.ndarray,
+             x_test: Union[np.ndarray, Dict[str, np.ndarray]],
+             y_test: np.ndarray) -> List[Tuple[float, object, str]]:
+
+        """
+        Method Name :   tune
+
+        Description :   This method runs the searches of all the models in the process pool and scores every refitted best model on the test split.
+                        x_train and x_test are the splits of every preprocessing profile, or a single split of all the models.
+
+        Output      :   List of test score, model and model name, like MainUtils.get_tuned_model
+        """
+        logging.info("Entered the tune method of TuningScheduler class")
+        try:
+            from sklearn.model_selection import KFold
+
+            profiles = set(self.model_profiles.values())
+            if not isinstance(x_train, dict):
+                x_train, x_test = dict.fromkeys(profiles, x_train), dict.fromkeys(profiles, x_test)
+            x_train = {profile: np.asarray(x_train[profile]) for profile in profiles}
+            y_train = np.asarray(y_train)
+            # The folds GridSearchCV uses for a regressor, the same rows in every profile
+            folds = list(KFold(n_splits=self.cv_folds).split(y_train))
+            self.searches = self.get_searches(x_train, y_train, min(len(train_index) for train_index, _ in folds))
+            logging.info(f"Tuning {len(self.searches)} models on {self.workers} workers of {self.threads_per_fit} threads")
+
+            futures: Dict[Future, Tuple[ModelSearch, str]] = {}
+            timeout = 1.0 if any(search.max_seconds is not None for search in self.searches.values()) else None
+            interrupted = False
+            started = time.perf_counter()
+
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_tuning_worker,
+                initargs=(x_train, y_train, self.threads_per_fit),
+            ) as executor:
+                try:
+                    while True:
+                        for search in self.searches.values():
+                            self.submit_trials(search, executor, futures, folds)
+                            if search.exhausted and search.refit is None:
+                                best_trial = search.get_best_trial()
+                                search.refit = {"params": best_trial["params"] if best_trial else None}
+                                if best_trial is not None:
+                                    logging.info(f"Best params of {search.model_name}: {best_trial['params']}, "
+                                                 f"mean CV score {best_trial['score']}")
+                                    refit_task = {
+                                        "model_name": search.model_name,
+                                        "params": best_trial["params"],
+                                        "profile": search.profile,
+                                    }
+                                    futures[executor.submit(refit_best, refit_task)] = (search, "refit")
+                        if not futures:
+                            break
+
+                        done, _ = wait(list(futures), timeout=timeout, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            if future not in futures:
+                                continue
+                            search, key = futures.pop(future)
+                            if key == "refit":
+                                search.refit = future.result()
+                            else:
+                                self.collect_fold(search, key, future, futures)
+
+                except (KeyboardInterrupt, BrokenProcessPool) as e:
+                    # The best trials so far are refitted below, in this process
+                    logging.info(f"Tuning interrupted: {e!r}")
+                    interrupted = True
+                    for future in futures:
+                        future.cancel()
+
+            wall_seconds = time.perf_counter() - started
+            tuned_model_list = []
+            for model_name, search in self.searches.items():
+                if search.refit is None or "model" not in search.refit:
+                    best_trial = search.get_best_trial()
+                    if best_trial is None:
+                        logging.info(f"No trial of {model_name} was scored, skipping it")
+                        continue
+                    search.refit = refit_in_process(
+                        x_train, y_train,
+                        {"model_name": model_name, "params": best_trial["params"], "profile": search.profile},
+                    )
+                model = search.refit["model"]
+                model_score = MainUtils.get_model_score(y_test, model.predict(np.asarray(x_test[search.profile])))
+                search.refit["test_score"] = model_score
+                tuned_model_list.append((model_score, model, model.__class__.__name__))
+
+            if not tuned_model_list:
+                raise ValueError("No trial of any model was scored")
+            if self.tuning_cache is not None:
+                self.tuning_cache.evict()
+
+            self.report = {
+                "workers": self.workers,
+                "threads_per_fit": self.threads_per_fit,
+                "interrupted": interrupted,
+                "wall_seconds": wall_seconds,
+                "models": {
+                    model_name: {
+                        "strategy": search.strategy_name,
+                        "preprocessing_profile": search.profile,
+                        "fits": search.fits,
+                        "trials": len(search.trials),
+                        "cached_trials": search.cached_trials,
+                        "pruned_trials": sum(trial["pruned"] for trial in search.trials),
+                        "budget_reached": search.stopped,
+                        # Sum of the fit times, what one worker would have needed
+                        "fit_seconds": search.fit_seconds,
+                        "params": search.refit["params"],
+                        "cv_score": (search.get_best_trial() or {}).get("score"),
+                        "test_score": search.refit["test_score"],
+                    }
+                    for model_name, search in self.searches.items() if search.refit and "model" in search.refit
+                },
+            }
+            logging.info(f"Tuned {sum(search.fits for search in self.searches.values())} fits in {wall_seconds:.1f}s")
+            logging.info("Exited the tune method of TuningScheduler class")
+            return tuned_model_list
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
@@ -0,0 +1,191 @@
+import os
+import sys
+from typing import Dict, List, Optional
+import numpy as np
+from pandas import DataFrame
+from insurancePrice.constants import INFERENCE_THREADS, ONNX_TARGET_OPSET
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+
+
+
+class OnnxCostModel:
+    """
+    CostModel exported to ONNX, the ColumnTransformer and the regressor in one
+    graph, and run with onnxruntime on the CPU.
+
+    The graph has one [n, 1] input per raw column (strings for the one-hot
+    encoded columns, doubles otherwise), so requests are fed without building
+    the feature matrix in Python. Scaling runs in double and the features are
+    cast to float32 right before the trees, as sklearn and xgboost do: the
+    split thresholds sit on float32 training values, and scaling in float32
+    would move many rows to the other side of them.
+
+    The session runs with INFERENCE_THREADS
+    intra-op threads and is created lazily in every process, as the
+    onnxruntime thread pools do not survive a fork.
+
+    onnxruntime is only needed to predict; skl2onnx and onnxmltools (for
+    xgboost) only to export at training time.
+    """
+    def __init__(self, model_bytes: bytes, n_threads: int = INFERENCE_THREADS, model_name: str = "OnnxCostModel"):
+        self.model_bytes = model_bytes
+        self.n_threads = n_threads
+        self.model_name = model_name
+        self._session = None
+        self._session_pid: Optional[int] = None
+        self._input_types: Dict[str, str] = {}
+
+    @property
+    def session(self) -> object:
+        if self._session is None or self._session_pid != os.getpid():
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = self.n_threads
+            options.inter_op_num_threads = 1
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = onnxruntime.InferenceSession(
+                self.model_bytes, sess_options=options, providers=["CPUExecutionProvider"]
+            )
+            self._input_types = {graph_input.name: graph_input.type for graph_input in session.get_inputs()}
+            self._session, self._session_pid = session, os.getpid()
+        return self._session
+
+    @staticmethod
+    def get_categorical_columns(preprocessor: object) -> List[str]:
+        from sklearn.preprocessing import OneHotEncoder
+
+        return [
+            column
+            for _, transformer, columns in preprocessor.transformers_
+            if isinstance(transformer, OneHotEncoder)
+            for column in columns
+        ]
+
+    @staticmethod
+    def register_xgboost_converter() -> None:
+        from onnxmltools.convert.xgboost.operator_converters.XGBoost import convert_xgboost
+        from skl2onnx import update_registered_converter
+        from skl2onnx.common.shape_calculator import calculate_linear_regressor_output_shapes
+        from xgboost import XGBRegressor
+
+        update_registered_converter(
+            XGBRegressor, "XGBoostXGBRegressor", calculate_linear_regressor_output_shapes, convert_xgboost
+        )
+
+    @classmethod
+    def from_cost_model(cls, cost_model: object, columns: List[str]) -> "OnnxCostModel":
+
+        """
+        Method Name :   from_cost_model
+
+        Description :   This method converts the preprocessor and regressor of a CostModel into a single ONNX graph.
+
+        Output      :   ONNX cost model
+        """
+        logging.info("Entered the from_cost_model method of OnnxCostModel class")
+        try:
+            from skl2onnx import convert_sklearn
+            from skl2onnx.common.data_types import DoubleTensorType, StringTensorType
+            from skl2onnx.sklapi import CastTransformer
+            from sklearn.pipeline import Pipeline
+
+            regressor = cost_model.trained_model_object
+            if type(regressor).__module__.startswith("xgboost"):
+                cls.register_xgboost_converter()
+
+            categorical_columns = cls.get_categorical_columns(cost_model.preprocessing_object)
+            initial_types = [
+                (column, StringTensorType([None, 1]) if column in categorical_columns else DoubleTensorType([None, 1]))
+                for column in columns
+            ]
+            cast = CastTransformer(dtype=np.float32).fit(np.zeros((1, 1)))
+            pipeline = Pipeline(
+                [("preprocessor", cost_model.preprocessing_object), ("cast", cast), ("regressor", regressor)]
+            )
+            onnx_model = convert_sklearn(
+                pipeline, initial_types=initial_types, target_opset={"": ONNX_TARGET_OPSET, "ai.onnx.ml": 3}
+            )
+            model_name = onnx_model.metadata_props.add()
+            model_name.key, model_name.value = "model_name", type(regressor).__name__
+
+            logging.info("Exited the from_cost_model method of OnnxCostModel class")
+            return cls(onnx_model.SerializeToString(), model_name=type(regressor).__name__)
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def get_feeds(self, X: DataFrame) -> Dict[str, np.ndarray]:
+        self.session
+        return {
+            column: (
+                np.asarray(X[column].astype(str), dtype=object)
+                if input_type == "tensor(string)"
+                else np.asarray(X[column], dtype=np.float64)
+            ).reshape(-1, 1)
+            for column, input_type in self._input_types.items()
+        }
+
+    def predict(self, X: DataFrame) -> np.ndarray:
+        try:
+            return self.session.run(None, self.get_feeds(X))[0].reshape(-1).astype(np.float64)
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def predict_record(self, record: Dict) -> float:
+        try:
+            session = self.session
+            feeds = {
+                column: np.array(
+                    [[str(record[column]) if input_type == "tensor(string)" else record[column]]],
+                    dtype=object if input_type == "tensor(string)" else np.float64,
+                )
+                for column, input_type in self._input_types.items()
+            }
+            return float(session.run(None, feeds)[0].reshape(-1)[0])
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def verify(self, cost_model: object, X: DataFrame, rtol: float) -> float:
+        """
+        Share of rows of X whose onnxruntime prediction is not within rtol of the CostModel prediction.
+        """
+        expected = np.asarray(cost_model.predict(X), dtype=np.float64)
+        mismatched = ~np.isclose(self.predict(X), expected, rtol=rtol, atol=0.0)
+        mismatch_ratio = float(mismatched.mean()) if len(X) else 0.0
+        logging.info(f"ONNX model mismatches the CostModel on {mismatched.sum()} of {len(X)} rows")
+        return mismatch_ratio
+
+    def save(self, file_path: str) -> str:
+        with open(file_path, "wb") as file_obj:
+            file_obj.write(self.model_bytes)
+        return file_path
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "OnnxCostModel":
+        onnx_model = cls(data)
+        # Checking the graph loads before it is swapped in
+        metadata = onnx_model.session.get_modelmeta().custom_metadata_map
+        onnx_model.model_name = metadata.get("model_name", onnx_model.model_name)
+        return onnx_model
+
+    @classmethod
+    def load(cls, file_path: str) -> "OnnxCostModel":
+        with open(file_path, "rb") as file_obj:
+            return cls.from_bytes(file_obj.read())
+
+    def __getstate__(self):
+        # The session is rebuilt from the bytes wherever the model is unpickled
+        state = self.__dict__.copy()
+        state["_session"], state["_session_pid"] = None, None
+        return state
+
+    def __repr__(self):
+        return f"Onnx{self.model_name}()"
+
+    def __str__(self):
+        return f"Onnx{self.model_name}()"
@@ -0,0 +1,179 @@
+import asyncio
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from insurancePrice.constants import *
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+from insurancePrice.utils.serving_utils import InferenceExecutor
+
+
+
+class BatchMetrics:
+    """
+    Batch size distribution and queue wait of the micro batches scored by PredictionBatcher.
+    """
+    def __init__(self, buckets: Tuple[int, ...] = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.batches = 0
+        self.rows = 0
+        self.max_batch_size = 0
+        self.total_wait_seconds = 0.0
+        self.total_score_seconds = 0.0
+
+    def observe(self, batch_size: int, wait_seconds: float, score_seconds: float) -> None:
+        idx = int(np.searchsorted(self.buckets, batch_size))
+        self.bucket_counts[idx] += 1
+        self.batches += 1
+        self.rows += batch_size
+        self.max_batch_size = max(self.max_batch_size, batch_size)
+        self.total_wait_seconds += wait_seconds
+        self.total_score_seconds += score_seconds
+
+    def snapshot(self) -> Dict:
+        labels = [f"<={bucket}" for bucket in self.buckets] + [f">{self.buckets[-1]}"]
+        return {
+            "batches": self.batches,
+            "rows": self.rows,
+            "mean_batch_size": self.rows / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "mean_queue_wait_ms": 1000 * self.total_wait_seconds / self.rows if self.rows else 0.0,
+            "mean_score_ms": 1000 * self.total_score_seconds / self.batches if self.batches else 0.0,
+            "batch_size_histogram": dict(zip(labels, self.bucket_counts)),
+        }
+
+
+
+class PredictionBatcher:
+    """
+    Coalesces concurrent single row predictions into one matrix per model call.
+
+    Requests that are already queued are always taken together. While the
+    recent batches show concurrent load the batcher also waits up to
+    max_wait_ms for more rows (up to max_batch_size), so a lone request on an
+    idle server is scored without any added delay.
+
+    With an executor, batches are scored in its thread pool with at most one
+    batch in flight per worker; rows arriving while every worker is busy are
+    picked up together by the next batch.
+
+    Queued rows are already decoded, collate_fn (EncodedBatch.concat) joins
+    them into the batch predict_fn takes.
+    """
+    def __init__(self,
+                 predict_fn: Callable[[object], np.ndarray],
+                 collate_fn: Callable[[List], object],
+                 max_batch_size: int = MICRO_BATCH_MAX_SIZE,
+                 max_wait_ms: float = MICRO_BATCH_MAX_WAIT_MS,
+                 executor: Optional[InferenceExecutor] = None):
+        self.predict_fn = predict_fn
+        self.collate_fn = collate_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+        self.metrics = BatchMetrics()
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._recent_batch_size = 1.0
+
+    async def start(self) -> None:
+        logging.info("Entered the start method of PredictionBatcher class")
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.executor.max_workers if self.executor is not None else 1)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logging.info(f"Started prediction batcher with max batch size {self.max_batch_size} and max wait {self.max_wait * 1000} ms")
+
+    async def stop(self) -> None:
+        logging.info("Entered the stop method of PredictionBatcher class")
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def predict(self, record: object) -> float:
+
+        """
+        Method Name :   predict
+
+        Description :   This method queues one decoded row for the next micro batch and waits for its prediction.
+
+        Output      :   Prediction
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((record, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Dict, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+
+        # Taking whatever is already waiting without yielding to the loop
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        # Holding the batch open only while there is concurrent load
+        if self._recent_batch_size > 1 or len(batch) > 1:
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Waiting for a free scoring slot before opening the next batch
+            await self._slots.acquire()
+            batch = await self._collect()
+            self._recent_batch_size = 0.8 * self._recent_batch_size + 0.2 * len(batch)
+
+            task = loop.create_task(self._score_batch(batch))
+            task.add_done_callback(lambda _: self._slots.release())
+
+    async def _score_batch(self, batch: List[Tuple[Dict, asyncio.Future, float]]) -> None:
+        records = [record for record, _, _ in batch]
+        started = time.perf_counter()
+        try:
+            predictions = await self._score(records)
+            error = None
+        except Exception as e:
+            predictions, error = None, e
+        scored = time.perf_counter()
+
+        self.metrics.observe(
+            len(batch),
+            wait_seconds=sum(started - queued_at for _, _, queued_at in batch),
+            score_seconds=scored - started,
+        )
+
+        for idx, (_, future, _) in enumerate(batch):
+            # The waiting handler may have been cancelled by a client disconnect
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(float(predictions[idx]))
+
+    def _predict_records(self, records: List[Dict]) -> np.ndarray:
+        try:
+            return self.predict_fn(self.collate_fn(records))
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    async def _score(self, records: List[Dict]) -> np.ndarray:
+        if self.executor is None:
+            return self._predict_records(records)
+        return await self.executor.run(self._predict_records, records)
@@ -0,0 +1,202 @@
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+
+
+
+class PremiumLookupTable:
+    """
+    Premiums of every point of the discrete input grid, precomputed with the
+    champion CostModel.
+
+    Numerical axes hold integer codes value * resolution (age 18 -> 18,
+    bmi 30.4 -> 304) from start to start + size - 1, categorical axes the
+    categories seen in training. The table is a C ordered float32 array with
+    one dimension per axis, so a request on the grid is answered with one
+    index computation and a read from the memory mapped file. Requests off
+    the grid (out of range ages, bmi with more decimals, unseen categories)
+    are not in the table and must go to the model.
+    """
+    def __init__(self, axes: List[Dict], table: np.ndarray, model_digests: Optional[List[str]] = None):
+        self.axes = axes
+        self.table = table
+        self.model_digests = model_digests or []
+        self.columns = [axis["column"] for axis in axes]
+        self.shape = tuple(self._axis_size(axis) for axis in axes)
+
+    @staticmethod
+    def _axis_size(axis: Dict) -> int:
+        return len(axis["categories"]) if "categories" in axis else axis["size"]
+
+    @property
+    def categories(self) -> Dict[str, List[str]]:
+        return {axis["column"]: axis["categories"] for axis in self.axes if "categories" in axis}
+
+    @property
+    def n_cells(self) -> int:
+        return int(np.prod(self.shape))
+
+    @classmethod
+    def get_axes(cls, X: DataFrame, resolution: Dict[str, float], categorical_columns: List[str]) -> List[Dict]:
+
+        """
+        Method Name :   get_axes
+
+        Description :   This method derives the grid axes from the observed range and categories of the training data.
+
+        Output      :   List of axes
+        """
+        axes = []
+        for column in X.columns:
+            if column in categorical_columns:
+                axes.append({"column": column, "categories": sorted(X[column].astype(str).unique().tolist())})
+            else:
+                scale = int(round(1 / resolution[column]))
+                codes = X[column].to_numpy(dtype=np.float64) * scale
+                start, stop = int(np.floor(codes.min())), int(np.ceil(codes.max()))
+                axes.append({"column": column, "scale": scale, "start": start, "size": stop - start + 1})
+        return axes
+
+    def get_grid_frame(self, start: int, stop: int) -> DataFrame:
+
+        """
+        Method Name :   get_grid_frame
+
+        Description :   This method builds the input rows of the flat table cells start to stop.
+
+        Output      :   DataFrame
+        """
+        indices = np.unravel_index(np.arange(start, stop), self.shape)
+        data = {}
+        for axis, index in zip(self.axes, indices):
+            if "categories" in axis:
+                data[axis["column"]] = np.asarray(axis["categories"], dtype=object)[index]
+            elif axis["scale"] == 1:
+                data[axis["column"]] = (axis["start"] + index).astype(np.int64)
+            else:
+                # code / scale is the same double as parsing the decimal, so cells match request values exactly
+                data[axis["column"]] = (axis["start"] + index) / axis["scale"]
+        return pd.DataFrame(data)
+
+    @classmethod
+    def build(cls,
+              cost_model: object,
+              X: DataFrame,
+              resolution: Dict[str, float],
+              categorical_columns: List[str],
+              chunk_size: int,
+              model_digests: Optional[List[str]] = None) -> "PremiumLookupTable":
+
+        """
+        Method Name :   build
+
+        Description :   This method scores the full cross product of the input grid with the cost model in chunks.
+
+        Output      :   Premium lookup table
+        """
+        logging.info("Entered the build method of PremiumLookupTable class")
+        try:
+            axes = cls.get_axes(X, resolution, categorical_columns)
+            premium_table = cls(axes, np.empty(0, dtype=np.float32), model_digests)
+            table = np.empty(premium_table.n_cells, dtype=np.float32)
+            logging.info(f"Scoring {premium_table.n_cells} grid cells of shape {premium_table.shape}")
+
+            for start in range(0, premium_table.n_cells, chunk_size):
+                stop = min(start + chunk_size, premium_table.n_cells)
+                table[start:stop] = cost_model.predict(premium_table.get_grid_frame(start, stop))
+
+            premium_table.table = table.reshape(premium_table.shape)
+            logging.info("Exited the build method of PremiumLookupTable class")
+            return premium_table
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def lookup(self, X: DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+
+        """
+        Method Name :   lookup
+
+        Description :   This method reads the premiums of the rows of X that fall on the grid.
+
+        Output      :   Premiums (nan off the grid) and the on grid mask
+        """
+        numerical, codes = {}, {}
+        for axis in self.axes:
+            column = axis["column"]
+            if "categories" in axis:
+                codes[column] = pd.Index(axis["categories"]).get_indexer(X[column].astype(object))
+            else:
+                numerical[column] = pd.to_numeric(X[column], errors="coerce").to_numpy(dtype=np.float64)
+        return self.lookup_encoded(numerical, codes, len(X))
+
+    def lookup_encoded(self,
+                       numerical: Dict[str, np.ndarray],
+                       codes: Dict[str, np.ndarray],
+                       n_rows: int) -> Tuple[np.ndarray, np.ndarray]:
+
+        """
+        Method Name :   lookup_encoded
+
+        Description :   This method reads the premiums of numerical column arrays and category codes (positions in the table categories, -1 unknown).
+
+        Output      :   Premiums (nan off the grid) and the on grid mask
+        """
+        on_grid = np.ones(n_rows, dtype=bool)
+        flat_index = np.zeros(n_rows, dtype=np.int64)
+
+        for axis, size in zip(self.axes, self.shape):
+            if "categories" in axis:
+                index = np.asarray(codes[axis["column"]], dtype=np.int64)
+            else:
+                values = np.asarray(numerical[axis["column"]], dtype=np.float64)
+                grid_codes = np.rint(values * axis["scale"])
+                with np.errstate(invalid="ignore"):
+                    on_grid &= grid_codes / axis["scale"] == values
+                index = np.nan_to_num(grid_codes - axis["start"], nan=-1, posinf=-1, neginf=-1).astype(np.int64)
+            on_grid &= (index >= 0) & (index < size)
+            flat_index = flat_index * size + np.where(on_grid, index, 0)
+
+        premiums = np.full(n_rows, np.nan)
+        premiums[on_grid] = self.table.reshape(-1)[flat_index[on_grid]]
+        return premiums, on_grid
+
+    def save(self, table_file_path: str, meta_file_path: str) -> Tuple[str, str]:
+        np.save(table_file_path, np.ascontiguousarray(self.table, dtype=np.float32))
+        with open(meta_file_path, "w") as file_obj:
+            json.dump({"axes": self.axes, "model_digests": self.model_digests}, file_obj)
+        return table_file_path, meta_file_path
+
+    @classmethod
+    def load(cls, table_file_path: str, meta_file_path: str, mmap: bool = True) -> "PremiumLookupTable":
+
+        """
+        Method Name :   load
+
+        Description :   This method opens a saved table, memory mapped by default so the pages are shared between processes.
+
+        Output      :   Premium lookup table
+        """
+        logging.info("Entered the load method of PremiumLookupTable class")
+        try:
+            with open(meta_file_path) as file_obj:
+                meta = json.load(file_obj)
+            table = np.load(table_file_path, mmap_mode="r" if mmap else None)
+            premium_table = cls(meta["axes"], table, meta.get("model_digests"))
+            if table.shape != premium_table.shape:
+                raise ValueError(f"Table shape {table.shape} does not match its axes {premium_table.shape}")
+
+            logging.info(f"Loaded premium table of shape {table.shape} from {os.path.basename(table_file_path)}")
+            return premium_table
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def __repr__(self):
+        return f"PremiumLookupTable(shape={self.shape})"
@@ -0,0 +1,254 @@
+import json
+import math
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+import numpy as np
+
+
+
+def get_trial_key(trial: Dict) -> str:
+    """
+    Identity of a trial in the checkpoint: its params and the rows of every fold fit.
+    """
+    return json.dumps({"params": trial["params"], "n_samples": trial.get("n_samples")}, sort_keys=True, default=str)
+
+
+
+class SearchStrategy(ABC):
+    """
+    Proposes the trials of one model of model.yaml and takes their mean CV
+    scores back.
+
+    A trial is a grid point of the model, plus the rows every fold fit trains
+    on when the search is budgeted on rows. Trials of the same rung ran on the
+    same resources, only those are compared to each other. ask() returns no
+    trial while the strategy waits on scores, finished is set once it will
+    never propose another one.
+    """
+    def __init__(self, param_grid: Dict[str, List], search_config: Dict, max_rows: int):
+        from sklearn.model_selection import ParameterGrid
+
+        self.param_grid = param_grid
+        self.search_config = search_config
+        self.max_rows = max_rows
+        self.rng = np.random.default_rng(search_config.get("random_state", 0))
+        self.candidates = list(ParameterGrid(param_grid))
+        self.preferred: List[int] = []
+        self.queue: List[Dict] = []
+        self.finished = False
+
+    def make_trial(self, candidate: int, rung: int = 0, **resources) -> Dict:
+        params = dict(self.candidates[candidate])
+        n_samples = resources.pop("n_samples", None)
+        params.update(resources)
+        return {"candidate": candidate, "params": params, "rung": rung, "n_samples": n_samples}
+
+    @abstractmethod
+    def ask(self, n_trials: int) -> List[Dict]:
+        pass
+
+    def get_final_params(self, params: Dict) -> Dict:
+        # Params the best trial is refitted with on the whole train split
+        return params
+
+    def prioritize(self, params_list: List[Dict]) -> None:
+        # Warm start: the grid points matching params_list (resources aside) are tried first
+        self.preferred = [
+            candidate for candidate, params in enumerate(self.candidates)
+            if any(all(other.get(name) == value for name, value in params.items()) for other in params_list)
+        ]
+        self.queue.sort(key=lambda trial: trial["candidate"] not in self.preferred)
+
+    def tell(self, trial: Dict, score: float) -> None:
+        pass
+
+
+
+class GridSearch(SearchStrategy):
+    """
+    Every grid point, the largest n_estimators first so the long fits do not all land at the end.
+    """
+    def __init__(self, param_grid: Dict[str, List], search_config: Dict, max_rows: int):
+        super().__init__(param_grid, search_config, max_rows)
+        self.queue = [
+            self.make_trial(candidate)
+            for candidate in sorted(self.get_candidates(), key=lambda i: -self.candidates[i].get("n_estimators", 100))
+        ]
+        self.finished = not self.queue
+
+    def get_candidates(self) -> List[int]:
+        return list(range(len(self.candidates)))
+
+    def ask(self, n_trials: int) -> List[Dict]:
+        trials, self.queue = self.queue[:n_trials], self.queue[n_trials:]
+        self.finished = not self.queue
+        return trials
+
+
+
+class RandomSearch(GridSearch):
+    """
+    n_iter grid points drawn without replacement.
+    """
+    def get_candidates(self) -> List[int]:
+        n_iter = min(self.search_config.get("n_iter", 10), len(self.candidates))
+        return sorted(self.rng.choice(len(self.candidates), size=n_iter, replace=False).tolist())
+
+
+
+class SuccessiveHalving(SearchStrategy):
+    """
+    Successive halving on the rows of the fold fits (resource: n_samples) or
+    on the trees (resource: n_estimators, taken out of the grid).
+
+    The first rung scores every candidate with min_resource, every next rung
+    keeps the best 1 / factor of them and multiplies the resource by factor,
+    up to max_resource: the rows of a fold, or the largest n_estimators of
+    the grid.
+    """
+    def __init__(self, param_grid: Dict[str, List], search_config: Dict, max_rows: int):
+        self.resource = search_config.get("resource", "n_estimators")
+        if self.resource == "n_samples":
+            max_resource = max_rows
+            min_resource_floor = min(max_rows, 50)
+        else:
+            max_resource = search_config.get("max_resource", max(param_grid.get(self.resource, [0]), default=0))
+            min_resource_floor = 1
+            param_grid = {name: values for name, values in param_grid.items() if name != self.resource}
+        if not max_resource:
+            raise ValueError(f"Successive halving on {self.resource} needs a max_resource")
+        super().__init__(param_grid, search_config, max_rows)
+
+        self.factor = search_config.get("factor", 3)
+        self.max_resource = int(max_resource)
+        n_rungs = 1 + math.ceil(math.log(max(len(self.candidates), 1)) / math.log(self.factor))
+        self.min_resource = int(search_config.get(
+            "min_resource", max(min_resource_floor, self.max_resource // self.factor ** (n_rungs - 1))
+        ))
+        self.rung = 0
+        self.alive = list(range(len(self.candidates)))
+        self.rung_scores: Dict[int, float] = {}
+        self.queue = self.get_rung_trials()
+
+    def get_resource(self, rung: int) -> int:
+        if len(self.alive) == 1:
+            # A single candidate left goes straight to the full resource
+            return self.max_resource
+        return min(self.max_resource, self.min_resource * self.factor ** rung)
+
+    def get_rung_trials(self) -> List[Dict]:
+        resource = self.get_resource(self.rung)
+        return [self.make_trial(candidate, self.rung, **{self.resource: resource}) for candidate in self.alive]
+
+    def ask(self, n_trials: int) -> List[Dict]:
+        trials, self.queue = self.queue[:n_trials], self.queue[n_trials:]
+        return trials
+
+    def get_final_params(self, params: Dict) -> Dict:
+        # A search stopped before the last rung still refits with all the trees
+        if self.resource == "n_samples":
+            return params
+        return {**params, self.resource: self.max_resource}
+
+    def tell(self, trial: Dict, score: float) -> None:
+        if trial["rung"] != self.rung:
+            return
+        self.rung_scores[trial["candidate"]] = score
+        if len(self.rung_scores) < len(self.alive):
+            return
+
+        if self.get_resource(self.rung) >= self.max_resource:
+            self.finished = True
+            return
+        # nan scores (failed fits) rank last, ties keep the grid order
+        ranked = sorted(self.alive, key=lambda c: (np.isnan(self.rung_scores[c]), -np.nan_to_num(self.rung_scores[c]), c))
+        self.alive = sorted(ranked[:max(1, math.ceil(len(self.alive) / self.factor))])
+        self.rung += 1
+        self.rung_scores = {}
+        self.queue = self.get_rung_trials()
+
+
+
+class SequentialModelSearch(SearchStrategy):
+    """
+    Sequential model-based search over the grid points.
+
+    n_initial random grid points, then the points with the highest upper
+    confidence bound (mean + kappa * std over the trees) of a random forest
+    surrogate fitted on the scores seen so far, until n_iter were proposed.
+    """
+    def __init__(self, param_grid: Dict[str, List], search_config: Dict, max_rows: int):
+        super().__init__(param_grid, search_config, max_rows)
+        self.n_iter = min(search_config.get("n_iter", 20), len(self.candidates))
+        self.n_initial = min(search_config.get("n_initial", 5), self.n_iter)
+        self.kappa = search_config.get("kappa", 1.0)
+        self.encoded = self.encode_candidates()
+        self.proposed: List[int] = []
+        self.observed: Dict[int, float] = {}
+        self.finished = self.n_iter == 0
+
+    def encode_candidates(self) -> np.ndarray:
+        # Numerical params as values, the others ('auto', booleans) as their index in the grid
+        columns = []
+        for name, values in sorted(self.param_grid.items()):
+            numerical = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values)
+            columns.append([
+                float(candidate[name]) if numerical else float(values.index(candidate[name]))
+                for candidate in self.candidates
+            ])
+        return np.array(columns, dtype=np.float64).T.reshape(len(self.candidates), -1)
+
+    def get_upper_bounds(self, candidates: List[int]) -> np.ndarray:
+        from sklearn.ensemble import RandomForestRegressor
+
+        observed = list(self.observed)
+        scores = np.array([self.observed[candidate] for candidate in observed])
+        finite = ~np.isnan(scores)
+        if not finite.any():
+            return self.rng.random(len(candidates))
+        # Failed fits count as the worst score seen
+        scores[~finite] = scores[finite].min()
+        surrogate = RandomForestRegressor(n_estimators=50, random_state=0).fit(self.encoded[observed], scores)
+        per_tree = np.stack([tree.predict(self.encoded[candidates]) for tree in surrogate.estimators_])
+        return per_tree.mean(axis=0) + self.kappa * per_tree.std(axis=0)
+
+    def ask(self, n_trials: int) -> List[Dict]:
+        remaining = [candidate for candidate in range(len(self.candidates)) if candidate not in self.proposed]
+        n_trials = min(n_trials, self.n_iter - len(self.proposed), len(remaining))
+        if len(self.proposed) < self.n_initial:
+            n_trials = min(n_trials, self.n_initial - len(self.proposed))
+            preferred = [candidate for candidate in self.preferred if candidate in remaining][:max(n_trials, 0)]
+            others = [candidate for candidate in remaining if candidate not in preferred]
+            n_random = min(n_trials - len(preferred), len(others))
+            chosen = preferred + (self.rng.choice(others, size=n_random, replace=False).tolist() if n_random > 0 else [])
+        elif not self.observed or n_trials <= 0:
+            chosen = []
+        else:
+            upper_bounds = self.get_upper_bounds(remaining)
+            chosen = [remaining[i] for i in np.argsort(-upper_bounds, kind="stable")[:n_trials]]
+
+        self.proposed.extend(chosen)
+        self.finished = len(self.proposed) >= self.n_iter
+        return [self.make_trial(candidate) for candidate in chosen]
+
+    def tell(self, trial: Dict, score: float) -> None:
+        self.observed[trial["candidate"]] = score
+
+
+SEARCH_STRATEGIES = {
+    "grid": GridSearch,
+    "random": RandomSearch,
+    "halving": SuccessiveHalving,
+    "bayesian": SequentialModelSearch,
+}
+
+
+def get_search_strategy(param_grid: Dict[str, List], search_config: Optional[Dict], max_rows: int) -> SearchStrategy:
+    """
+    Strategy named by the strategy key of the search_strategy entry of a model in model.yaml, grid by default.
+    """
+    search_config = search_config or {}
+    strategy = search_config.get("strategy", "grid")
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unknown search strategy {strategy}, expected one of {sorted(SEARCH_STRATEGIES)}")
+    return SEARCH_STRATEGIES[strategy](param_grid, search_config, max_rows)
@@ -0,0 +1,468 @@
+import io
+import json
+import os
+import sys
+from typing import Dict, List
+import numpy as np
+from pandas import DataFrame
+from insurancePrice.components.compiled_model import CompiledPreprocessor
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+
+
+
+class FlatTreeEnsemble:
+    """
+    Tree ensemble stored as contiguous node arrays.
+
+    Node i splits on feature[i] at threshold[i] and continues at left[i] or
+    right[i]; leaves point back to themselves, so a fixed number of
+    vectorized steps (the ensemble depth) takes every (row, tree) pair to its
+    leaf. Forest predictions are the mean of the leaf values, boosted
+    predictions are base_score plus their sum.
+
+    Only numpy is needed to predict, the exporters import sklearn/xgboost
+    lazily at training time.
+    """
+    def __init__(self,
+                 feature: np.ndarray,
+                 threshold: np.ndarray,
+                 left: np.ndarray,
+                 right: np.ndarray,
+                 value: np.ndarray,
+                 roots: np.ndarray,
+                 max_depth: int,
+                 aggregation: str,
+                 base_score: float = 0.0,
+                 strict: bool = False,
+                 float32_input: bool = True):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.aggregation = aggregation
+        self.base_score = float(base_score)
+        # sklearn goes left on x <= threshold, xgboost on x < threshold
+        self.strict = bool(strict)
+        # Both libraries compare float32 features, until fold_scaler moves the thresholds to raw float64 units
+        self.float32_input = bool(float32_input)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_model(cls, model: object) -> "FlatTreeEnsemble":
+        model_name = type(model).__name__
+        if model_name.startswith("XGB"):
+            return cls.from_xgboost(model)
+        if hasattr(model, "estimators_") or hasattr(model, "tree_"):
+            return cls.from_sklearn(model)
+        raise ValueError(f"{model_name} cannot be flattened")
+
+    @classmethod
+    def _from_node_lists(cls, trees: List[Dict[str, np.ndarray]], **kwargs) -> "FlatTreeEnsemble":
+        # Concatenating the per tree arrays and shifting the child indices by the tree offset
+        offsets = np.cumsum([0] + [len(tree["feature"]) for tree in trees[:-1]])
+        left = np.concatenate([tree["left"] + offset for tree, offset in zip(trees, offsets)])
+        right = np.concatenate([tree["right"] + offset for tree, offset in zip(trees, offsets)])
+        return cls(
+            feature=np.concatenate([tree["feature"] for tree in trees]).astype(np.int32),
+            threshold=np.concatenate([tree["threshold"] for tree in trees]).astype(np.float64),
+            left=left.astype(np.int32),
+            right=right.astype(np.int32),
+            value=np.concatenate([tree["value"] for tree in trees]).astype(np.float64),
+            roots=offsets.astype(np.int32),
+            max_depth=max(tree["depth"] for tree in trees),
+            **kwargs,
+        )
+
+    @classmethod
+    def from_sklearn(cls, model: object) -> "FlatTreeEnsemble":
+
+        """
+        Method Name :   from_sklearn
+
+        Description :   This method flattens a fitted sklearn decision tree or forest regressor.
+
+        Output      :   Flat tree ensemble
+        """
+        try:
+            estimators = getattr(model, "estimators_", [model])
+            trees = []
+            for estimator in estimators:
+                tree = estimator.tree_
+                node_ids = np.arange(tree.node_count)
+                is_leaf = tree.children_left == -1
+                trees.append({
+                    "feature": np.where(is_leaf, 0, tree.feature),
+                    "threshold": np.where(is_leaf, np.inf, tree.threshold),
+                    "left": np.where(is_leaf, node_ids, tree.children_left),
+                    "right": np.where(is_leaf, node_ids, tree.children_right),
+                    "value": tree.value[:, 0, 0],
+                    "depth": tree.max_depth,
+                })
+            return cls._from_node_lists(trees, aggregation="mean", strict=False)
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    @classmethod
+    def from_xgboost(cls, model: object) -> "FlatTreeEnsemble":
+
+        """
+        Method Name :   from_xgboost
+
+        Description :   This method flattens a fitted XGBRegressor with an identity link from its json tree dump.
+
+        Output      :   Flat tree ensemble
+        """
+        try:
+            booster = model.get_booster()
+            config = json.loads(booster.save_config())["learner"]
+            objective = config["objective"]["name"]
+            if objective not in ("reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror"):
+                raise ValueError(f"Objective {objective} does not have an identity link")
+            base_score = float(config["learner_model_param"]["base_score"].strip("[]"))
+
+            feature_names = booster.feature_names
+            feature_index = {name: idx for idx, name in enumerate(feature_names)} if feature_names else None
+
+            dumps = booster.get_dump(dump_format="json")
+            try:
+                dumps = dumps[:model.best_iteration + 1]
+            except AttributeError:
+                # best_iteration only exists when early stopping was used
+                pass
+
+            trees = []
+            for dump in dumps:
+                nodes = {}
+                stack = [(json.loads(dump), 0)]
+                depth = 0
+                while stack:
+                    node, node_depth = stack.pop()
+                    depth = max(depth, node_depth)
+                    nodes[node["nodeid"]] = node
+                    stack.extend((child, node_depth + 1) for child in node.get("children", []))
+
+                n_nodes = max(nodes) + 1
+                tree = {
+                    "feature": np.zeros(n_nodes, dtype=np.int32),
+                    "threshold": np.full(n_nodes, np.inf),
+                    "left": np.arange(n_nodes),
+                    "right": np.arange(n_nodes),
+                    "value": np.zeros(n_nodes),
+                    "depth": depth,
+                }
+                for node_id, node in nodes.items():
+                    if "leaf" in node:
+                        tree["value"][node_id] = np.float32(node["leaf"])
+                        continue
+                    if isinstance(node["split_condition"], list):
+                        # Native categorical splits test set membership, not a threshold
+                        raise ValueError("XGBRegressor with categorical splits cannot be flattened")
+                    split = node["split"]
+                    tree["feature"][node_id] = feature_index[split] if feature_index else int(split.lstrip("f"))
+                    tree["threshold"][node_id] = np.float32(node["split_condition"])
+                    tree["left"][node_id] = node["yes"]
+                    tree["right"][node_id] = node["no"]
+                trees.append(tree)
+
+            return cls._from_node_lists(trees, aggregation="sum", base_score=base_score, strict=True)
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def _goes_left(self, x: np.ndarray, threshold: np.ndarray, mean: np.ndarray, scale: np.ndarray) -> np.ndarray:
+        # The split as the fitted model evaluates it: scaled in float64, then cast to float32
+        scaled = ((x - mean) / scale).astype(np.float32).astype(np.float64)
+        return scaled < threshold if self.strict else scaled <= threshold
+
+    def fold_scaler(self, mean: np.ndarray, scale: np.ndarray) -> "FlatTreeEnsemble":
+
+        """
+        Method Name :   fold_scaler
+
+        Description :   This method rewrites every split threshold in raw (unscaled float64) feature units.
+
+        Output      :   Flat tree ensemble
+        """
+        # mean and scale are per input feature, 0 and 1 for the features that are not scaled.
+        # (x - mean) / scale <= t is x <= t * scale + mean up to rounding, and the float32 cast
+        # of sklearn/xgboost moves the boundary by a few ulps, so the exact raw boundary is
+        # found by bisection between two values on either side of t * scale + mean.
+        if not self.float32_input:
+            return self
+
+        internal = np.flatnonzero(self.left != np.arange(self.n_nodes))
+        threshold = self.threshold[internal]
+        mean = np.asarray(mean, dtype=np.float64)[self.feature[internal]]
+        scale = np.asarray(scale, dtype=np.float64)[self.feature[internal]]
+
+        guess = threshold * scale + mean
+        delta = (np.abs(guess) + np.abs(mean) + scale) * 1e-6
+        lo, hi = guess - delta, guess + delta
+        while True:
+            widen_lo = ~self._goes_left(lo, threshold, mean, scale)
+            widen_hi = self._goes_left(hi, threshold, mean, scale)
+            if not (widen_lo.any() or widen_hi.any()):
+                break
+            delta *= 2
+            lo[widen_lo] -= delta[widen_lo]
+            hi[widen_hi] += delta[widen_hi]
+
+        # Invariant: lo goes left, hi goes right
+        for _ in range(2100):
+            mid = lo + (hi - lo) / 2
+            open_ = (mid > lo) & (mid < hi)
+            if not open_.any():
+                break
+            left = self._goes_left(mid, threshold, mean, scale)
+            lo = np.where(open_ & left, mid, lo)
+            hi = np.where(open_ & ~left, mid, hi)
+
+        # Strict splits keep x < hi, the others x <= lo
+        self.threshold = self.threshold.copy()
+        self.threshold[internal] = hi if self.strict else lo
+        self.float32_input = False
+        return self
+
+    def predict(self, X: np.ndarray, chunk_size: int = 512) -> np.ndarray:
+
+        """
+        Method Name :   predict
+
+        Description :   This method walks every tree for every row level by level with vectorized gathers.
+
+        Output      :   Predictions
+        """
+        X = np.ascontiguousarray(X, dtype=np.float32 if self.float32_input else np.float64)
+        n_rows, n_features = X.shape
+        feature, left, right = (self.feature.astype(np.intp), self.left.astype(np.intp), self.right.astype(np.intp))
+        roots = self.roots.astype(np.intp)
+        predictions = np.empty(n_rows, dtype=np.float64)
+
+        # Small row chunks keep the (rows, trees) node matrix in cache
+        for start in range(0, n_rows, chunk_size):
+            chunk = X[start:start + chunk_size]
+            values = chunk.ravel()
+            row_offsets = (np.arange(len(chunk)) * n_features)[:, None]
+            nodes = np.broadcast_to(roots, (len(chunk), self.n_trees))
+
+            for _ in range(self.max_depth):
+                x = values.take(row_offsets + feature.take(nodes))
+                threshold = self.threshold.take(nodes)
+                go_left = x < threshold if self.strict else x <= threshold
+                nodes = np.where(go_left, left.take(nodes), right.take(nodes))
+
+            leaf_values = self.value.take(nodes)
+            if self.aggregation == "mean":
+                predictions[start:start + chunk_size] = leaf_values.mean(axis=1)
+            else:
+                predictions[start:start + chunk_size] = leaf_values.sum(axis=1) + self.base_score
+        return predictions
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "feature": self.feature,
+            "threshold": self.threshold,
+            "left": self.left,
+            "right": self.right,
+            "value": self.value,
+            "roots": self.roots,
+        }
+
+    def get_params(self) -> Dict:
+        return {
+            "max_depth": self.max_depth,
+            "aggregation": self.aggregation,
+            "base_score": self.base_score,
+            "strict": self.strict,
+            "float32_input": self.float32_input,
+        }
+
+
+
+class FlatCostModel:
+    """
+    Serving form of a CostModel: the compiled preprocessor without the scaling
+    step and a FlatTreeEnsemble whose thresholds have the scaler folded in.
+    """
+    def __init__(self,
+                 preprocessor: CompiledPreprocessor,
+                 ensemble: FlatTreeEnsemble,
+                 model_name: str = "FlatTreeEnsemble"):
+        self.preprocessor = preprocessor
+        self.ensemble = ensemble
+        self.model_name = model_name
+
+    @classmethod
+    def from_cost_model(cls, cost_model: object) -> "FlatCostModel":
+
+        """
+        Method Name :   from_cost_model
+
+        Description :   This method flattens the regressor of a CostModel and folds its StandardScaler into the split thresholds.
+
+        Output      :   Flat cost model
+        """
+        logging.info("Entered the from_cost_model method of FlatCostModel class")
+        try:
+            compiled = CompiledPreprocessor.from_column_transformer(cost_model.preprocessing_object)
+            ensemble = FlatTreeEnsemble.from_model(cost_model.trained_model_object)
+            mean, scale = np.zeros(compiled.n_features), np.ones(compiled.n_features)
+            numerical = slice(compiled.numerical_offset, compiled.numerical_offset + len(compiled.numerical_columns))
+            mean[numerical], scale[numerical] = compiled.mean, compiled.scale
+            ensemble.fold_scaler(mean, scale)
+
+            raw_preprocessor = CompiledPreprocessor(
+                onehot_blocks=compiled.onehot_blocks,
+                numerical_columns=compiled.numerical_columns,
+                numerical_offset=compiled.numerical_offset,
+                mean=np.zeros_like(compiled.mean),
+                scale=np.ones_like(compiled.scale),
+                n_features=compiled.n_features,
+            )
+            logging.info(
+                f"Flattened {ensemble.n_trees} trees with {ensemble.n_nodes} nodes and depth {ensemble.max_depth}"
+            )
+            return cls(raw_preprocessor, ensemble, model_name=type(cost_model.trained_model_object).__name__)
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def predict(self, X: DataFrame) -> np.ndarray:
+        try:
+            return self.ensemble.predict(self.preprocessor.transform(X))
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def predict_record(self, record: Dict) -> float:
+        try:
+            return float(self.ensemble.predict(self.preprocessor.transform_record(record))[0])
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    @property
+    def categories(self) -> Dict[str, List[str]]:
+        return self.preprocessor.categories
+
+    def predict_encoded(self, numerical: Dict[str, np.ndarray], codes: Dict[str, np.ndarray]) -> np.ndarray:
+        try:
+            return self.ensemble.predict(self.preprocessor.transform_columns(numerical, codes))
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def verify(self, cost_model: object, X: DataFrame, rtol: float) -> float:
+        """
+        Share of rows of X whose flat prediction is not within rtol of the CostModel prediction.
+        """
+        expected = np.asarray(cost_model.predict(X), dtype=np.float64)
+        mismatched = ~np.isclose(self.predict(X), expected, rtol=rtol, atol=0.0)
+        mismatch_ratio = float(mismatched.mean()) if len(X) else 0.0
+        logging.info(f"Flat model mismatches the CostModel on {mismatched.sum()} of {len(X)} rows")
+        return mismatch_ratio
+
+    def save(self, file_path: str) -> str:
+        with open(file_path, "wb") as file_obj:
+            file_obj.write(self.to_bytes())
+        return file_path
+
+    def get_metadata(self) -> Dict:
+        return {
+            "model_name": self.model_name,
+            "ensemble": self.ensemble.get_params(),
+            "onehot_blocks": self.preprocessor.onehot_blocks,
+            "numerical_columns": self.preprocessor.numerical_columns,
+            "numerical_offset": self.preprocessor.numerical_offset,
+            "n_features": self.preprocessor.n_features,
+        }
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(buffer, metadata=np.array(json.dumps(self.get_metadata())), **self.ensemble.to_arrays())
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FlatCostModel":
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            return cls.from_arrays({name: arrays[name] for name in arrays.files})
+
+    @classmethod
+    def load(cls, file_path: str) -> "FlatCostModel":
+        with open(file_path, "rb") as file_obj:
+            return cls.from_bytes(file_obj.read())
+
+    def to_mmap(self, directory: str) -> "FlatCostModel":
+
+        """
+        Method Name :   to_mmap
+
+        Description :   This method writes the arrays as .npy files in directory and reopens them as read only memory maps.
+
+        Output      :   Flat cost model backed by the files
+        """
+        os.makedirs(directory, exist_ok=True)
+        files = {"metadata.json": json.dumps(self.get_metadata()).encode()}
+        for name, array in self.ensemble.to_arrays().items():
+            buffer = io.BytesIO()
+            np.save(buffer, array)
+            files[f"{name}.npy"] = buffer.getvalue()
+
+        for file_name, data in files.items():
+            file_path = os.path.join(directory, file_name)
+            # The directory is shared by processes, a complete file is never rewritten
+            if not os.path.exists(file_path):
+                partial_file_path = f"{file_path}.{os.getpid()}.part"
+                with open(partial_file_path, "wb") as file_obj:
+                    file_obj.write(data)
+                os.replace(partial_file_path, file_path)
+        return self.from_mmap(directory)
+
+    @classmethod
+    def from_mmap(cls, directory: str) -> "FlatCostModel":
+        with open(os.path.join(directory, "metadata.json")) as file_obj:
+            arrays = {"metadata": np.array(file_obj.read())}
+        for name in ("feature", "threshold", "left", "right", "value", "roots"):
+            arrays[name] = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+        return cls.from_arrays(arrays)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> "FlatCostModel":
+        metadata = json.loads(str(arrays["metadata"]))
+        n_numerical = len(metadata["numerical_columns"])
+        preprocessor = CompiledPreprocessor(
+            onehot_blocks=[tuple(block) for block in metadata["onehot_blocks"]],
+            numerical_columns=metadata["numerical_columns"],
+            numerical_offset=metadata["numerical_offset"],
+            mean=np.zeros(n_numerical),
+            scale=np.ones(n_numerical),
+            n_features=metadata["n_features"],
+        )
+        ensemble = FlatTreeEnsemble(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            left=arrays["left"],
+            right=arrays["right"],
+            value=arrays["value"],
+            roots=arrays["roots"],
+            **metadata["ensemble"],
+        )
+        return cls(preprocessor, ensemble, model_name=metadata["model_name"])
+
+    def __repr__(self):
+        return f"Flat{self.model_name}()"
+
+    def __str__(self):
+        return f"Flat{self.model_name}()"
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from insurancePrice.constants import *
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+
+
+
+class TuningCache:
+    """
+    On disk store of the CV results of tuning trials, shared by the training
+    runs of this host.
+
+    A trial is keyed by the fingerprint of the transformed train split, the
+    estimator, its params, the rows of every fold fit and the CV splitter, and
+    keeps its fold scores and fit time, plus the params to refit it with when
+    they differ from its params (early stopped boosting). Entries not used for max_age_days are
+    evicted, then the least recently used ones beyond max_entries.
+    """
+    def __init__(self,
+                 cache_path: str = TUNING_CACHE_PATH,
+                 max_age_days: float = TUNING_CACHE_MAX_AGE_DAYS,
+                 max_entries: int = TUNING_CACHE_MAX_ENTRIES):
+        self.cache_path = cache_path
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        # Concurrent training jobs wait on each other's writes instead of failing
+        self.connection = sqlite3.connect(cache_path, timeout=30)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS trials ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT, estimator TEXT, params TEXT, n_samples INTEGER, cv TEXT, "
+                "fold_scores TEXT, score REAL, fit_seconds REAL, created_at REAL, used_at REAL, refit_params TEXT)"
+            )
+            columns = [row[1] for row in self.connection.execute("PRAGMA table_info(trials)")]
+            if "refit_params" not in columns:
+                # Cache written before the trials kept their refit params
+                self.connection.execute("ALTER TABLE trials ADD COLUMN refit_params TEXT")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS trials_estimator ON trials (estimator, created_at)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS trials_used_at ON trials (used_at)")
+
+    @staticmethod
+    def get_fingerprint(x_train: np.ndarray, y_train: np.ndarray) -> str:
+        digest = hashlib.sha256()
+        for array in (np.asarray(x_train), np.asarray(y_train)):
+            digest.update(str(array.shape).encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_key(fingerprint: str, estimator: str, params: Dict, cv: Dict, n_samples: Optional[int] = None) -> str:
+        trial = {"fingerprint": fingerprint, "estimator": estimator, "params": params, "cv": cv, "n_samples": n_samples}
+        return hashlib.sha256(json.dumps(trial, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get(self, fingerprint: str, estimator: str, params: Dict, cv: Dict, n_samples: Optional[int] = None) -> Optional[Dict]:
+
+        """
+        Method Name :   get
+
+        Description :   This method looks up the CV result of a trial and marks it as used.
+
+        Output      :   Fold scores, mean score, fit seconds and refit params, or None
+        """
+        try:
+            key = self.get_key(fingerprint, estimator, params, cv, n_samples)
+            row = self.connection.execute(
+                "SELECT fold_scores, fit_seconds, refit_params FROM trials WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            with self.connection:
+                self.connection.execute("UPDATE trials SET used_at = ? WHERE key = ?", (time.time(), key))
+            fold_scores = json.loads(row[0])
+            return {
+                "fold_scores": fold_scores,
+                "score": float(np.mean(fold_scores)),
+                "fit_seconds": row[1],
+                "refit_params": json.loads(row[2]) if row[2] else None,
+            }
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def put(self, fingerprint: str, estimator: str, params: Dict, cv: Dict, fold_scores: List[float],
+            fit_seconds: float, n_samples: Optional[int] = None, refit_params: Optional[Dict] = None) -> None:
+
+        """
+        Method Name :   put
+
+        Description :   This method stores the fold scores and fit time of a trial scored on every fold.
+
+        Output      :   None
+        """
+        try:
+            score = float(np.mean(fold_scores))
+            now = time.time()
+            with self.connection:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO trials (key, fingerprint, estimator, params, n_samples, cv, fold_scores, "
+                    "score, fit_seconds, created_at, used_at, refit_params) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        self.get_key(fingerprint, estimator, params, cv, n_samples), fingerprint, estimator,
+                        json.dumps(params, sort_keys=True, default=str), n_samples, json.dumps(cv, sort_keys=True),
+                        json.dumps([float(fold_score) for fold_score in fold_scores]),
+                        None if np.isnan(score) else score, fit_seconds, now, now,
+                        json.dumps(refit_params, sort_keys=True, default=str) if refit_params else None,
+                    ),
+                )
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def get_previous_best_params(self, fingerprint: str, estimator: str, cv: Dict, n_params: int) -> List[Dict]:
+
+        """
+        Method Name :   get_previous_best_params
+
+        Description :   This method returns the best params of the estimator on the last other data set it was tuned on, to warm start a search.
+
+        Output      :   Up to n_params params, best first
+        """
+        try:
+            row = self.connection.execute(
+                "SELECT fingerprint FROM trials WHERE estimator = ? AND cv = ? AND fingerprint != ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (estimator, json.dumps(cv, sort_keys=True), fingerprint),
+            ).fetchone()
+            if row is None:
+                return []
+            rows = self.connection.execute(
+                "SELECT params FROM trials WHERE estimator = ? AND cv = ? AND fingerprint = ? AND n_samples IS NULL "
+                "AND score IS NOT NULL ORDER BY score DESC LIMIT ?",
+                (estimator, json.dumps(cv, sort_keys=True), row[0], n_params),
+            ).fetchall()
+            return [json.loads(params) for params, in rows]
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def evict(self) -> int:
+
+        """
+        Method Name :   evict
+
+        Description :   This method drops the trials not used for max_age_days, then the least recently used ones beyond max_entries.
+
+        Output      :   Number of trials dropped
+        """
+        logging.info("Entered the evict method of TuningCache class")
+        try:
+            with self.connection:
+                evicted = self.connection.execute(
+                    "DELETE FROM trials WHERE used_at < ?", (time.time() - self.max_age_days * 86400,)
+                ).rowcount
+                evicted += self.connection.execute(
+                    "DELETE FROM trials WHERE key IN (SELECT key FROM trials ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                ).rowcount
+            logging.info(f"Evicted {evicted} trials from the tuning cache")
+            logging.info("Exited the evict method of TuningCache class")
+            return evicted
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def close(self) -> None:
+        self.connection.close()
@@ -1,6 +1,7 @@
+import os
 import sys
 from json import loads
-from typing import Collection
+from typing import Collection, Dict, Iterator, List, Optional
 from pandas import DataFrame
 from pymongo.database import Database
 import pandas as pd
@@ -13,7 +14,10 @@ from insurancePrice.logger import logging
 
 class MongoDBOperation:
     def __init__(self):
-        self.DB_URL = DB_URL
+        # Resolved when the connection is made, not when the package is imported
+        self.DB_URL = os.environ.get("MONGO_DB_URL", DB_URL)
+        if not self.DB_URL:
+            raise ValueError("MONGO_DB_URL environment variable is not set")
         self.client = MongoClient(self.DB_URL)
 
     def get_database(self, db_name) -> Database:
@@ -61,6 +65,57 @@ class MongoDBOperation:
         except Exception as e:
             raise InsuranceException(e, sys) from e
 
+    @staticmethod
+    def get_id_boundaries(collection, n_ranges: int, query: Optional[Dict] = None) -> List:
+
+        """
+        Method Name :   get_id_boundaries
+
+        Description :   This method splits the documents matching query into up to n_ranges _id ranges of about the same size
+        
+        Output      :   The inner _id boundaries in ascending order, n_ranges - 1 of them at most
+        """
+        logging.info("Entered get_id_boundaries method of MongoDB_Operation class")
+
+        try:
+            query = query or {}
+            count = collection.count_documents(query)
+
+            boundaries = []
+            for index in range(1, n_ranges):
+                # Walks the _id index only, the documents are not fetched
+                cursor = collection.find(query, {"_id": 1}).sort("_id", 1).skip(index * count // n_ranges).limit(1)
+                document = next(iter(cursor), None)
+                if document is not None and (not boundaries or document["_id"] > boundaries[-1]):
+                    boundaries.append(document["_id"])
+
+            logging.info(f"Split {count} documents into {len(boundaries) + 1} _id ranges")
+            logging.info("Exited get_id_boundaries method of MongoDB_Operation class")
+            return boundaries
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    @staticmethod
+    def iter_batches(collection, query: Dict, projection: Dict, batch_size: int) -> Iterator[List[Dict]]:
+
+        """
+        Method Name :   iter_batches
+        
+        Description :   This method streams the projected documents matching query in _id order, batch_size documents at a time
+        
+        Output      :   Iterator of lists of documents
+        """
+        cursor = collection.find(query, projection, sort=[("_id", 1)], batch_size=batch_size)
+        batch = []
+        for document in cursor:
+            batch.append(document)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
     def get_collection_as_dataframe(self, db_name, collection_name) -> DataFrame:
 
         """
@@ -80,8 +135,8 @@ class MongoDBOperation:
             # Getting the colleciton name
             collection = database.get_collection(name=collection_name)
 
-            # Reading the dataframe and dropping the _id column
-            df = pd.DataFrame(list(collection.find()))
+            # Reading the dataframe in _id order, so the same documents give the same train split, and dropping the _id column
+            df = pd.DataFrame(list(collection.find().sort("_id", 1)))
             if "_id" in df.columns.to_list():
                 df = df.drop(columns=["_id"], axis=1)
 
@@ -2,12 +2,14 @@ import os
 import pickle
 import sys
 from io import StringIO
-from typing import List, Union
+from typing import TYPE_CHECKING, Callable, List, Tuple, Union
 from insurancePrice.constants import *
 import boto3
 from insurancePrice.exception import InsuranceException
 from botocore.exceptions import ClientError
-from mypy_boto3_s3.service_resource import Bucket
+if TYPE_CHECKING:
+    # Type stubs are a development dependency only
+    from mypy_boto3_s3.service_resource import Bucket
 from pandas import DataFrame, read_csv
 from insurancePrice.logger import logging
 
@@ -45,7 +47,7 @@ class S3Operation:
         except Exception as e:
             raise InsuranceException(e, sys) from e
 
-    def get_bucket(self, bucket_name: str) -> Bucket:
+    def get_bucket(self, bucket_name: str) -> "Bucket":
 
         """
         Method Name :   get_bucket
@@ -138,6 +140,80 @@ class S3Operation:
         except Exception as e:
             raise InsuranceException(e, sys) from e
 
+    @staticmethod
+    def get_version_tag(response: dict) -> str:
+        # VersionId when the bucket is versioned, else ETag and LastModified of the HEAD/GET response
+        if response.get("VersionId") and response["VersionId"] != "null":
+            return response["VersionId"]
+        last_modified = response.get("LastModified")
+        return f"{response['ETag']}@{last_modified.isoformat()}" if last_modified else response["ETag"]
+
+    def get_object_version(self, bucket_name: str, key: str) -> str:
+
+        """
+        Method Name :   get_object_version
+
+        Description :   This method gets the version tag (VersionId if versioning is enabled, else ETag and LastModified) of the key object with a HEAD request
+
+        Output      :   Version tag of the object in s3 bucket
+        """
+        logging.info("Entered the get_object_version method of S3Operations class")
+        try:
+            response = self.s3_client.head_object(Bucket=bucket_name, Key=key)
+            version = self.get_version_tag(response)
+            logging.info("Exited the get_object_version method of S3Operations class")
+            return version
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def load_model_with_version(
+        self, model_name: str, bucket_name: str, model_dir: str = None, deserializer: Callable[[bytes], object] = pickle.loads
+    ) -> Tuple[object, str]:
+
+        """
+        Method Name :   load_model_with_version
+
+        Description :   This method loads the model_name from bucket_name bucket with a single GET request along with its version tag
+
+        Output      :   Model object and the version tag of the object it was loaded from
+        """
+        logging.info("Entered the load_model_with_version method of S3Operations class")
+
+        try:
+            model_file = model_name if model_dir is None else model_dir + "/" + model_name
+            response = self.s3_client.get_object(Bucket=bucket_name, Key=model_file)
+            version = self.get_version_tag(response)
+            model = deserializer(response["Body"].read())
+            logging.info("Exited the load_model_with_version method of S3Operations class")
+            return model, version
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def download_file(self, key: str, bucket_name: str, to_filename: str) -> str:
+
+        """
+        Method Name :   download_file
+
+        Description :   This method downloads the key object of bucket_name bucket to the to_filename local file
+
+        Output      :   Local file path
+        """
+        logging.info("Entered the download_file method of S3Operations class")
+
+        try:
+            os.makedirs(os.path.dirname(to_filename), exist_ok=True)
+            # Writing to a temporary name first so readers never see a partial file
+            partial_filename = f"{to_filename}.{os.getpid()}.part"
+            self.s3_client.download_file(bucket_name, key, partial_filename)
+            os.replace(partial_filename, to_filename)
+            logging.info("Exited the download_file method of S3Operations class")
+            return to_filename
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
     def create_folder(self, folder_name: str, bucket_name: str) -> None:
 
         """
@@ -198,6 +274,24 @@ class S3Operation:
         except Exception as e:
             raise InsuranceException(e, sys) from e
 
+    def delete_file(self, filename: str, bucket_name: str) -> None:
+
+        """
+        Method Name :   delete_file
+
+        Description :   This method deletes the filename object of bucket_name bucket, a missing object is not an error
+        
+        Output      :   Object is deleted from s3 bucket
+        """
+        logging.info("Entered the delete_file method of S3Operations class")
+        try:
+            self.s3_client.delete_object(Bucket=bucket_name, Key=filename)
+            logging.info(f"Deleted {filename} file from {bucket_name} bucket")
+            logging.info("Exited the delete_file method of S3Operations class")
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
     def upload_folder(self, folder_name: str, bucket_name: str) -> None:
 
         """
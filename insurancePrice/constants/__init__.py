@@ -1,4 +1,5 @@
 import os
+import tempfile
 from os import environ
 from datetime import datetime
 from from_root.root import from_root
@@ -8,12 +9,15 @@ TIMESTAMP:str = datetime.now().strftime("%m_%d_%Y_%H_%M_%S")
 MODEL_CONFIG_FILE = "config/model.yaml"
 SCHEMA_FILE_PATH = "config/schema.yaml"
 
-DB_URL = environ["MONGO_DB_URL"]
+# Only the training pipeline talks to MongoDB, so serving starts without MONGO_DB_URL
+DB_URL = environ.get("MONGO_DB_URL")
 
 TARGET_COLUMN = "expenses"
 DB_NAME = "insurance"
 COLLECTION_NAME = "insurance_data"
 TEST_SIZE = 0.2
+# Same data, same split: a retrain on unchanged data hits the tuning cache
+TRAIN_TEST_SPLIT_SEED = int(environ.get("TRAIN_TEST_SPLIT_SEED", 42))
 ARTIFACTS_DIR = os.path.join(from_root(), "artifacts", TIMESTAMP)
 
 """
@@ -42,6 +46,10 @@ TRANSFORMED_TEST_DATA_DIR = "TransformedTest"
 TRANSFORMED_TRAIN_DATA_FILE_NAME = "transformed_train_data.npz"
 TRANSFORMED_TEST_DATA_FILE_NAME = "transformed_test_data.npz"
 PREPROCESSOR_OBJECT_FILE_NAME = "insurance_preprocessor.pkl"
+# Preprocessing of the models without a preprocessing_profile entry in model.yaml,
+# the artifacts of the other profiles are written to a subdirectory named after them
+DEFAULT_PREPROCESSING_PROFILE = "onehot"
+PREPROCESSING_PROFILES = ["onehot", "categorical"]
 
 
 """
@@ -51,6 +59,46 @@ Model Trainer Constants
 MODEL_TRAINER_ARTIFACTS_DIR = "ModelTrainerArtifacts"
 MODEL_FILE_NAME = "insurance_price_model.pkl"
 MODEL_SAVE_FORMAT = ".pkl"
+COMPILE_COST_MODEL = environ.get("COMPILE_COST_MODEL", "true").lower() == "true"
+COMPILED_MODEL_TOLERANCE = float(environ.get("COMPILED_MODEL_TOLERANCE", 1e-6))
+FLAT_MODEL_FILE_NAME = "insurance_price_model.npz"
+EXPORT_FLAT_MODEL = environ.get("EXPORT_FLAT_MODEL", "true").lower() == "true"
+FLAT_MODEL_TOLERANCE = float(environ.get("FLAT_MODEL_TOLERANCE", 1e-4))
+MODEL_BUNDLE_FILE_NAME = "insurance_price_model.bundle.tar"
+EXPORT_MODEL_BUNDLE = environ.get("EXPORT_MODEL_BUNDLE", "true").lower() == "true"
+ONNX_MODEL_FILE_NAME = "insurance_price_model.onnx"
+# Needs skl2onnx (and onnxmltools for xgboost) at training time
+EXPORT_ONNX_MODEL = environ.get("EXPORT_ONNX_MODEL", "false").lower() == "true"
+ONNX_MODEL_TOLERANCE = float(environ.get("ONNX_MODEL_TOLERANCE", 1e-4))
+ONNX_TARGET_OPSET = int(environ.get("ONNX_TARGET_OPSET", 17))
+BUILD_PREMIUM_TABLE = environ.get("BUILD_PREMIUM_TABLE", "false").lower() == "true"
+PREMIUM_TABLE_FILE_NAME = "insurance_price_premium_table.npy"
+PREMIUM_TABLE_META_FILE_NAME = "insurance_price_premium_table.json"
+PREMIUM_TABLE_CHUNK_SIZE = int(environ.get("PREMIUM_TABLE_CHUNK_SIZE", 100000))
+
+"""
+Model tuning constants
+"""
+# Fans the search fits of every model out to one process pool, false runs GridSearchCV model by model
+PARALLEL_TUNING = environ.get("PARALLEL_TUNING", "true").lower() == "true"
+# Cores shared by all the fits running at once: workers x threads per fit never exceeds it
+TUNING_CPU_BUDGET = int(environ.get("TUNING_CPU_BUDGET", os.cpu_count() or 1))
+# n_jobs (nthread for xgboost) and the OpenMP/BLAS threads of every fit
+TUNING_THREADS_PER_FIT = int(environ.get("TUNING_THREADS_PER_FIT", 1))
+TUNING_CV_FOLDS = int(environ.get("TUNING_CV_FOLDS", 2))
+# A trial with a fold R2 this far below the best mean R2 of its rung is pruned, its other folds are not fitted
+TUNING_EARLY_STOP_MARGIN = float(environ.get("TUNING_EARLY_STOP_MARGIN", 0.1))
+# Share of the rows of a training fold held out to pick the boosting rounds of an early stopped trial,
+# the trial is scored on its validation fold, which early stopping never sees
+TUNING_EARLY_STOPPING_FRACTION = float(environ.get("TUNING_EARLY_STOPPING_FRACTION", 0.2))
+TUNING_CHECKPOINT_FILE_NAME = "tuning_checkpoint.json"
+# CV results of past trials by data fingerprint, estimator and params, shared by the training runs of this host
+TUNING_CACHE_ENABLED = environ.get("TUNING_CACHE_ENABLED", "true").lower() == "true"
+TUNING_CACHE_PATH = environ.get("TUNING_CACHE_PATH", os.path.join(from_root(), "artifacts", "tuning_cache.sqlite3"))
+TUNING_CACHE_MAX_AGE_DAYS = float(environ.get("TUNING_CACHE_MAX_AGE_DAYS", 30))
+TUNING_CACHE_MAX_ENTRIES = int(environ.get("TUNING_CACHE_MAX_ENTRIES", 100000))
+# Best params of the previous data set tried first by the searches of a new one
+TUNING_WARM_START_TRIALS = int(environ.get("TUNING_WARM_START_TRIALS", 3))
 
 """
 s3 bucket constants
@@ -58,6 +106,96 @@ s3 bucket constants
 
 BUCKET_NAME = "insurprice-io-files"
 S3_MODEL_NAME = "insurance_price_model.pkl"
+S3_FLAT_MODEL_NAME = "insurance_price_model.npz"
+S3_MODEL_BUNDLE_NAME = "insurance_price_model.bundle.tar"
+S3_ONNX_MODEL_NAME = "insurance_price_model.onnx"
+S3_PREMIUM_TABLE_NAME = "insurance_price_premium_table.npy"
+S3_PREMIUM_TABLE_META_NAME = "insurance_price_premium_table.json"
+
+"""
+Model cache constants
+"""
+MODEL_CACHE_REVALIDATE_SECONDS = float(environ.get("MODEL_CACHE_REVALIDATE_SECONDS", 300))
+# Background HEAD polling of the model object, 0 disables the watcher
+MODEL_WATCH_INTERVAL_SECONDS = float(environ.get("MODEL_WATCH_INTERVAL_SECONDS", 60))
+# "pickle" serves the CostModel, "flat" the array backed FlatCostModel, "bundle" the same model from the model bundle,
+# "onnx" the exported graph with onnxruntime
+MODEL_SERVING_BACKEND = environ.get("MODEL_SERVING_BACKEND", "pickle").lower()
+# Flat models are written here as .npy files and memory mapped, so all workers share the same pages
+FLAT_MODEL_MMAP_DIR = environ.get("FLAT_MODEL_MMAP_DIR", os.path.join(tempfile.gettempdir(), "insurance_flat_model"))
+# Model bundles are unpacked here, one directory per bundle checksum
+MODEL_BUNDLE_LOCAL_DIR = environ.get("MODEL_BUNDLE_LOCAL_DIR", os.path.join(tempfile.gettempdir(), "insurance_model_bundle"))
+# Answering on grid requests from the premium table when the bucket has one for the served model
+SERVE_PREMIUM_TABLE = environ.get("SERVE_PREMIUM_TABLE", "true").lower() == "true"
+PREMIUM_TABLE_LOCAL_DIR = environ.get("PREMIUM_TABLE_LOCAL_DIR", os.path.join(tempfile.gettempdir(), "insurance_premium_table"))
+
+"""
+Batch prediction constants
+"""
+BATCH_PREDICTION_CHUNK_SIZE = int(environ.get("BATCH_PREDICTION_CHUNK_SIZE", 10000))
+BATCH_PREDICTION_MAX_ROWS = int(environ.get("BATCH_PREDICTION_MAX_ROWS", 1000000))
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+"""
+Micro batching constants
+"""
+MICRO_BATCH_ENABLED = environ.get("MICRO_BATCH_ENABLED", "true").lower() == "true"
+MICRO_BATCH_MAX_SIZE = int(environ.get("MICRO_BATCH_MAX_SIZE", 64))
+MICRO_BATCH_MAX_WAIT_MS = float(environ.get("MICRO_BATCH_MAX_WAIT_MS", 5))
+
+"""
+Inference executor constants
+"""
+INFERENCE_EXECUTOR_WORKERS = int(environ.get("INFERENCE_EXECUTOR_WORKERS", min(4, os.cpu_count() or 1)))
+INFERENCE_EXECUTOR_MAX_PENDING = int(environ.get("INFERENCE_EXECUTOR_MAX_PENDING", 256))
+INFERENCE_THREADS = int(environ.get("INFERENCE_THREADS", 1))
+LOOP_LAG_MONITOR_INTERVAL_MS = float(environ.get("LOOP_LAG_MONITOR_INTERVAL_MS", 100))
+LOOP_LAG_WARN_MS = float(environ.get("LOOP_LAG_WARN_MS", 100))
+
+"""
+Logging constants
+"""
+LOG_LEVEL = environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = environ.get("LOG_FORMAT", "json").lower()
+# Records are handed to a background writer thread instead of being written on the calling thread
+LOG_ASYNC = environ.get("LOG_ASYNC", "true").lower() == "true"
+LOG_QUEUE_SIZE = int(environ.get("LOG_QUEUE_SIZE", 10000))
+# "<module>[.<function>]=<share of records kept>", for the per request hot path
+LOG_SAMPLING = environ.get(
+    "LOG_SAMPLING",
+    "model_predictor=0.01,model_trainer.predict=0.01,prediction_batcher=0.01,tree_ensemble=0.01,compiled_model=0.01",
+)
+# "<module>[.<function>]=<records per second>"
+LOG_RATE_LIMITS = environ.get("LOG_RATE_LIMITS", "model_predictor=20,model_trainer.predict=20")
+
+"""
+Startup constants
+"""
+# Fetching and warming the model in the startup hook instead of on the first request
+PRELOAD_MODEL = environ.get("PRELOAD_MODEL", "true").lower() == "true"
+WARMUP_BATCH_SIZE = int(environ.get("WARMUP_BATCH_SIZE", 64))
+
+"""
+Bulk scoring constants
+"""
+BULK_SCORING_CHUNK_SIZE = int(environ.get("BULK_SCORING_CHUNK_SIZE", 100000))
+BULK_SCORING_WORKERS = int(environ.get("BULK_SCORING_WORKERS", os.cpu_count() or 1))
+# Chunks scored or queued ahead of the writer per worker, bounds the memory of a run
+BULK_SCORING_CHUNKS_IN_FLIGHT = int(environ.get("BULK_SCORING_CHUNKS_IN_FLIGHT", 2))
+BULK_SCORING_PREDICTION_COLUMN = environ.get("BULK_SCORING_PREDICTION_COLUMN", "prediction")
+# Scoring a MongoDB collection in place: documents read, scored and written back per batch
+MONGO_SCORING_BATCH_SIZE = int(environ.get("MONGO_SCORING_BATCH_SIZE", 10000))
+# _id ranges per worker, more ranges than workers keep every worker busy until the end
+MONGO_SCORING_RANGES_PER_WORKER = int(environ.get("MONGO_SCORING_RANGES_PER_WORKER", 4))
+MONGO_SCORING_PREDICTION_FIELD = environ.get("MONGO_SCORING_PREDICTION_FIELD", "predicted_expenses")
+# Collection holding the _id ranges and high-water marks of the scoring jobs
+MONGO_SCORING_JOBS_COLLECTION = environ.get("MONGO_SCORING_JOBS_COLLECTION", "scoring_jobs")
+
+"""
+Training job constants
+"""
+TRAINING_MAX_CONCURRENT_JOBS = int(environ.get("TRAINING_MAX_CONCURRENT_JOBS", 1))
+TRAINING_JOB_NICENESS = int(environ.get("TRAINING_JOB_NICENESS", 10))
 
 """
 app host port
@@ -65,6 +203,10 @@ app host port
 APP_HOST = "127.0.0.1"
 APP_PORT = 8080
 
+# More than one worker serves through the pre-fork server, the model is loaded once in the master
+SERVING_WORKERS = int(environ.get("SERVING_WORKERS", 1))
+MEMORY_REPORT_INTERVAL_SECONDS = float(environ.get("MEMORY_REPORT_INTERVAL_SECONDS", 60))
+
 
 
 
@@ -17,11 +17,20 @@ class DataTransformationArtifact:
     transformed_object_file_path: str
     transformed_train_file_path: str
     transformed_test_file_path: str
+    test_data_file_path: str = None
+    train_data_file_path: str = None
+    # Preprocessor, transformed train and transformed test file paths of every preprocessing profile
+    profile_file_paths: dict = None
 
 
 @dataclass
 class ModelTrainerArtifact:
     trained_model_file_path: str
+    flat_model_file_path: str = None
+    model_bundle_file_path: str = None
+    onnx_model_file_path: str = None
+    premium_table_file_path: str = None
+    premium_table_meta_file_path: str = None
 
 
 @dataclass
@@ -10,13 +10,13 @@ Data Ingestion Config
 """
 @dataclass
 class DataIngestionConfig:
-    def __init__(self):
+    def __init__(self, artifacts_dir: str = ARTIFACTS_DIR):
         self.UTILS = MainUtils()
         self.SCHEMA_CONFIG = self.UTILS.read_yaml_file(filename= SCHEMA_FILE_PATH)
         self.DB_NAME = DB_NAME
         self.COLLECTION_NAME = COLLECTION_NAME
         self.DATA_INGESTION_ARTIFACTS_DIR:str = os.path.join(from_root(), 
-                                                             ARTIFACTS_DIR, 
+                                                             artifacts_dir, 
                                                              DATA_INGESTION_ARTIFACTS_DIR)
         self.TRAIN_DATA_ARTIFACT_FILE_DIR:str = os.path.join(self.DATA_INGESTION_ARTIFACTS_DIR,
                                                              DATA_INGESTION_TRAIN_DIR)
@@ -33,14 +33,14 @@ Data Validation Config
 """
 @dataclass
 class DataValidationConfig:
-    def __init__(self):
+    def __init__(self, artifacts_dir: str = ARTIFACTS_DIR):
         self.UTILS = MainUtils()
         self.SCHEMA_CONFIG = self.UTILS.read_yaml_file(filename= SCHEMA_FILE_PATH)
         self.DATA_INGESTION_ARTIFACTS_DIR:str = os.path.join(from_root(),
-                                                             ARTIFACTS_DIR,
+                                                             artifacts_dir,
                                                              DATA_INGESTION_ARTIFACTS_DIR)
         self.DATA_VALIDATION_ARTIFACTS_DIR:str = os.path.join(from_root(),
-                                                              ARTIFACTS_DIR,
+                                                              artifacts_dir,
                                                               DATA_VALIDATION_ARTRIFACTS_DIR)
         self.DATA_DRIFT_FILE_PATH:str = os.path.join(self.DATA_VALIDATION_ARTIFACTS_DIR,
                                                      DATA_DRIFT_FILE_NAME)
@@ -51,12 +51,12 @@ Data Transformation Config
 """
 @dataclass
 class DataTransformationConfig:
-    def __init__(self):
+    def __init__(self, artifacts_dir: str = ARTIFACTS_DIR):
         self.UTILS = MainUtils()
         self.SCHEMA_CONFIG = self.UTILS.read_yaml_file(filename= SCHEMA_FILE_PATH)
-        self.DATA_INGESTION_ARTIFACTS_DIR: str = os.path.join(from_root(), ARTIFACTS_DIR,DATA_INGESTION_ARTIFACTS_DIR)
+        self.DATA_INGESTION_ARTIFACTS_DIR: str = os.path.join(from_root(), artifacts_dir,DATA_INGESTION_ARTIFACTS_DIR)
         self.DATA_TRANSFORMATION_ARTIFACTS_DIR: str = os.path.join(
-            from_root(), ARTIFACTS_DIR, DATA_TRANSFORMATION_ARTIFACTS_DIR
+            from_root(), artifacts_dir, DATA_TRANSFORMATION_ARTIFACTS_DIR
         )
         self.TRANSFORMED_TRAIN_DATA_DIR: str = os.path.join(
             self.DATA_TRANSFORMATION_ARTIFACTS_DIR, TRANSFORMED_TRAIN_DATA_DIR
@@ -72,7 +72,7 @@ class DataTransformationConfig:
         )
         self.PREPROCESSOR_FILE_PATH:str = os.path.join(
             from_root(),
-            ARTIFACTS_DIR,
+            artifacts_dir,
             DATA_TRANSFORMATION_ARTIFACTS_DIR,
             PREPROCESSOR_OBJECT_FILE_NAME
         )
@@ -83,17 +83,29 @@ Model Trainer Config
 """
 @dataclass
 class ModelTrainerConfig:
-    def __init__(self):
+    def __init__(self, artifacts_dir: str = ARTIFACTS_DIR):
         self.UTILS = MainUtils()
         self.SCHEMA_CONFIG = self.UTILS.read_yaml_file(filename= SCHEMA_FILE_PATH)
-        self.DATA_TRANSFORMATION_ARTIFACTS_DIR: str = os.path.join(from_root(), ARTIFACTS_DIR, 
+        self.DATA_TRANSFORMATION_ARTIFACTS_DIR: str = os.path.join(from_root(), artifacts_dir, 
                                                                    DATA_TRANSFORMATION_ARTIFACTS_DIR)
-        self.MODEL_TRAINER_ARTIFACTS_DIR: str = os.path.join(from_root(), ARTIFACTS_DIR, 
+        self.MODEL_TRAINER_ARTIFACTS_DIR: str = os.path.join(from_root(), artifacts_dir, 
                                                              MODEL_TRAINER_ARTIFACTS_DIR)
         self.PREPROCESSOR_OBJECT_FILE_PATH: str = os.path.join(self.DATA_TRANSFORMATION_ARTIFACTS_DIR, 
                                                                PREPROCESSOR_OBJECT_FILE_NAME)
-        self.TRAINED_MODEL_FILE_PATH: str = os.path.join(from_root(), ARTIFACTS_DIR, MODEL_TRAINER_ARTIFACTS_DIR, 
+        self.TRAINED_MODEL_FILE_PATH: str = os.path.join(from_root(), artifacts_dir, MODEL_TRAINER_ARTIFACTS_DIR, 
                                                          MODEL_FILE_NAME)
+        self.FLAT_MODEL_FILE_PATH: str = os.path.join(from_root(), artifacts_dir, MODEL_TRAINER_ARTIFACTS_DIR, 
+                                                      FLAT_MODEL_FILE_NAME)
+        self.MODEL_BUNDLE_FILE_PATH: str = os.path.join(from_root(), artifacts_dir, MODEL_TRAINER_ARTIFACTS_DIR, 
+                                                        MODEL_BUNDLE_FILE_NAME)
+        self.ONNX_MODEL_FILE_PATH: str = os.path.join(from_root(), artifacts_dir, MODEL_TRAINER_ARTIFACTS_DIR, 
+                                                      ONNX_MODEL_FILE_NAME)
+        self.PREMIUM_TABLE_FILE_PATH: str = os.path.join(from_root(), artifacts_dir, MODEL_TRAINER_ARTIFACTS_DIR, 
+                                                         PREMIUM_TABLE_FILE_NAME)
+        self.PREMIUM_TABLE_META_FILE_PATH: str = os.path.join(from_root(), artifacts_dir, MODEL_TRAINER_ARTIFACTS_DIR, 
+                                                              PREMIUM_TABLE_META_FILE_NAME)
+        self.TUNING_CHECKPOINT_FILE_PATH: str = os.path.join(from_root(), artifacts_dir, MODEL_TRAINER_ARTIFACTS_DIR, 
+                                                             TUNING_CHECKPOINT_FILE_NAME)
         
 
 """
@@ -101,12 +113,12 @@ Model Evaluation Config
 """
 @dataclass
 class ModelEvaluationConfig:
-    def __init__(self):
+    def __init__(self, artifacts_dir: str = ARTIFACTS_DIR):
         self.S3_OPERATIONS = S3Operation()
         self.UTILS = MainUtils()
         self.BUCKET_NAME = BUCKET_NAME
         self.BEST_MODEL_PATH: str = os.path.join(
-            from_root(),ARTIFACTS_DIR,MODEL_TRAINER_ARTIFACTS_DIR,MODEL_FILE_NAME
+            from_root(),artifacts_dir,MODEL_TRAINER_ARTIFACTS_DIR,MODEL_FILE_NAME
         )
 
 
@@ -116,13 +128,18 @@ Model Pusher Config
 
 @dataclass
 class ModelPusherConfig:
-    def __init__(self):
+    def __init__(self, artifacts_dir: str = ARTIFACTS_DIR):
         self.BEST_MODEL_PATH: str = os.path.join(
-            from_root(), ARTIFACTS_DIR, MODEL_TRAINER_ARTIFACTS_DIR, MODEL_FILE_NAME
+            from_root(), artifacts_dir, MODEL_TRAINER_ARTIFACTS_DIR, MODEL_FILE_NAME
         )
 
         self.BUCKET_NAME: str = BUCKET_NAME
         self.S3_MODEL_KEY_PATH: str = os.path.join(S3_MODEL_NAME)
+        self.S3_FLAT_MODEL_KEY_PATH: str = os.path.join(S3_FLAT_MODEL_NAME)
+        self.S3_MODEL_BUNDLE_KEY_PATH: str = os.path.join(S3_MODEL_BUNDLE_NAME)
+        self.S3_ONNX_MODEL_KEY_PATH: str = os.path.join(S3_ONNX_MODEL_NAME)
+        self.S3_PREMIUM_TABLE_KEY_PATH: str = os.path.join(S3_PREMIUM_TABLE_NAME)
+        self.S3_PREMIUM_TABLE_META_KEY_PATH: str = os.path.join(S3_PREMIUM_TABLE_META_NAME)
         
 
 
@@ -1,6 +1,17 @@
-import logging 
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
 import os
+import queue
+import random
+import threading
+import time
 from datetime import datetime
+from typing import Dict, Optional, Tuple
+from insurancePrice.constants import (LOG_ASYNC, LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE, LOG_RATE_LIMITS,
+                                      LOG_SAMPLING)
 
 LOG_FILE=f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 
@@ -10,8 +21,203 @@ os.makedirs(logs_path,exist_ok=True)
 
 LOG_FILE_PATH=os.path.join(logs_path,LOG_FILE)
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO
-)
+TEXT_FORMAT = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s"
+
+# Set per request by the app middleware, copied into every record logged while handling it
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+
+
+def parse_log_rules(spec: str) -> Dict[str, float]:
+    """
+    Parses "model_predictor=0.01,model_trainer.predict=0.01" into {key: value}.
+    """
+    rules = {}
+    for item in spec.split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            rules[key.strip()] = float(value)
+    return rules
+
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a share of the records of the matching module (or module.function)
+    and at most a number of them per second. Warnings and errors always pass.
+
+    The project logs through the root logger, so rules are keyed by the
+    module and function that logged the record rather than the logger name.
+    """
+    def __init__(self, sample_rates: Dict[str, float], rate_limits: Dict[str, float]):
+        super().__init__()
+        self.sample_rates = sample_rates
+        self.rate_limits = rate_limits
+        self.dropped: Dict[str, int] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _match(rules: Dict[str, float], record: logging.LogRecord) -> Tuple[Optional[str], Optional[float]]:
+        for key in (f"{record.module}.{record.funcName}", record.module):
+            if key in rules:
+                return key, rules[key]
+        return None, None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key, rate = self._match(self.sample_rates, record)
+        if key is not None and random.random() >= rate:
+            self._drop(key)
+            return False
+
+        key, per_second = self._match(self.rate_limits, record)
+        if key is not None and not self._take_token(key, per_second):
+            self._drop(key)
+            return False
+        return True
+
+    def _take_token(self, key: str, per_second: float) -> bool:
+        # Token bucket holding up to one second worth of records
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.get(key, (per_second, now))
+            tokens = min(per_second, tokens + (now - updated) * per_second)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return False
+            self._buckets[key] = (tokens - 1, now)
+            return True
+
+    def _drop(self, key: str) -> None:
+        self.dropped[key] = self.dropped.get(key, 0) + 1
+
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        log_record = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            log_record["exception"] = self.formatException(record.exc_info)
+        return json.dumps(log_record, default=str)
+
+
+
+class LoggingPipeline:
+    """
+    Root logger setup: records are filtered (request id, sampling) on the
+    calling thread and, in async mode, handed to a QueueListener thread that
+    does the formatting and the file write. A full queue drops records instead
+    of blocking the caller.
+    """
+    def __init__(self):
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.queue_handler: Optional[logging.handlers.QueueHandler] = None
+        self.file_handler: Optional[logging.Handler] = None
+        self.sampling_filter: Optional[SamplingFilter] = None
+        self.queue_size = LOG_QUEUE_SIZE
+
+    def configure(self,
+                  log_file_path: str = LOG_FILE_PATH,
+                  level: str = LOG_LEVEL,
+                  log_format: str = LOG_FORMAT,
+                  use_queue: bool = LOG_ASYNC,
+                  sample_rates: Optional[Dict[str, float]] = None,
+                  rate_limits: Optional[Dict[str, float]] = None,
+                  queue_size: int = LOG_QUEUE_SIZE) -> None:
+        self.stop()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+            handler.close()
+        root.setLevel(level)
+
+        self.file_handler = logging.FileHandler(log_file_path)
+        self.file_handler.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+        self.sampling_filter = SamplingFilter(
+            parse_log_rules(LOG_SAMPLING) if sample_rates is None else sample_rates,
+            parse_log_rules(LOG_RATE_LIMITS) if rate_limits is None else rate_limits,
+        )
+        self.queue_size = queue_size
+
+        if use_queue:
+            self.queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+            handler = self.queue_handler
+            self.start()
+        else:
+            self.queue_handler = None
+            handler = self.file_handler
+
+        handler.addFilter(RequestIdFilter())
+        handler.addFilter(self.sampling_filter)
+        root.addHandler(handler)
+
+    def start(self) -> None:
+        self.listener = logging.handlers.QueueListener(
+            self.queue_handler.queue, self.file_handler, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def stop(self) -> None:
+        # Drains the queue before the writer thread exits
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def after_fork_in_child(self) -> None:
+        # The writer thread does not survive a fork and the queue lock may have been held by it
+        if self.queue_handler is not None:
+            self.listener = None
+            self.queue_handler.queue = queue.Queue(maxsize=self.queue_size)
+            self.start()
+
+    def stats(self) -> Dict:
+        return {
+            "queued": self.queue_handler.queue.qsize() if self.queue_handler is not None else 0,
+            "dropped_queue_full": self.queue_handler.dropped if self.queue_handler is not None else 0,
+            "dropped_sampled": dict(self.sampling_filter.dropped) if self.sampling_filter is not None else {},
+        }
+
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+
+logging_pipeline = LoggingPipeline()
+logging_pipeline.configure()
+atexit.register(logging_pipeline.stop)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=logging_pipeline.after_fork_in_child)
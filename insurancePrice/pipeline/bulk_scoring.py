@@ -0,0 +1,378 @@
+"""
+Offline bulk scoring of a CSV or Parquet file of policies.
+
+    python -m insurancePrice.pipeline.bulk_scoring --input policies.csv --output priced.csv \
+        --model-path artifacts/<run>/ModelTrainerArtifacts/insurance_price_model.pkl
+
+The input is read in chunks and scored in a process pool, the output keeps
+every input column in the input order plus the prediction column (empty for
+rows failing the schema checks). Progress is checkpointed after every chunk
+written; running the same command again resumes after the last one.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, Optional
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from insurancePrice.components.model_cache import ModelCache
+from insurancePrice.components.model_predictor import CostPredictor, insuranceBatchData, insuranceRequestDecoder
+from insurancePrice.configuration.s3_operations import S3Operation
+from insurancePrice.constants import *
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+from insurancePrice.utils.serving_utils import configure_inference_threads, limit_inference_threads
+
+
+
+# Loaded once per pool worker by init_scoring_worker
+_worker_model = None
+_worker_decoder: Optional[insuranceRequestDecoder] = None
+
+
+def init_scoring_worker(model_file_path: str, backend: str) -> None:
+    global _worker_model, _worker_decoder
+
+    # Every worker scores one chunk at a time on a single core
+    limit_inference_threads(1)
+    with open(model_file_path, "rb") as file_obj:
+        model = ModelCache(backend=backend).deserializer(file_obj.read())
+    if hasattr(model, "compile") and not model.is_compiled:
+        compile_scoring_model(model)
+    _worker_model = configure_inference_threads(model, 1)
+    _worker_decoder = insuranceRequestDecoder()
+
+
+def compile_scoring_model(model: object, n_rows: int = WARMUP_BATCH_SIZE) -> object:
+    """
+    Compiles an uncompiled pickle and verifies it on synthetic rows of the schema domain, like the trainer does before
+    saving it. A preprocessor that cannot be compiled, or whose predictions differ, is scored with the sklearn path.
+    """
+    try:
+        model.compile()
+        model.verify_compiled(insuranceBatchData(records=[]).get_synthetic_data_frame(n_rows))
+    except Exception as e:
+        model.compiled_preprocessor = None
+        logging.info(f"Could not compile cost model: {e}")
+    if not model.is_compiled:
+        logging.info("Scoring with the uncompiled cost model")
+    return model
+
+
+def download_served_model(backend: str, model_file_path: str) -> str:
+    """
+    Downloads the model the serving backend loads from the s3 bucket, to score with the same model offline.
+    """
+    model_key = ModelCache(backend=backend).model_key
+    S3Operation().download_file(model_key, BUCKET_NAME, model_file_path)
+    logging.info(f"Downloaded {model_key} from s3 bucket to {model_file_path}")
+    return model_file_path
+
+
+def score_chunk(X: DataFrame) -> np.ndarray:
+    """
+    Predictions of a chunk in the worker, nan for the rows failing the schema checks.
+    """
+    batch, valid = _worker_decoder.encode_data_frame(X)
+    predictions = np.full(len(X), np.nan)
+    if valid.any():
+        predictions[valid] = CostPredictor.predict_encoded_with_model(
+            _worker_model, batch.take(valid) if not valid.all() else batch, BATCH_PREDICTION_CHUNK_SIZE
+        )
+    return predictions.round(2)
+
+
+
+class BulkScorer:
+    """
+    Scores a CSV or Parquet file chunk by chunk in a pool of worker processes,
+    each loading the model once.
+
+    Chunks are submitted in input order with at most BULK_SCORING_CHUNKS_IN_FLIGHT
+    per worker ahead of the writer, and written in that order as they complete.
+    CSV output is one file appended to, Parquet output a directory of one part
+    file per chunk. The checkpoint next to the output records the chunks
+    written (and the CSV size at that point), a rerun truncates anything
+    written after it and skips those chunks of the input.
+    """
+    def __init__(self,
+                 input_path: str,
+                 output_path: str,
+                 model_path: Optional[str] = None,
+                 backend: str = MODEL_SERVING_BACKEND,
+                 chunk_size: int = BULK_SCORING_CHUNK_SIZE,
+                 workers: int = BULK_SCORING_WORKERS,
+                 prediction_column: str = BULK_SCORING_PREDICTION_COLUMN,
+                 restart: bool = False):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.model_path = model_path
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.prediction_column = prediction_column
+        self.restart = restart
+        self.checkpoint_path = output_path.rstrip("/") + ".checkpoint.json"
+        self.input_format = self.get_format(input_path)
+        self.output_format = self.get_format(output_path)
+
+    @staticmethod
+    def get_format(file_path: str) -> str:
+        return "parquet" if file_path.rstrip("/").endswith((".parquet", ".pq")) else "csv"
+
+    @staticmethod
+    def get_checksum(file_path: str) -> str:
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(1 << 20), b""):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def get_model_file(self) -> str:
+
+        """
+        Method Name :   get_model_file
+
+        Description :   This method returns the local model file, downloading the served model of the backend from the s3 bucket when no path was given.
+
+        Output      :   Model file path
+        """
+        if self.model_path is not None:
+            return self.model_path
+
+        # Kept next to the checkpoint, a resumed run scores with the same model
+        model_file_path = self.output_path.rstrip("/") + f".{self.backend}.model"
+        if not os.path.exists(model_file_path):
+            download_served_model(self.backend, model_file_path)
+        return model_file_path
+
+    def load_checkpoint(self, run: Dict) -> Dict:
+
+        """
+        Method Name :   load_checkpoint
+
+        Description :   This method loads the checkpoint of a previous run of the same input, model and chunk size.
+
+        Output      :   Checkpoint, a new one when there is nothing to resume
+        """
+        checkpoint = {**run, "chunks_done": 0, "rows_done": 0, "invalid_rows": 0, "output_bytes": 0, "completed": False}
+        if self.restart or not os.path.exists(self.checkpoint_path):
+            return checkpoint
+
+        with open(self.checkpoint_path) as file_obj:
+            previous = json.load(file_obj)
+        changed = [key for key, value in run.items() if previous.get(key) != value]
+        if changed:
+            raise ValueError(
+                f"Checkpoint {self.checkpoint_path} was written for a different {changed}, pass --restart to score from scratch"
+            )
+        return previous
+
+    def save_checkpoint(self, checkpoint: Dict) -> None:
+        # Replaced atomically, a crash leaves the previous checkpoint
+        temp_path = self.checkpoint_path + ".tmp"
+        with open(temp_path, "w") as file_obj:
+            json.dump(checkpoint, file_obj)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def read_chunks(self, skip_chunks: int) -> Iterator[DataFrame]:
+
+        """
+        Method Name :   read_chunks
+
+        Description :   This method streams the input in chunks of chunk_size rows, after the skip_chunks already written.
+
+        Output      :   Iterator of dataframes
+        """
+        if self.input_format == "csv":
+            # Skipped lines are not parsed, the header is kept
+            skip_rows = range(1, 1 + skip_chunks * self.chunk_size) if skip_chunks else None
+            yield from pd.read_csv(self.input_path, chunksize=self.chunk_size, skiprows=skip_rows)
+            return
+
+        import pyarrow.parquet as pq
+
+        for index, record_batch in enumerate(pq.ParquetFile(self.input_path).iter_batches(batch_size=self.chunk_size)):
+            if index >= skip_chunks:
+                yield record_batch.to_pandas()
+
+    def prepare_output(self, checkpoint: Dict) -> None:
+        # Dropping whatever was written after the last checkpoint
+        if self.output_format == "csv":
+            if os.path.exists(self.output_path):
+                with open(self.output_path, "r+b") as file_obj:
+                    file_obj.truncate(checkpoint["output_bytes"])
+            return
+
+        os.makedirs(self.output_path, exist_ok=True)
+        for file_name in os.listdir(self.output_path):
+            if not file_name.startswith("part-") or int(file_name[5:10]) >= checkpoint["chunks_done"]:
+                os.remove(os.path.join(self.output_path, file_name))
+
+    def write_chunk(self, chunk: DataFrame, index: int) -> int:
+
+        """
+        Method Name :   write_chunk
+
+        Description :   This method appends a scored chunk to the CSV output or writes it as the next Parquet part file.
+
+        Output      :   Size of the CSV output after the chunk
+        """
+        if self.output_format == "csv":
+            with open(self.output_path, "ab") as file_obj:
+                chunk.to_csv(file_obj, header=file_obj.tell() == 0, index=False)
+                file_obj.flush()
+                os.fsync(file_obj.fileno())
+                return file_obj.tell()
+
+        part_path = os.path.join(self.output_path, f"part-{index:05d}.parquet")
+        chunk.to_parquet(part_path + ".tmp", index=False)
+        os.replace(part_path + ".tmp", part_path)
+        return 0
+
+    def run(self, progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+
+        """
+        Method Name :   run
+
+        Description :   This method scores the input in a process pool and writes the output in input order, resuming from the checkpoint.
+
+        Output      :   Report of the run
+        """
+        logging.info("Entered the run method of BulkScorer class")
+        try:
+            model_file_path = self.get_model_file()
+            run = {
+                "input_path": os.path.abspath(self.input_path),
+                "input_bytes": os.path.getsize(self.input_path),
+                "model_sha256": self.get_checksum(model_file_path),
+                "backend": self.backend,
+                "chunk_size": self.chunk_size,
+                "prediction_column": self.prediction_column,
+            }
+            checkpoint = self.load_checkpoint(run)
+            report = {
+                "input": self.input_path,
+                "output": self.output_path,
+                "workers": self.workers,
+                "resumed_chunks": checkpoint["chunks_done"],
+                "resumed_rows": checkpoint["rows_done"],
+            }
+            if checkpoint["completed"]:
+                logging.info(f"{self.output_path} is already complete")
+                return {**report, "rows": checkpoint["rows_done"], "invalid_rows": checkpoint["invalid_rows"],
+                        "chunks": checkpoint["chunks_done"], "seconds": 0.0, "rows_per_second": 0.0}
+
+            self.prepare_output(checkpoint)
+            decoder = insuranceRequestDecoder()
+            feature_columns = [*decoder.numerical_columns, *decoder.categories]
+            started = time.perf_counter()
+            rows_scored = 0
+
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                # Workers load their own model, nothing of this process is forked
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_scoring_worker,
+                initargs=(model_file_path, self.backend),
+            ) as executor:
+                pending = deque()
+                chunks = self.read_chunks(checkpoint["chunks_done"])
+                max_pending = self.workers * BULK_SCORING_CHUNKS_IN_FLIGHT
+
+                while True:
+                    # Keeping the workers busy while the oldest chunk is written
+                    for chunk in chunks:
+                        missing = [column for column in feature_columns if column not in chunk.columns]
+                        if missing:
+                            raise ValueError(f"Missing columns in {self.input_path}: {missing}")
+                        # Only the features go to the workers, the other columns wait here to be written
+                        pending.append((chunk, executor.submit(score_chunk, chunk[feature_columns])))
+                        if len(pending) >= max_pending:
+                            break
+                    if not pending:
+                        break
+
+                    chunk, future = pending.popleft()
+                    predictions = future.result()
+                    chunk[self.prediction_column] = predictions
+                    output_bytes = self.write_chunk(chunk, checkpoint["chunks_done"])
+
+                    rows_scored += len(chunk)
+                    checkpoint.update(
+                        chunks_done=checkpoint["chunks_done"] + 1,
+                        rows_done=checkpoint["rows_done"] + len(chunk),
+                        invalid_rows=checkpoint["invalid_rows"] + int(np.isnan(predictions).sum()),
+                        output_bytes=output_bytes,
+                    )
+                    self.save_checkpoint(checkpoint)
+
+                    seconds = time.perf_counter() - started
+                    progress = {
+                        "chunks": checkpoint["chunks_done"],
+                        "rows": checkpoint["rows_done"],
+                        "rows_per_second": rows_scored / seconds if seconds else 0.0,
+                    }
+                    logging.info(f"Scored {progress['rows']} rows at {progress['rows_per_second']:.0f} rows/s")
+                    if progress_callback is not None:
+                        progress_callback(progress)
+
+            checkpoint["completed"] = True
+            self.save_checkpoint(checkpoint)
+            seconds = time.perf_counter() - started
+
+            logging.info("Exited the run method of BulkScorer class")
+            return {
+                **report,
+                "rows": checkpoint["rows_done"],
+                "invalid_rows": checkpoint["invalid_rows"],
+                "chunks": checkpoint["chunks_done"],
+                "seconds": seconds,
+                "rows_per_second": rows_scored / seconds if seconds else 0.0,
+            }
+
+        except ValueError:
+            raise
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", required=True, help="CSV or .parquet file of policies")
+    parser.add_argument("--output", required=True, help="CSV file, or .parquet directory of part files")
+    parser.add_argument("--model-path", help="Local model file, the served model is downloaded from s3 when omitted")
+    parser.add_argument("--backend", default=MODEL_SERVING_BACKEND, choices=["pickle", "flat", "bundle", "onnx"])
+    parser.add_argument("--chunk-size", type=int, default=BULK_SCORING_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=BULK_SCORING_WORKERS)
+    parser.add_argument("--prediction-column", default=BULK_SCORING_PREDICTION_COLUMN)
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and score from scratch")
+    args = parser.parse_args()
+
+    def print_progress(progress: Dict) -> None:
+        print(f"{progress['rows']} rows in {progress['chunks']} chunks, {progress['rows_per_second']:.0f} rows/s",
+              file=sys.stderr, flush=True)
+
+    bulk_scorer = BulkScorer(
+        input_path=args.input,
+        output_path=args.output,
+        model_path=args.model_path,
+        backend=args.backend,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        prediction_column=args.prediction_column,
+        restart=args.restart,
+    )
+    print(json.dumps(bulk_scorer.run(progress_callback=print_progress), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+In place scoring of the policies stored in a MongoDB collection.
+
+    python -m insurancePrice.pipeline.collection_scoring --collection insurance_data \
+        --model-path artifacts/<run>/ModelTrainerArtifacts/insurance_price_model.pkl
+
+Every document gets the predicted premium in the prediction field (null when
+it fails the schema checks) and the checksum of the model that priced it in
+the <prediction field>_model field. Running the same command again resumes
+the job from the high-water marks stored in the jobs collection.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+from insurancePrice.components.model_predictor import insuranceRequestDecoder
+from insurancePrice.configuration.mongo_operations import MongoDBOperation
+from insurancePrice.constants import *
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+from insurancePrice.pipeline.bulk_scoring import BulkScorer, download_served_model, init_scoring_worker, score_chunk
+
+
+
+# Opened once per pool worker by init_collection_worker
+_worker_database = None
+_worker_feature_columns: List[str] = []
+
+
+def init_collection_worker(model_file_path: str, backend: str, db_name: str) -> None:
+    global _worker_database, _worker_feature_columns
+
+    init_scoring_worker(model_file_path, backend)
+    # pymongo clients are not fork safe, every worker process opens its own
+    _worker_database = MongoDBOperation().get_database(db_name)
+    decoder = insuranceRequestDecoder()
+    _worker_feature_columns = [*decoder.numerical_columns, *decoder.categories]
+
+
+def score_id_range(job: Dict, range_index: int, lower: object, upper: object) -> Dict:
+
+    """
+    Method Name :   score_id_range
+
+    Description :   This method scores the documents of one _id range in batches after its high-water mark, writing the premiums back with unordered bulk writes.
+
+    Output      :   Rows of the range scored in total and in this run
+    """
+    collection = _worker_database[job["collection"]]
+    jobs = _worker_database[MONGO_SCORING_JOBS_COLLECTION]
+    state_id = f"{job['_id']}:{range_index}"
+    state = jobs.find_one({"_id": state_id}) or {"rows": 0, "invalid_rows": 0, "completed": False}
+    stats = {"range": range_index, "rows": state["rows"], "invalid_rows": state["invalid_rows"], "scored_rows": 0}
+    if state["completed"]:
+        return stats
+
+    # Strictly after the high-water mark: that document was written back before the mark was stored
+    id_filter = {}
+    if state.get("high_water_mark") is not None:
+        id_filter["$gt"] = state["high_water_mark"]
+    elif lower is not None:
+        id_filter["$gte"] = lower
+    if upper is not None:
+        id_filter["$lt"] = upper
+    query = json.loads(job["query"])
+    if id_filter:
+        query = {"$and": [query, {"_id": id_filter}]} if query else {"_id": id_filter}
+
+    prediction_field, model_field = job["prediction_field"], job["prediction_field"] + "_model"
+    projection = {column: 1 for column in _worker_feature_columns}
+    for documents in MongoDBOperation.iter_batches(collection, query, projection, job["batch_size"]):
+        X = pd.DataFrame.from_records(documents, columns=["_id", *_worker_feature_columns])
+        predictions = score_chunk(X[_worker_feature_columns])
+
+        collection.bulk_write([
+            UpdateOne({"_id": document_id}, {"$set": {
+                prediction_field: None if np.isnan(prediction) else float(prediction),
+                model_field: job["model_sha256"],
+            }})
+            for document_id, prediction in zip(X["_id"], predictions)
+        ], ordered=False)
+
+        stats["rows"] += len(documents)
+        stats["scored_rows"] += len(documents)
+        stats["invalid_rows"] += int(np.isnan(predictions).sum())
+        jobs.update_one(
+            {"_id": state_id},
+            {"$set": {"job_id": job["_id"], "high_water_mark": documents[-1]["_id"], "rows": stats["rows"],
+                      "invalid_rows": stats["invalid_rows"], "completed": False}},
+            upsert=True,
+        )
+
+    jobs.update_one(
+        {"_id": state_id},
+        {"$set": {"job_id": job["_id"], "rows": stats["rows"], "invalid_rows": stats["invalid_rows"], "completed": True}},
+        upsert=True,
+    )
+    logging.info(f"Scored {stats['scored_rows']} documents of range {range_index} of scoring job {job['_id']}")
+    return stats
+
+
+
+class CollectionScorer:
+    """
+    Scores a MongoDB collection in place with a pool of worker processes, one
+    _id range at a time per worker.
+
+    The _id boundaries are computed once per job and stored in the jobs
+    collection together with the model checksum and the query. Every range
+    keeps its own high-water mark (the last _id written back), so a rerun of
+    the job only reads the documents after it. The job id defaults to the
+    collection name and the model checksum: a new model starts a new job.
+    """
+    def __init__(self,
+                 db_name: str = DB_NAME,
+                 collection_name: str = COLLECTION_NAME,
+                 model_path: Optional[str] = None,
+                 backend: str = MODEL_SERVING_BACKEND,
+                 query: Optional[Dict] = None,
+                 job_id: Optional[str] = None,
+                 batch_size: int = MONGO_SCORING_BATCH_SIZE,
+                 workers: int = BULK_SCORING_WORKERS,
+                 prediction_field: str = MONGO_SCORING_PREDICTION_FIELD,
+                 restart: bool = False):
+        self.db_name = db_name
+        self.collection_name = collection_name
+        self.model_path = model_path
+        self.backend = backend
+        self.query = query or {}
+        self.job_id = job_id
+        self.batch_size = batch_size
+        self.workers = workers
+        self.prediction_field = prediction_field
+        self.restart = restart
+
+    def get_job(self, database, model_sha256: str) -> Dict:
+
+        """
+        Method Name :   get_job
+
+        Description :   This method loads the job to resume, or splits the collection into _id ranges for a new one.
+
+        Output      :   Scoring job
+        """
+        jobs = database[MONGO_SCORING_JOBS_COLLECTION]
+        job_id = self.job_id or f"{self.collection_name}-{model_sha256[:12]}"
+        job = jobs.find_one({"_id": job_id})
+
+        if job is not None and not self.restart:
+            if job["model_sha256"] != model_sha256 or json.loads(job["query"]) != self.query:
+                raise ValueError(f"Scoring job {job_id} was started with another model or query, pass --restart")
+            logging.info(f"Resuming scoring job {job_id}")
+            return job
+
+        jobs.delete_many({"job_id": job_id})
+        collection = database[self.collection_name]
+        job = {
+            "_id": job_id,
+            "collection": self.collection_name,
+            "model_sha256": model_sha256,
+            # Stored as JSON, query operators are not valid field names
+            "query": json.dumps(self.query),
+            "prediction_field": self.prediction_field,
+            "batch_size": self.batch_size,
+            "boundaries": MongoDBOperation.get_id_boundaries(
+                collection, max(1, self.workers) * MONGO_SCORING_RANGES_PER_WORKER, self.query
+            ),
+            "created_at": time.time(),
+        }
+        jobs.replace_one({"_id": job_id}, job, upsert=True)
+        logging.info(f"Started scoring job {job_id} with {len(job['boundaries']) + 1} _id ranges")
+        return job
+
+    def run(self, progress_callback: Optional[Callable[[Dict], None]] = None) -> Dict:
+
+        """
+        Method Name :   run
+
+        Description :   This method scores the ranges of the job not completed yet in the process pool, or in this process with a single worker.
+
+        Output      :   Report of the run
+        """
+        logging.info("Entered the run method of CollectionScorer class")
+        try:
+            with tempfile.TemporaryDirectory() as model_dir:
+                model_file_path = self.model_path or download_served_model(
+                    self.backend, os.path.join(model_dir, f"model.{self.backend}")
+                )
+                model_sha256 = BulkScorer.get_checksum(model_file_path)
+                database = MongoDBOperation().get_database(self.db_name)
+                job = self.get_job(database, model_sha256)
+
+                boundaries = job["boundaries"]
+                ranges = list(enumerate(zip([None, *boundaries], [*boundaries, None])))
+                initargs = (model_file_path, self.backend, self.db_name)
+                started = time.perf_counter()
+                results = []
+
+                def collect(stats: Dict) -> None:
+                    results.append(stats)
+                    progress = {
+                        "ranges_done": len(results),
+                        "ranges": len(ranges),
+                        "rows": sum(result["rows"] for result in results),
+                        "scored_rows": sum(result["scored_rows"] for result in results),
+                    }
+                    logging.info(f"Scoring job {job['_id']}: {progress['ranges_done']} of {len(ranges)} ranges done")
+                    if progress_callback is not None:
+                        progress_callback(progress)
+
+                if self.workers <= 1:
+                    init_collection_worker(*initargs)
+                    for range_index, (lower, upper) in ranges:
+                        collect(score_id_range(job, range_index, lower, upper))
+                else:
+                    with ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                        initializer=init_collection_worker,
+                        initargs=initargs,
+                    ) as executor:
+                        futures = [
+                            executor.submit(score_id_range, job, range_index, lower, upper)
+                            for range_index, (lower, upper) in ranges
+                        ]
+                        for future in as_completed(futures):
+                            collect(future.result())
+
+            seconds = time.perf_counter() - started
+            scored_rows = sum(result["scored_rows"] for result in results)
+            database[MONGO_SCORING_JOBS_COLLECTION].update_one({"_id": job["_id"]}, {"$set": {"completed_at": time.time()}})
+
+            logging.info("Exited the run method of CollectionScorer class")
+            return {
+                "job_id": job["_id"],
+                "collection": self.collection_name,
+                "workers": self.workers,
+                "ranges": len(ranges),
+                "rows": sum(result["rows"] for result in results),
+                "invalid_rows": sum(result["invalid_rows"] for result in results),
+                "scored_rows": scored_rows,
+                "seconds": seconds,
+                "rows_per_second": scored_rows / seconds if seconds else 0.0,
+            }
+
+        except ValueError:
+            raise
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-name", default=DB_NAME)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--model-path", help="Local model file, the served model is downloaded from s3 when omitted")
+    parser.add_argument("--backend", default=MODEL_SERVING_BACKEND, choices=["pickle", "flat", "bundle", "onnx"])
+    parser.add_argument("--query", default="{}", help="JSON filter of the documents to score")
+    parser.add_argument("--job-id", help="Defaults to the collection name and the model checksum")
+    parser.add_argument("--batch-size", type=int, default=MONGO_SCORING_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=BULK_SCORING_WORKERS)
+    parser.add_argument("--prediction-field", default=MONGO_SCORING_PREDICTION_FIELD)
+    parser.add_argument("--restart", action="store_true", help="Drop the high-water marks and score from scratch")
+    args = parser.parse_args()
+
+    def print_progress(progress: Dict) -> None:
+        print(f"{progress['ranges_done']}/{progress['ranges']} ranges, {progress['scored_rows']} documents scored",
+              file=sys.stderr, flush=True)
+
+    collection_scorer = CollectionScorer(
+        db_name=args.db_name,
+        collection_name=args.collection,
+        model_path=args.model_path,
+        backend=args.backend,
+        query=json.loads(args.query),
+        job_id=args.job_id,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        prediction_field=args.prediction_field,
+        restart=args.restart,
+    )
+    print(json.dumps(collection_scorer.run(progress_callback=print_progress), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from from_root import from_root
+from insurancePrice.constants import *
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging
+
+
+
+@dataclass
+class TrainingJob:
+    job_id: str
+    artifacts_dir: str
+    status: str = "queued"
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    stages: Dict[str, Dict] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+
+def run_training_job(job_id: str, artifacts_dir: str, events: multiprocessing.Queue) -> None:
+    """
+    Runs the training pipeline. Stage progress and the final status are sent
+    back to the serving process through the events queue.
+    """
+    def progress_callback(stage: str, status: str) -> None:
+        events.put((job_id, "stage", stage, status, time.time()))
+
+    events.put((job_id, "status", "running", None, time.time()))
+    try:
+        from insurancePrice.pipeline.training_pipeline import TrainPipeline
+
+        train_pipeline = TrainPipeline(artifacts_dir=artifacts_dir)
+        train_pipeline.run_pipeline(progress_callback=progress_callback)
+        events.put((job_id, "status", "succeeded", None, time.time()))
+
+    except Exception as e:
+        events.put((job_id, "status", "failed", str(e), time.time()))
+
+
+
+def run_job_process(job_target: Callable[[str, str, multiprocessing.Queue], None],
+                    job_id: str,
+                    artifacts_dir: str,
+                    events: multiprocessing.Queue) -> None:
+    """
+    Entry point of the training worker process.
+    """
+    # Own process group, so a cancel also reaches the tuning pool workers this job spawns
+    if hasattr(os, "setsid"):
+        os.setsid()
+
+    # Training should never compete with the serving process for the CPU on equal terms
+    if hasattr(os, "nice"):
+        os.nice(TRAINING_JOB_NICENESS)
+
+    job_target(job_id, artifacts_dir, events)
+
+
+
+class TrainingJobRunner:
+    """
+    Runs the training pipeline in separate worker processes so a training run
+    never blocks or slows down the serving event loop. Every job writes into
+    its own artifacts directory.
+    """
+    def __init__(self,
+                 max_concurrent_jobs: int = TRAINING_MAX_CONCURRENT_JOBS,
+                 job_target: Callable[[str, str, multiprocessing.Queue], None] = run_training_job):
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.job_target = job_target
+        # spawn: the serving process has live threads and an event loop that must not be forked
+        self._ctx = multiprocessing.get_context("spawn")
+        self._events = None
+        self._jobs: Dict[str, TrainingJob] = {}
+        self._processes: Dict[str, multiprocessing.Process] = {}
+        self._lock = threading.Lock()
+        self._monitor: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def _start_monitor(self) -> None:
+        if self._monitor is None:
+            self._events = self._ctx.Queue()
+            self._monitor = threading.Thread(target=self._watch, name="training-job-monitor", daemon=True)
+            self._monitor.start()
+
+    def submit(self) -> TrainingJob:
+
+        """
+        Method Name :   submit
+
+        Description :   This method starts the training pipeline in a new worker process with a run isolated artifacts directory.
+
+        Output      :   Training job
+        """
+        logging.info("Entered the submit method of TrainingJobRunner class")
+        with self._lock:
+            active = [job for job in self._jobs.values() if job.is_active]
+            if len(active) >= self.max_concurrent_jobs:
+                raise RuntimeError(f"Training job {active[0].job_id} is still {active[0].status}")
+
+            try:
+                self._start_monitor()
+                job_id = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}_{uuid.uuid4().hex[:8]}"
+                job = TrainingJob(
+                    job_id=job_id,
+                    artifacts_dir=os.path.join(from_root(), "artifacts", job_id),
+                )
+
+                process = self._ctx.Process(
+                    target=run_job_process,
+                    args=(self.job_target, job.job_id, job.artifacts_dir, self._events),
+                    name=f"training-{job.job_id}",
+                    daemon=False,
+                )
+                process.start()
+
+                self._jobs[job.job_id] = job
+                self._processes[job.job_id] = process
+                logging.info(f"Started training job {job.job_id} in process {process.pid}")
+                return job
+
+            except Exception as e:
+                raise InsuranceException(e, sys) from e
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[TrainingJob]:
+        return sorted(self._jobs.values(), key=lambda job: job.submitted_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[TrainingJob]:
+
+        """
+        Method Name :   cancel
+
+        Description :   This method terminates the worker process of an active training job together with the processes it spawned.
+
+        Output      :   Training job
+        """
+        logging.info("Entered the cancel method of TrainingJobRunner class")
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or not job.is_active:
+                return job
+
+            process = self._processes.get(job_id)
+            if process is not None and process.is_alive():
+                self._kill_process_group(process, signal.SIGTERM)
+                process.join(timeout=10)
+                if process.is_alive():
+                    self._kill_process_group(process, signal.SIGKILL)
+                    process.join(timeout=10)
+
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            for stage in job.stages.values():
+                if stage["status"] == "running":
+                    stage["status"] = "cancelled"
+            logging.info(f"Cancelled training job {job_id}")
+            return job
+
+    @staticmethod
+    def _kill_process_group(process: multiprocessing.Process, sig: int) -> None:
+        try:
+            os.killpg(process.pid, sig)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            # No process groups on this platform, or the job was cancelled before it left ours
+            if sig == signal.SIGTERM:
+                process.terminate()
+            else:
+                process.kill()
+
+    def shutdown(self) -> None:
+        self._stopped.set()
+        for job in self.list():
+            if job.is_active:
+                self.cancel(job.job_id)
+
+    def _apply_event(self, job_id: str, kind: str, name: str, detail: Optional[str], at: float) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            # Events that arrive after a cancel are ignored
+            if job is None or not job.is_active:
+                return
+
+            if kind == "stage":
+                stage = job.stages.setdefault(name, {"status": None, "started_at": None, "finished_at": None})
+                stage["status"] = detail
+                if detail == "running":
+                    stage["started_at"] = at
+                else:
+                    stage["finished_at"] = at
+            else:
+                job.status = name
+                if name == "running":
+                    job.started_at = at
+                else:
+                    job.finished_at = at
+                    job.error = detail
+                    self._processes.pop(job_id, None)
+                    for stage in job.stages.values():
+                        if stage["status"] == "running":
+                            stage["status"] = name
+                logging.info(f"Training job {job_id} is {name}")
+
+    def _reap_dead_processes(self) -> None:
+        with self._lock:
+            for job_id, process in list(self._processes.items()):
+                job = self._jobs[job_id]
+                if job.is_active and not process.is_alive():
+                    job.status = "failed"
+                    job.finished_at = time.time()
+                    job.error = f"Training process exited with code {process.exitcode}"
+                    self._processes.pop(job_id)
+
+    def _watch(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                self._apply_event(*self._events.get(timeout=1))
+            except queue.Empty:
+                # A worker killed without reporting back (OOM, signal) is marked as failed
+                self._reap_dead_processes()
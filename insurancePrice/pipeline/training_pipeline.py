@@ -1,4 +1,5 @@
 import sys
+from typing import Callable, Optional
 from insurancePrice.configuration.mongo_operations import MongoDBOperation
 from insurancePrice.entity.artifact_entity import DataIngestionArtifact, DataValidationArtifact, DataTransformationArtifact, ModelTrainerArtifact, ModelEvaluationArtifact, ModelPusherArtifact
 
@@ -12,19 +13,21 @@ from insurancePrice.components.model_evaluation import ModelEvaluation
 from insurancePrice.components.model_pusher import ModelPusher
 from insurancePrice.configuration.s3_operations import S3Operation
 
+from insurancePrice.constants import ARTIFACTS_DIR
 from insurancePrice.logger import logging
 from insurancePrice.exception import InsuranceException
 
 
 
 class TrainPipeline:
-    def __init__(self) -> None:
-        self.data_ingestion_config = DataIngestionConfig()
-        self.data_validation_config = DataValidationConfig()
-        self.data_transformation_config = DataTransformationConfig()
-        self.model_trainer_config = ModelTrainerConfig()
-        self.model_evaluation_config = ModelEvaluationConfig()
-        self.model_pusher_config = ModelPusherConfig()
+    def __init__(self, artifacts_dir: str = ARTIFACTS_DIR) -> None:
+        self.artifacts_dir = artifacts_dir
+        self.data_ingestion_config = DataIngestionConfig(artifacts_dir)
+        self.data_validation_config = DataValidationConfig(artifacts_dir)
+        self.data_transformation_config = DataTransformationConfig(artifacts_dir)
+        self.model_trainer_config = ModelTrainerConfig(artifacts_dir)
+        self.model_evaluation_config = ModelEvaluationConfig(artifacts_dir)
+        self.model_pusher_config = ModelPusherConfig(artifacts_dir)
         self.mongo_op = MongoDBOperation()
         self.s3_operations = S3Operation()
 
@@ -134,30 +137,46 @@ class TrainPipeline:
         
         
 
-    def run_pipeline(self) -> None:
+    def run_pipeline(self, progress_callback: Optional[Callable[[str, str], None]] = None) -> None:
         logging.info("Entered run_pipeline method of TrainPipeline class")
 
+        # progress_callback(stage, status) is told when each stage is running and completed
+        def run_stage(stage: str, start_stage: Callable, **kwargs):
+            if progress_callback is not None:
+                progress_callback(stage, "running")
+            artifact = start_stage(**kwargs)
+            if progress_callback is not None:
+                progress_callback(stage, "completed")
+            return artifact
+
         try:
-            data_ingestion_artifact = self.start_data_ingestion()
+            data_ingestion_artifact = run_stage("data_ingestion", self.start_data_ingestion)
             
-            data_validation_artifact = self.start_data_validation(data_ingestion_artifact=data_ingestion_artifact)
+            data_validation_artifact = run_stage("data_validation", self.start_data_validation,
+                                                 data_ingestion_artifact=data_ingestion_artifact)
             
-            data_transformation_artifact = self.start_data_transformation(data_ingestion_artifact=data_ingestion_artifact)
+            data_transformation_artifact = run_stage("data_transformation", self.start_data_transformation,
+                                                     data_ingestion_artifact=data_ingestion_artifact)
             
-            model_trainer_artifact = self.start_model_trainer(
+            model_trainer_artifact = run_stage(
+                "model_trainer", self.start_model_trainer,
                 data_transformation_artifact=data_transformation_artifact
             )
             
-            model_evaluation_artifact = self.start_model_evaluation(
+            model_evaluation_artifact = run_stage(
+                "model_evaluation", self.start_model_evaluation,
                 data_ingestion_artifact=data_ingestion_artifact,
                 model_trainer_artifact=model_trainer_artifact,
             )
 
             if not model_evaluation_artifact.is_model_accepted:
                 logging.info("Model not accepted")
+                if progress_callback is not None:
+                    progress_callback("model_pusher", "skipped")
                 return None
             
-            model_pusher_artifact = self.start_model_pusher(
+            model_pusher_artifact = run_stage(
+                "model_pusher", self.start_model_pusher,
                 model_trainer_artifacts=model_trainer_artifact,
                 s3=self.s3_operations,
                 data_transformation_artifacts=data_transformation_artifact,
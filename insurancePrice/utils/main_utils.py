@@ -1,15 +1,12 @@
+import hashlib
 import shutil
 import sys
-from typing import Dict, Tuple, List
+from typing import Dict, Tuple, List, Optional
 import dill
-import xgboost
 import numpy as np
 import pandas as pd
 import yaml
 from pandas import DataFrame
-from sklearn.metrics import r2_score
-from sklearn.model_selection import GridSearchCV
-from sklearn.utils import all_estimators
 from yaml import safe_dump
 from insurancePrice.constants import *
 from insurancePrice.exception import InsuranceException
@@ -64,13 +61,22 @@ class MainUtils:
         train_y: DataFrame,
         test_x: DataFrame,
         test_y: DataFrame,
+        use_tuning_cache: bool = TUNING_CACHE_ENABLED,
+        fixed_params: Optional[Dict] = None,
     ) -> Tuple[float, object, str]:
         logging.info("Entered the get_tuned_model method of MainUtils class")
         try:
             model = self.get_base_model(model_name)
-            model_best_params = self.get_model_params(model, train_x, train_y)
-            model.set_params(**model_best_params)
-            model.fit(train_x, train_y)
+            # Params of the preprocessing profile, kept on every grid point
+            if fixed_params:
+                model.set_params(**fixed_params)
+            model_best_params, best_estimator = self.search_model_params(model, train_x, train_y, use_tuning_cache)
+            # Reusing the GridSearchCV refit instead of fitting the best params again
+            if best_estimator is not None:
+                model = best_estimator
+            else:
+                model.set_params(**model_best_params)
+                model.fit(train_x, train_y)
             preds = model.predict(test_x)
             model_score = self.get_model_score(test_y, preds)
             logging.info("Exited the get_tuned_model method of MainUtils class")
@@ -83,6 +89,8 @@ class MainUtils:
     def get_model_score(test_y: DataFrame, preds: DataFrame) -> float:
         logging.info("Entered the get_model_score method of MainUtils class")
         try:
+            from sklearn.metrics import r2_score
+
             model_score = r2_score(test_y, preds)
             logging.info("Model score is {}".format(model_score))
             logging.info("Exited the get_model_score method of MainUtils class")
@@ -95,9 +103,14 @@ class MainUtils:
     def get_base_model(model_name: str) -> object:
         logging.info("Entered the get_base_model method of MainUtils class")
         try:
+            # Training only imports, kept out of the serving process
             if model_name.lower().startswith("xgb") is True:
+                import xgboost
+
                 model = xgboost.__dict__[model_name]()
             else:
+                from sklearn.utils import all_estimators
+
                 model_idx = [model[0] for model in all_estimators()].index(model_name)
                 model = all_estimators().__getitem__(model_idx)[1]()
             logging.info("Exited the get_base_model method of MainUtils class")
@@ -106,24 +119,105 @@ class MainUtils:
         except Exception as e:
             raise InsuranceException(e, sys) from e
 
+    @staticmethod
+    def get_preprocessing_profiles(model_config: Dict) -> Dict[str, str]:
+        logging.info("Entered the get_preprocessing_profiles method of MainUtils class")
+        try:
+            profiles = model_config.get("preprocessing_profile") or {}
+            model_profiles = {
+                model_name: profiles.get(model_name, DEFAULT_PREPROCESSING_PROFILE)
+                for model_name in model_config["train_model"]
+            }
+            for model_name, profile in model_profiles.items():
+                if profile not in PREPROCESSING_PROFILES:
+                    raise ValueError(f"Unknown preprocessing profile {profile}, expected one of {PREPROCESSING_PROFILES}")
+                if profile == "categorical" and not model_name.lower().startswith("xgb"):
+                    raise ValueError(f"Native categorical splits are only supported by the xgboost models, not {model_name}")
+            logging.info("Exited the get_preprocessing_profiles method of MainUtils class")
+            return model_profiles
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    @staticmethod
+    def get_profile_params(profile: str, schema_config: Dict) -> Dict:
+        # The categorical profile writes the category codes first, then the scaled numerical columns
+        if profile != "categorical":
+            return {}
+        feature_types = ["c"] * len(schema_config["categorical_columns"]) + ["q"] * len(schema_config["numerical_columns"])
+        return {"enable_categorical": True, "feature_types": feature_types}
+
     def get_model_params(
-        self, model: object, x_train: DataFrame, y_train: DataFrame
+        self, model: object, x_train: DataFrame, y_train: DataFrame, use_tuning_cache: bool = TUNING_CACHE_ENABLED
     ) -> Dict:
         logging.info("Entered the get_model_params method of MainUtils class")
         try:
+            model_best_params, _ = self.search_model_params(model, x_train, y_train, use_tuning_cache)
+            logging.info("Exited the get_model_params method of MainUtils class")
+            return model_best_params
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def search_model_params(
+        self, model: object, x_train: DataFrame, y_train: DataFrame, use_tuning_cache: bool = TUNING_CACHE_ENABLED
+    ) -> Tuple[Dict, Optional[object]]:
+        logging.info("Entered the search_model_params method of MainUtils class")
+        try:
+            from sklearn.model_selection import GridSearchCV, ParameterGrid
+            from insurancePrice.components.tuning_cache import TuningCache
+
             VERBOSE = 3
-            CV = 2
+            CV = TUNING_CV_FOLDS
             #N_JOBS = -1
 
             model_name = model.__class__.__name__
             model_config = self.read_yaml_file(filename=MODEL_CONFIG_FILE)
-            model_param_grid = model_config["train_model"][model_name]
-            model_grid = GridSearchCV(
-                model, model_param_grid, verbose=VERBOSE, cv=CV
+            candidates = list(ParameterGrid(model_config["train_model"][model_name]))
+
+            # Grid points scored by an earlier run on the same data are not fitted again
+            tuning_cache = TuningCache() if use_tuning_cache else None
+            try:
+                cv_config = {"n_splits": CV, "shuffle": False}
+                fingerprint = TuningCache.get_fingerprint(x_train, y_train)
+                scores = {}
+                for candidate, params in enumerate(candidates if tuning_cache is not None else []):
+                    cached = tuning_cache.get(fingerprint, model_name, params, cv_config)
+                    if cached is not None:
+                        scores[candidate] = cached["score"]
+                missing = [candidate for candidate in range(len(candidates)) if candidate not in scores]
+                logging.info(f"{len(candidates) - len(missing)} of {len(candidates)} grid points of {model_name} cached")
+
+                best_estimator = None
+                if missing:
+                    # GridSearchCV refits the best params only when it saw the whole grid
+                    model_grid = GridSearchCV(
+                        model, [{name: [value] for name, value in candidates[candidate].items()} for candidate in missing],
+                        verbose=VERBOSE, cv=CV, refit=len(missing) == len(candidates),
+                    )
+                    model_grid.fit(x_train, y_train)
+                    for index, candidate in enumerate(missing):
+                        fold_scores = [model_grid.cv_results_[f"split{fold}_test_score"][index] for fold in range(CV)]
+                        scores[candidate] = float(np.mean(fold_scores))
+                        if tuning_cache is not None:
+                            fit_seconds = float(model_grid.cv_results_["mean_fit_time"][index]) * CV
+                            tuning_cache.put(fingerprint, model_name, candidates[candidate], cv_config, fold_scores, fit_seconds)
+                    if len(missing) == len(candidates):
+                        best_estimator = model_grid.best_estimator_
+
+                if tuning_cache is not None:
+                    tuning_cache.evict()
+            finally:
+                if tuning_cache is not None:
+                    tuning_cache.close()
+
+            # First best grid point in grid order, failed fits (nan) never win, like GridSearchCV
+            best_candidate = max(
+                (candidate for candidate in scores if not np.isnan(scores[candidate])),
+                key=lambda candidate: (scores[candidate], -candidate),
             )
-            model_grid.fit(x_train, y_train)
-            logging.info("Exited the get_model_params method of MainUtils class")
-            return model_grid.best_params_
+            logging.info("Exited the search_model_params method of MainUtils class")
+            return candidates[best_candidate], best_estimator
 
         except Exception as e:
             raise InsuranceException(e, sys) from e
@@ -158,6 +252,17 @@ class MainUtils:
         except Exception as e:
             raise InsuranceException(e, sys) from e
 
+    @staticmethod
+    def get_file_digest(file_path: str) -> str:
+        """
+        sha256 hex digest of the file, the same digest ModelCache computes from the downloaded bytes.
+        """
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file_obj:
+            for block in iter(lambda: file_obj.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
     @staticmethod
     def load_object(file_path: str) -> object:
         logging.info("Entered the load_object method of MainUtils class")
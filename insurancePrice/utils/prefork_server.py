@@ -0,0 +1,152 @@
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+from insurancePrice.constants import *
+from insurancePrice.exception import InsuranceException
+from insurancePrice.logger import logging, logging_pipeline
+from insurancePrice.utils.serving_utils import get_process_memory
+
+
+
+class PreforkServer:
+    """
+    Runs the app in several uvicorn worker processes forked from one master.
+
+    The master binds the listening socket and runs preload_fn (fetching and
+    warming the model) before any worker exists, then moves every live object
+    into the permanent GC generation with gc.freeze. Collections in the
+    workers then never write to the GC headers of the model objects, so the
+    model pages stay shared copy-on-write between all workers instead of
+    being copied into each of them.
+
+    The master only supervises: it restarts workers that die, forwards
+    SIGTERM/SIGINT to them and logs per worker RSS against shared memory.
+    Apart from the log writer, which every worker restarts after the fork,
+    the master must not start threads before forking.
+    """
+    def __init__(self,
+                 app: object,
+                 host: str = APP_HOST,
+                 port: int = APP_PORT,
+                 workers: int = SERVING_WORKERS,
+                 preload_fn: Optional[Callable[[], None]] = None,
+                 post_fork_fn: Optional[Callable[[], None]] = None,
+                 memory_report_seconds: float = MEMORY_REPORT_INTERVAL_SECONDS):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preload_fn = preload_fn
+        self.post_fork_fn = post_fork_fn
+        self.memory_report_seconds = memory_report_seconds
+        self._socket: Optional[socket.socket] = None
+        self._worker_pids: Dict[int, int] = {}
+        self._stopping = False
+
+    def bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def run(self) -> None:
+
+        """
+        Method Name :   run
+
+        Description :   This method preloads the model in the master, forks the workers and supervises them until shutdown.
+
+        Output      :   None
+        """
+        logging.info("Entered the run method of PreforkServer class")
+        try:
+            self._socket = self.bind()
+
+            if self.preload_fn is not None:
+                self.preload_fn()
+
+            # Everything allocated so far (the model included) is never scanned by the GC again
+            gc.collect()
+            gc.freeze()
+            logging.info(f"Froze {gc.get_freeze_count()} objects before forking {self.workers} workers")
+
+            signal.signal(signal.SIGTERM, self._handle_stop)
+            signal.signal(signal.SIGINT, self._handle_stop)
+
+            for worker_id in range(self.workers):
+                self.spawn(worker_id)
+            self.supervise()
+
+        except Exception as e:
+            raise InsuranceException(e, sys) from e
+
+    def spawn(self, worker_id: int) -> int:
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(worker_id)
+        self._worker_pids[pid] = worker_id
+        logging.info(f"Started worker {worker_id} with pid {pid}")
+        return pid
+
+    def _run_worker(self, worker_id: int) -> None:
+        import uvicorn
+
+        exit_code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            if self.post_fork_fn is not None:
+                self.post_fork_fn()
+
+            server = uvicorn.Server(uvicorn.Config(self.app, host=self.host, port=self.port))
+            server.run(sockets=[self._socket])
+
+        except BaseException as e:
+            logging.info(f"Worker {worker_id} stopped with error: {e}")
+            exit_code = 1
+
+        finally:
+            # os._exit skips atexit, the queued log records are flushed here
+            logging_pipeline.stop()
+            # Never fall back into the master's supervise loop
+            os._exit(exit_code)
+
+    def supervise(self) -> None:
+        last_report = time.monotonic()
+        while self._worker_pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+
+            if pid:
+                worker_id = self._worker_pids.pop(pid, None)
+                logging.info(f"Worker {worker_id} with pid {pid} exited with status {status}")
+                if not self._stopping and worker_id is not None:
+                    self.spawn(worker_id)
+                continue
+
+            if self.memory_report_seconds > 0 and time.monotonic() - last_report >= self.memory_report_seconds:
+                last_report = time.monotonic()
+                logging.info(f"Worker memory: {self.memory_report()}")
+            time.sleep(0.5)
+
+        self._socket.close()
+        logging.info("Exited the run method of PreforkServer class")
+
+    def memory_report(self) -> List[Dict]:
+        return [get_process_memory(os.getpid())] + [get_process_memory(pid) for pid in sorted(self._worker_pids)]
+
+    def _handle_stop(self, signum, frame) -> None:
+        self._stopping = True
+        for pid in list(self._worker_pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
@@ -0,0 +1,239 @@
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+from insurancePrice.constants import *
+from insurancePrice.logger import logging
+
+
+
+def limit_inference_threads(n_threads: int = INFERENCE_THREADS) -> None:
+    """
+    Caps the OpenMP/BLAS thread pools used by numpy, sklearn and xgboost in this process.
+    """
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, str(n_threads))
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=n_threads)
+    except ImportError:
+        logging.info("threadpoolctl is not installed, BLAS/OpenMP thread limits only apply through env vars")
+
+
+def configure_inference_threads(model: object, n_threads: int = INFERENCE_THREADS) -> object:
+    """
+    Sets n_jobs (nthread for xgboost) on the regressor wrapped by a CostModel.
+    """
+    estimator = getattr(model, "trained_model_object", model)
+    if hasattr(estimator, "get_params") and "n_jobs" in estimator.get_params():
+        estimator.set_params(n_jobs=n_threads)
+    return model
+
+
+
+class InferenceExecutor:
+    """
+    Bounded thread pool that runs blocking inference and I/O away from the event loop.
+
+    At most max_pending calls are queued at a time, further callers wait on the
+    loop instead of growing the executor queue.
+    """
+    def __init__(self,
+                 max_workers: int = INFERENCE_EXECUTOR_WORKERS,
+                 max_pending: int = INFERENCE_EXECUTOR_MAX_PENDING,
+                 n_threads: int = INFERENCE_THREADS):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="inference",
+            initializer=limit_inference_threads,
+            initargs=(n_threads,),
+        )
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def run(self, fn: Callable, *args, **kwargs):
+
+        """
+        Method Name :   run
+
+        Description :   This method runs fn in the inference thread pool and awaits its result.
+
+        Output      :   Result of fn
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            # run_in_executor does not carry context variables (the request id) over to the thread
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, functools.partial(context.run, fn, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+
+class EventLoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a sleeping task, which is the time
+    a ready request would have waited behind blocking work.
+    """
+    def __init__(self,
+                 interval_ms: float = LOOP_LAG_MONITOR_INTERVAL_MS,
+                 warn_ms: float = LOOP_LAG_WARN_MS):
+        self.interval = interval_ms / 1000
+        self.warn_ms = warn_ms
+        self.samples = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self.ewma_lag_ms = 0.0
+        self.stalls = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - started - self.interval) * 1000)
+
+            self.samples += 1
+            self.last_lag_ms = lag_ms
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            self.ewma_lag_ms = 0.9 * self.ewma_lag_ms + 0.1 * lag_ms
+            if lag_ms >= self.warn_ms:
+                self.stalls += 1
+                logging.warning(f"Event loop lag of {lag_ms:.1f} ms, the loop was blocked")
+
+    def snapshot(self) -> Dict:
+        return {
+            "samples": self.samples,
+            "last_lag_ms": self.last_lag_ms,
+            "ewma_lag_ms": self.ewma_lag_ms,
+            "max_lag_ms": self.max_lag_ms,
+            "stalls": self.stalls,
+            "warn_ms": self.warn_ms,
+        }
+
+
+
+def get_process_age_seconds() -> Optional[float]:
+    """
+    Seconds since this process was started, read from /proc. None where /proc is not available.
+    """
+    try:
+        with open("/proc/self/stat") as stat_file:
+            # The command name may contain spaces, the fields after it are space separated
+            start_ticks = int(stat_file.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime_file:
+            uptime = float(uptime_file.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+
+class StartupTracker:
+    """
+    Readiness of the serving process and its time to first prediction, split by stage.
+    """
+    def __init__(self):
+        # Time spent before the app module started importing (interpreter and server start)
+        process_age = get_process_age_seconds()
+        self.created_at = time.perf_counter()
+        self.started_at = self.created_at - (process_age or 0.0)
+        self.stages: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+        self.ready_at: Optional[float] = None
+        if process_age is not None:
+            self.stages["process_start_seconds"] = process_age
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = seconds
+
+    @contextmanager
+    def stage(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def mark_ready(self) -> None:
+        self.ready, self.error = True, None
+        self.ready_at = time.perf_counter()
+        logging.info(f"Ready to serve predictions after {self.ready_at - self.started_at:.3f} seconds: {self.stages}")
+
+    def mark_failed(self, error: Exception) -> None:
+        self.error = str(error)
+        logging.info(f"Startup did not complete: {error}")
+
+    def snapshot(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "time_to_first_prediction_seconds": self.ready_at - self.started_at if self.ready_at else None,
+            "stages": dict(self.stages),
+        }
+
+
+
+def get_process_memory(pid: int) -> Dict:
+    """
+    Resident, proportional, shared and private memory of a process in MB, from /proc/<pid>/smaps_rollup.
+
+    Pages a forked worker still shares copy-on-write with the master count as
+    shared, Pss splits every shared page between the processes mapping it.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as smaps_file:
+            for line in smaps_file:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return {"pid": pid, "error": "smaps_rollup is not available"}
+
+    return {
+        "pid": pid,
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+def get_child_pids(parent_pid: int) -> List[int]:
+    """
+    Pids of the live children of parent_pid, found by scanning /proc.
+    """
+    child_pids = []
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                if int(stat_file.read().rsplit(")", 1)[1].split()[1]) == parent_pid:
+                    child_pids.append(int(entry))
+        except (OSError, ValueError, IndexError):
+            continue
+    return sorted(child_pids)
@@ -28,5 +28,7 @@ setup(
     author='Abhishek Kulkarni',
     author_email='kul.abhishake@gmail.com',
     packages = find_packages(),
-    install_requires = get_requirements('requirements.txt')
+    install_requires = get_requirements('requirements.txt'),
+    # ONNX export and serving, Arrow and Parquet bodies: pip install -r requirements-export.txt
+    extras_require = {'export': get_requirements('requirements-export.txt')}
 )
\ No newline at end of file
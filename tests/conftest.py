@@ -0,0 +1,73 @@
+"""
+Shared fixtures. Run from the repository root, the config and data paths are relative to it:
+
+    python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+from xgboost import XGBRegressor
+
+from insurancePrice.components.model_predictor import read_schema_config
+from insurancePrice.components.model_trainer import CostModel
+from insurancePrice.constants import TARGET_COLUMN, TEST_SIZE
+from insurancePrice.utils.main_utils import MainUtils
+
+
+def build_preprocessor(profile, schema_config):
+    # Same blocks as DataTransformation.get_data_transformer_object
+    if profile == "categorical":
+        encoder = ("OrdinalEncoder", OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=np.nan))
+    else:
+        encoder = ("OneHotEncoder", OneHotEncoder(handle_unknown="ignore"))
+    return ColumnTransformer([
+        (*encoder, schema_config["categorical_columns"]),
+        ("StandardScaler", StandardScaler(), schema_config["numerical_columns"]),
+    ])
+
+
+@pytest.fixture(scope="session")
+def schema_config():
+    return read_schema_config()
+
+
+@pytest.fixture(scope="session")
+def insurance_split():
+    data = pd.read_csv("data/insurance.csv")
+    X, y = data.drop(columns=[TARGET_COLUMN]), data[TARGET_COLUMN]
+    return train_test_split(X, y, test_size=TEST_SIZE, random_state=0)
+
+
+def fit_cost_model(regressor, insurance_split, schema_config, profile="onehot"):
+    X_train, _, y_train, _ = insurance_split
+    preprocessor = build_preprocessor(profile, schema_config)
+    regressor.set_params(**MainUtils.get_profile_params(profile, schema_config))
+    regressor.fit(preprocessor.fit_transform(X_train), y_train)
+    return CostModel(preprocessor, regressor).compile()
+
+
+@pytest.fixture(scope="session")
+def random_forest_cost_model(insurance_split, schema_config):
+    regressor = RandomForestRegressor(n_estimators=20, max_depth=6, random_state=0, n_jobs=1)
+    return fit_cost_model(regressor, insurance_split, schema_config)
+
+
+@pytest.fixture(scope="session")
+def xgboost_cost_model(insurance_split, schema_config):
+    regressor = XGBRegressor(n_estimators=30, max_depth=4, learning_rate=0.2, tree_method="hist", n_jobs=1)
+    return fit_cost_model(regressor, insurance_split, schema_config)
+
+
+@pytest.fixture(scope="session")
+def categorical_xgboost_cost_model(insurance_split, schema_config):
+    regressor = XGBRegressor(n_estimators=30, max_depth=4, learning_rate=0.2, tree_method="hist", n_jobs=1)
+    return fit_cost_model(regressor, insurance_split, schema_config, profile="categorical")
+
+
+@pytest.fixture(params=["random_forest", "xgboost"])
+def cost_model(request):
+    return request.getfixturevalue(f"{request.param}_cost_model")
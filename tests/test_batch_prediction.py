@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from insurancePrice.components.model_predictor import CostPredictor
+
+
+class RowModel:
+    """
+    Predicts a value identifying the row, missing values included, and records the rows it was called with.
+    """
+    def __init__(self):
+        self.rows_scored = 0
+
+    def predict(self, X):
+        self.rows_scored += len(X)
+        return (X["age"].fillna(-1) * 100 + X["children"].fillna(-1) + X["region"].map({"ne": 0.5}).fillna(0)).to_numpy()
+
+
+def test_duplicate_and_missing_value_rows_keep_their_order():
+    X = pd.DataFrame({
+        "age": [30, np.nan, 40, 30, np.nan, 50, 40, np.nan],
+        "children": [1, 2, np.nan, 1, 2, 0, np.nan, 3],
+        "region": ["ne", "ne", None, "ne", "ne", "ne", None, None],
+    })
+    model = RowModel()
+
+    predictions = CostPredictor.predict_batch_with_model(model, X, chunk_size=2)
+
+    assert len(predictions) == len(X)
+    np.testing.assert_array_equal(predictions, RowModel().predict(X))
+    # Every distinct row is scored once
+    assert model.rows_scored == 5
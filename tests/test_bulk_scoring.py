@@ -0,0 +1,118 @@
+import copy
+import json
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from insurancePrice.components.compiled_model import CompiledPreprocessor
+from insurancePrice.constants import BULK_SCORING_PREDICTION_COLUMN
+from insurancePrice.exception import InsuranceException
+from insurancePrice.pipeline.bulk_scoring import BulkScorer, compile_scoring_model
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def scoring_files(random_forest_cost_model, tmp_path):
+    model_path = tmp_path / "model.pkl"
+    model_path.write_bytes(pickle.dumps(random_forest_cost_model))
+    input_path = tmp_path / "policies.csv"
+    policies = pd.read_csv("data/insurance.csv").head(250)
+    # Failing the schema checks, scored as an empty prediction
+    policies.loc[7, "region"] = "unknown"
+    policies.to_csv(input_path, index=False)
+    return str(input_path), str(model_path), tmp_path
+
+
+def read_output(output_path):
+    if output_path.endswith(".parquet"):
+        return pd.read_parquet(output_path)
+    return pd.read_csv(output_path)
+
+
+@pytest.mark.parametrize("output_name", ["priced.csv", "priced.parquet"])
+def test_rerun_resumes_after_the_last_checkpoint(scoring_files, output_name):
+    input_path, model_path, tmp_path = scoring_files
+    if output_name.endswith(".parquet"):
+        pytest.importorskip("pyarrow")
+    output_path = str(tmp_path / output_name)
+
+    def stop_after_two_chunks(progress):
+        if progress["chunks"] == 2:
+            raise Interrupted()
+
+    with pytest.raises(InsuranceException):
+        BulkScorer(input_path, output_path, model_path=model_path, backend="pickle", chunk_size=50, workers=1).run(
+            progress_callback=stop_after_two_chunks
+        )
+    with open(output_path + ".checkpoint.json") as file_obj:
+        checkpoint = json.load(file_obj)
+    assert (checkpoint["chunks_done"], checkpoint["rows_done"], checkpoint["completed"]) == (2, 100, False)
+    if output_name.endswith(".csv"):
+        # A chunk written after the checkpoint, dropped by the rerun
+        with open(output_path, "a") as file_obj:
+            file_obj.write("half,a,row\n")
+
+    report = BulkScorer(input_path, output_path, model_path=model_path, backend="pickle", chunk_size=50, workers=1).run()
+
+    assert (report["resumed_chunks"], report["resumed_rows"]) == (2, 100)
+    assert (report["chunks"], report["rows"], report["invalid_rows"]) == (5, 250, 1)
+
+    fresh_path = str(tmp_path / f"fresh_{output_name}")
+    BulkScorer(input_path, fresh_path, model_path=model_path, backend="pickle", chunk_size=50, workers=1).run()
+    scored = read_output(output_path)
+    pd.testing.assert_frame_equal(scored, read_output(fresh_path))
+    assert scored[BULK_SCORING_PREDICTION_COLUMN].isna().sum() == 1
+    assert list(scored.columns[:-1]) == list(pd.read_csv(input_path).columns)
+
+
+def test_checkpoint_of_another_run_is_not_resumed(scoring_files):
+    input_path, model_path, tmp_path = scoring_files
+    output_path = str(tmp_path / "priced.csv")
+    BulkScorer(input_path, output_path, model_path=model_path, backend="pickle", chunk_size=50, workers=1).run()
+
+    with pytest.raises(ValueError, match="chunk_size"):
+        BulkScorer(input_path, output_path, model_path=model_path, backend="pickle", chunk_size=100, workers=1).run()
+
+    report = BulkScorer(
+        input_path, output_path, model_path=model_path, backend="pickle", chunk_size=100, workers=1, restart=True
+    ).run()
+    assert (report["resumed_chunks"], report["chunks"], report["rows"]) == (0, 3, 250)
+    assert len(pd.read_csv(output_path)) == 250
+
+
+@pytest.fixture
+def uncompiled_model(random_forest_cost_model):
+    model = copy.deepcopy(random_forest_cost_model)
+    model.compiled_preprocessor = None
+    return model
+
+
+def test_worker_compiles_a_matching_model(uncompiled_model, random_forest_cost_model):
+    X = pd.read_csv("data/insurance.csv").head(50)
+
+    assert compile_scoring_model(uncompiled_model).is_compiled
+    np.testing.assert_allclose(uncompiled_model.predict(X), random_forest_cost_model.predict(X))
+
+
+def not_compilable(cls, preprocessor):
+    raise ValueError("StandardScaler cannot be compiled")
+
+
+@pytest.mark.parametrize("failure", ["compile", "verify"])
+def test_worker_falls_back_to_the_uncompiled_model(uncompiled_model, monkeypatch, failure):
+    X = pd.read_csv("data/insurance.csv").head(50)
+    expected = uncompiled_model.predict(X)
+    if failure == "compile":
+        monkeypatch.setattr(CompiledPreprocessor, "from_column_transformer", classmethod(not_compilable))
+    else:
+        # Compiled predictions that differ from the sklearn path
+        transform = CompiledPreprocessor.transform
+        monkeypatch.setattr(CompiledPreprocessor, "transform", lambda self, X: transform(self, X) + 1.0)
+
+    assert not compile_scoring_model(uncompiled_model).is_compiled
+    np.testing.assert_allclose(uncompiled_model.predict(X), expected)
@@ -0,0 +1,130 @@
+import pickle
+import random
+
+import pandas as pd
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+import insurancePrice.configuration.mongo_operations as mongo_operations
+from insurancePrice.configuration.mongo_operations import MongoDBOperation
+from insurancePrice.constants import MONGO_SCORING_JOBS_COLLECTION, TARGET_COLUMN
+from insurancePrice.exception import InsuranceException
+from insurancePrice.pipeline.collection_scoring import CollectionScorer
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def database():
+    return mongomock.MongoClient()["insurance"]
+
+
+@pytest.fixture
+def policies(database):
+    records = pd.read_csv("data/insurance.csv").head(100).drop(columns=[TARGET_COLUMN]).to_dict(orient="records")
+    documents = [{"_id": index, **record} for index, record in enumerate(records)]
+    # Failing the schema checks, priced as null
+    documents[42]["region"] = "unknown"
+    # Inserted out of _id order
+    random.Random(0).shuffle(documents)
+    database["policies"].insert_many(documents)
+    return database["policies"]
+
+
+def test_id_boundaries_split_the_matching_documents_evenly(policies):
+    assert MongoDBOperation.get_id_boundaries(policies, 4) == [25, 50, 75]
+
+    smoker_ids = sorted(document["_id"] for document in policies.find({"smoker": "yes"}, {"_id": 1}))
+    boundaries = MongoDBOperation.get_id_boundaries(policies, 2, {"smoker": "yes"})
+    assert boundaries == [smoker_ids[len(smoker_ids) // 2]]
+
+
+def test_id_boundaries_of_small_collections(policies, database):
+    assert MongoDBOperation.get_id_boundaries(database["empty"], 4) == []
+    assert MongoDBOperation.get_id_boundaries(policies, 1) == []
+
+    # More ranges than documents: no duplicate boundaries
+    assert MongoDBOperation.get_id_boundaries(policies, 200, {"_id": {"$lt": 3}}) == [0, 1, 2]
+
+
+def test_batches_stream_in_id_order(policies):
+    batches = list(MongoDBOperation.iter_batches(policies, {"_id": {"$lt": 7}}, {"age": 1}, 3))
+
+    assert [[document["_id"] for document in batch] for batch in batches] == [[0, 1, 2], [3, 4, 5], [6]]
+    assert set(batches[0][0]) == {"_id", "age"}
+
+
+@pytest.fixture
+def scorer_setup(database, policies, random_forest_cost_model, tmp_path, monkeypatch):
+    monkeypatch.setenv("MONGO_DB_URL", "mongodb://test")
+    monkeypatch.setattr(mongo_operations, "MongoClient", lambda url: database.client)
+    model_path = tmp_path / "model.pkl"
+    model_path.write_bytes(pickle.dumps(random_forest_cost_model))
+
+    bulk_writes = []
+
+    # Recorded and applied one by one, mongomock cannot run the UpdateOne operations of recent pymongo versions
+    def recorded_bulk_write(collection, requests, ordered=True, **kwargs):
+        bulk_writes.append({"ids": [request._filter["_id"] for request in requests], "ordered": ordered})
+        if len(bulk_writes) == getattr(recorded_bulk_write, "fail_at", None):
+            raise Interrupted()
+        for request in requests:
+            collection.update_one(request._filter, request._doc)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", recorded_bulk_write)
+
+    def make_scorer(**kwargs):
+        return CollectionScorer(db_name="insurance", collection_name="policies", model_path=str(model_path),
+                                backend="pickle", batch_size=10, workers=1, **kwargs)
+
+    return make_scorer, bulk_writes, recorded_bulk_write
+
+
+def test_scoring_writes_every_document_back_with_unordered_bulk_writes(scorer_setup, policies, random_forest_cost_model):
+    make_scorer, bulk_writes, _ = scorer_setup
+
+    report = make_scorer().run()
+
+    # 4 _id ranges of 25 documents, in batches of 10
+    assert (report["ranges"], report["rows"], report["scored_rows"], report["invalid_rows"]) == (4, 100, 100, 1)
+    assert [len(bulk_write["ids"]) for bulk_write in bulk_writes] == [10, 10, 5] * 4
+    assert not any(bulk_write["ordered"] for bulk_write in bulk_writes)
+
+    documents = list(policies.find().sort("_id", 1))
+    assert documents[42]["predicted_expenses"] is None
+    valid = [document for document in documents if document["_id"] != 42]
+    expected = random_forest_cost_model.predict(pd.DataFrame(valid).drop(columns=["_id", "predicted_expenses",
+                                                                                   "predicted_expenses_model"]))
+    assert [document["predicted_expenses"] for document in valid] == pytest.approx(expected.round(2).tolist())
+    assert len({document["predicted_expenses_model"] for document in documents}) == 1
+
+
+def test_rerun_resumes_from_the_high_water_marks(scorer_setup, policies, database):
+    make_scorer, bulk_writes, recorded_bulk_write = scorer_setup
+    # Interrupted in the second range, after two of its batches were written
+    recorded_bulk_write.fail_at = 6
+
+    with pytest.raises(InsuranceException):
+        make_scorer().run()
+
+    states = {state["_id"].rsplit(":", 1)[1]: state for state in database[MONGO_SCORING_JOBS_COLLECTION].find(
+        {"job_id": {"$exists": True}}
+    )}
+    assert (states["0"]["completed"], states["1"]["completed"]) == (True, False)
+    assert (states["1"]["high_water_mark"], states["1"]["rows"]) == (44, 20)
+
+    recorded_bulk_write.fail_at = None
+    del bulk_writes[:]
+    report = make_scorer().run()
+
+    # Only the documents after the high-water marks are read and written again
+    assert (report["rows"], report["scored_rows"]) == (100, 55)
+    written = [document_id for bulk_write in bulk_writes for document_id in bulk_write["ids"]]
+    assert sorted(written) == list(range(45, 100))
+    assert policies.count_documents({"predicted_expenses_model": {"$exists": True}}) == 100
+
+    # A completed job is not scored again
+    assert make_scorer().run()["scored_rows"] == 0
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import insurancePrice.logger as logger
+from insurancePrice.logger import (LOG_FILE_PATH, DroppingQueueHandler, JsonFormatter, RequestIdFilter, SamplingFilter,
+                                   logging_pipeline, request_id_var)
+
+
+def make_record(module="model_predictor", function="predict", level=logging.INFO, msg="scored", exc_info=None):
+    return logging.LogRecord("root", level, f"/app/{module}.py", 10, msg, None, exc_info, function)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sampling_keeps_the_configured_share():
+    sampling_filter = SamplingFilter({"model_predictor": 0.1}, {})
+    random.seed(0)
+
+    kept = sum(sampling_filter.filter(make_record()) for _ in range(10000))
+
+    assert 900 < kept < 1100
+    assert sampling_filter.dropped == {"model_predictor": 10000 - kept}
+    # Other modules are not sampled
+    assert all(sampling_filter.filter(make_record(module="model_trainer")) for _ in range(100))
+
+
+def test_function_rules_take_precedence_over_module_rules():
+    sampling_filter = SamplingFilter({"model_predictor.predict": 0.0, "model_predictor": 1.0}, {})
+
+    assert not sampling_filter.filter(make_record(function="predict"))
+    assert sampling_filter.filter(make_record(function="predict_batch"))
+    assert sampling_filter.dropped == {"model_predictor.predict": 1}
+
+
+def test_rate_limit_allows_a_second_worth_of_records(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(logger, "time", SimpleNamespace(monotonic=clock))
+    sampling_filter = SamplingFilter({}, {"model_predictor": 5})
+
+    assert [sampling_filter.filter(make_record()) for _ in range(7)] == [True] * 5 + [False] * 2
+    clock.now += 0.5
+    assert [sampling_filter.filter(make_record()) for _ in range(3)] == [True, True, False]
+    clock.now += 10
+    assert sum(sampling_filter.filter(make_record()) for _ in range(10)) == 5
+    assert sampling_filter.dropped == {"model_predictor": 8}
+
+
+def test_warnings_and_errors_always_pass(monkeypatch):
+    monkeypatch.setattr(logger, "time", SimpleNamespace(monotonic=FakeClock()))
+    sampling_filter = SamplingFilter({"model_predictor": 0.0}, {"model_predictor": 1})
+
+    for level in (logging.WARNING, logging.ERROR, logging.CRITICAL):
+        assert all(sampling_filter.filter(make_record(level=level)) for _ in range(10))
+    assert not sampling_filter.filter(make_record())
+    assert sampling_filter.dropped == {"model_predictor": 1}
+
+
+def test_full_queue_drops_records_without_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=2))
+
+    for _ in range(5):
+        handler.handle(make_record())
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_json_records_carry_request_id_and_exception():
+    try:
+        raise ValueError("bad policy")
+    except ValueError:
+        record = make_record(level=logging.ERROR, msg="failed", exc_info=sys.exc_info())
+
+    token = request_id_var.set("req-42")
+    try:
+        RequestIdFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+    log_record = json.loads(JsonFormatter().format(record))
+
+    assert (log_record["request_id"], log_record["level"], log_record["message"]) == ("req-42", "ERROR", "failed")
+    assert (log_record["module"], log_record["function"]) == ("model_predictor", "predict")
+    assert "ValueError: bad policy" in log_record["exception"]
+
+
+@pytest.fixture
+def async_pipeline(tmp_path):
+    log_file_path = str(tmp_path / "app.log")
+    logging_pipeline.configure(log_file_path=log_file_path, log_format="json", use_queue=True)
+    yield log_file_path
+    logging_pipeline.configure(log_file_path=LOG_FILE_PATH)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_listener_is_restarted_in_a_forked_child(async_pipeline):
+    parent_listener = logging_pipeline.listener
+
+    pid = os.fork()
+    if pid == 0:
+        # Child: the fork hook must have started a new writer thread on a new queue
+        restarted = logging_pipeline.listener is not parent_listener and logging_pipeline.listener._thread.is_alive()
+        logging.info("logged in the child")
+        logging_pipeline.stop()
+        os._exit(0 if restarted else 1)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+    with open(async_pipeline) as file_obj:
+        messages = [json.loads(line)["message"] for line in file_obj]
+    assert "logged in the child" in messages
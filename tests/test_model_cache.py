@@ -0,0 +1,179 @@
+import io
+import pickle
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from insurancePrice.components.model_cache import ModelCache
+from insurancePrice.components.model_predictor import CostPredictor
+from insurancePrice.configuration.s3_operations import S3Operation
+
+
+class ConstantModel:
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return np.full(len(X), self.value)
+
+
+class FakeS3Client:
+    """
+    HEAD and GET of a single, replaceable object, counting the requests.
+    """
+    def __init__(self):
+        self.version = 0
+        self.data = b""
+        self.head_requests = 0
+        self.get_requests = 0
+        self.get_delay = 0.0
+
+    def put(self, data):
+        self.version += 1
+        self.data = data
+
+    def head_object(self, Bucket, Key):
+        self.head_requests += 1
+        return {"ETag": f'"etag-{self.version}"'}
+
+    def get_object(self, Bucket, Key):
+        self.get_requests += 1
+        version, data = self.version, self.data
+        time.sleep(self.get_delay)
+        return {"ETag": f'"etag-{version}"', "Body": io.BytesIO(data)}
+
+
+@pytest.fixture
+def s3_client():
+    s3_client = FakeS3Client()
+    s3_client.put(pickle.dumps(ConstantModel(1.0)))
+    return s3_client
+
+
+@pytest.fixture
+def cache(s3_client):
+    cache = ModelCache(bucket_name="test-bucket", revalidate_seconds=0, backend="pickle", serve_premium_table=False)
+    s3 = object.__new__(S3Operation)
+    s3.s3_client = s3_client
+    cache._s3 = s3
+    yield cache
+    cache.stop_watcher()
+
+
+def test_unchanged_version_is_not_refetched(cache, s3_client):
+    served = cache.get_served()
+
+    assert [cache.refresh() for _ in range(3)] == [False] * 3
+    assert (s3_client.head_requests, s3_client.get_requests) == (3, 1)
+    assert cache.get_served() is served
+    assert cache.swaps == 0
+
+
+def test_new_version_is_swapped_in_after_warm_up(cache, s3_client):
+    old = cache.get_served()
+    served_during_warm_up = []
+    cache.warm_up_fn = lambda model: served_during_warm_up.append((cache.version, model.value))
+    s3_client.put(pickle.dumps(ConstantModel(2.0)))
+
+    assert cache.refresh()
+
+    # The new model is warmed while the old snapshot still serves
+    assert served_during_warm_up == [('"etag-1"', 2.0)]
+    new = cache.get_served()
+    assert (new.version, new.model.value) == ('"etag-2"', 2.0)
+    assert (old.version, old.model.value) == ('"etag-1"', 1.0)
+    assert cache.swaps == 1 and cache.last_error is None
+
+
+def test_failed_fetch_keeps_serving_the_previous_model(cache, s3_client):
+    served = cache.get_served()
+    s3_client.put(b"not a pickle")
+
+    assert not cache.refresh()
+    assert cache.get_served() is served
+    assert cache.failed_refreshes == 1 and cache.last_error
+
+    # The broken version is not downloaded again, the next upload is
+    assert not cache.refresh()
+    assert s3_client.get_requests == 2
+    s3_client.put(pickle.dumps(ConstantModel(3.0)))
+    assert cache.refresh()
+    assert cache.get_model().value == 3.0 and cache.last_error is None
+
+
+def test_concurrent_refreshes_fetch_once(cache, s3_client):
+    cache.get_served()
+    s3_client.put(pickle.dumps(ConstantModel(2.0)))
+    s3_client.get_delay = 0.2
+
+    threads = [threading.Thread(target=cache.refresh) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert s3_client.get_requests == 2
+    assert cache.swaps == 1
+    assert cache.get_model().value == 2.0
+
+
+def test_watcher_picks_up_a_new_version(cache, s3_client):
+    cache.get_served()
+    cache.start_watcher(interval_seconds=0.01)
+    s3_client.put(pickle.dumps(ConstantModel(2.0)))
+
+    deadline = time.monotonic() + 5
+    while cache.swaps == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert cache.get_model().value == 2.0
+    assert s3_client.get_requests == 2
+
+
+@pytest.fixture
+def count_loads(cache, monkeypatch):
+    calls = []
+    load_model_with_version = cache.s3.load_model_with_version
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return load_model_with_version(*args, **kwargs)
+
+    monkeypatch.setattr(cache.s3, "load_model_with_version", counted)
+    return calls
+
+
+def test_predictions_download_the_model_once(cache, s3_client, count_loads):
+    cost_predictor = CostPredictor(cache=cache)
+    X = pd.DataFrame({"age": [30, 40]})
+
+    predictions = [cost_predictor.predict(X) for _ in range(20)]
+
+    assert len(count_loads) == 1
+    assert s3_client.head_requests == 0
+    np.testing.assert_array_equal(predictions[-1], [1.0, 1.0])
+
+
+def test_stale_model_is_revalidated_without_blocking_predictions(cache, s3_client, count_loads):
+    cost_predictor = CostPredictor(cache=cache)
+    X = pd.DataFrame({"age": [30]})
+    cache.revalidate_seconds = 0.05
+    cost_predictor.predict(X)
+
+    def predict_until(condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            cost_predictor.predict(X)
+            time.sleep(0.01)
+
+    # Unchanged version: HEAD requests only
+    predict_until(lambda: s3_client.head_requests >= 2)
+    assert s3_client.head_requests >= 2 and len(count_loads) == 1
+
+    s3_client.put(pickle.dumps(ConstantModel(2.0)))
+    predict_until(lambda: cache.swaps == 1)
+    assert len(count_loads) == 2
+    np.testing.assert_array_equal(cost_predictor.predict(X), [2.0])
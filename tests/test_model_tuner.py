@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+import insurancePrice.components.model_tuner as model_tuner
+from insurancePrice.components.model_tuner import TuningScheduler, fit_and_score
+from insurancePrice.exception import InsuranceException
+from insurancePrice.utils.main_utils import MainUtils
+
+
+def test_budgets_stop_the_search(tmp_path):
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(150, 3))
+    y = x @ [3.0, -2.0, 1.0] + rng.normal(scale=0.1, size=150)
+    tuning_scheduler = TuningScheduler(
+        {"DecisionTreeRegressor": {"max_depth": [1, 2, 3, 4, 5, 6]}, "ExtraTreeRegressor": {"max_depth": [1, 2]}},
+        search_configs={"DecisionTreeRegressor": {"max_fits": 6}, "ExtraTreeRegressor": {"max_seconds": 0}},
+        cpu_budget=1,
+        cv_folds=3,
+        checkpoint_path=str(tmp_path / "checkpoint.json"),
+    )
+
+    tuned_model_list = tuning_scheduler.tune(x[:120], y[:120], x[120:], y[120:])
+
+    # Two trials of 3 folds fit the fit budget
+    search = tuning_scheduler.searches["DecisionTreeRegressor"]
+    assert search.stopped and search.fits == 6
+    assert [trial["candidate"] for trial in search.trials] == [0, 1]
+    assert tuning_scheduler.report["models"]["DecisionTreeRegressor"]["budget_reached"]
+    # No time to fit anything: the model is left out
+    search = tuning_scheduler.searches["ExtraTreeRegressor"]
+    assert search.stopped and search.fits == 0 and not search.trials
+    assert [model_name for _, _, model_name in tuned_model_list] == ["DecisionTreeRegressor"]
+
+
+def test_refit_params_take_the_mean_rounds_of_the_folds():
+    params = {"max_depth": 4, "n_estimators": 500, "early_stopping_rounds": 20, "early_stopping_fraction": 0.2}
+
+    assert TuningScheduler.get_refit_params(params, [10, 12, 15]) == {"max_depth": 4, "n_estimators": 12}
+    assert TuningScheduler.get_refit_params({"max_depth": 4}, []) is None
+
+
+def test_early_stopping_is_only_accepted_for_xgboost():
+    tuning_scheduler = TuningScheduler({
+        "RandomForestRegressor": {"n_estimators": [50, 100]},
+        "XGBRegressor": {"n_estimators": [100, 200], "max_depth": [4, 5]},
+    })
+
+    with pytest.raises(ValueError, match="RandomForestRegressor"):
+        tuning_scheduler.get_param_grid("RandomForestRegressor", {"early_stopping_rounds": 20})
+    assert tuning_scheduler.get_param_grid("RandomForestRegressor", {}) == {"n_estimators": [50, 100]}
+
+    param_grid = tuning_scheduler.get_param_grid("XGBRegressor", {"early_stopping_rounds": 20})
+    assert param_grid["n_estimators"] == [200] and param_grid["max_depth"] == [4, 5]
+    assert (param_grid["tree_method"], param_grid["early_stopping_rounds"]) == (["hist"], [20])
+
+
+def test_categorical_profile_is_only_accepted_for_xgboost():
+    model_config = {"train_model": {"RandomForestRegressor": {}, "XGBRegressor": {}},
+                    "preprocessing_profile": {"XGBRegressor": "categorical"}}
+    assert MainUtils.get_preprocessing_profiles(model_config) == {
+        "RandomForestRegressor": "onehot", "XGBRegressor": "categorical"
+    }
+
+    for profiles in ({"RandomForestRegressor": "categorical"}, {"XGBRegressor": "target"}):
+        with pytest.raises(InsuranceException):
+            MainUtils.get_preprocessing_profiles({**model_config, "preprocessing_profile": profiles})
+
+
+def test_categorical_profile_marks_the_category_code_columns(categorical_xgboost_cost_model, schema_config):
+    feature_names = categorical_xgboost_cost_model.preprocessing_object.get_feature_names_out()
+
+    profile_params = MainUtils.get_profile_params("categorical", schema_config)
+
+    assert profile_params["enable_categorical"]
+    assert profile_params["feature_types"] == [
+        "c" if name.startswith("OrdinalEncoder__") else "q" for name in feature_names
+    ]
+    assert MainUtils.get_profile_params("onehot", schema_config) == {}
+
+
+def test_categorical_trials_build_categorical_fold_matrices(categorical_xgboost_cost_model, insurance_split,
+                                                            schema_config, monkeypatch):
+    X_train, _, y_train, _ = insurance_split
+    x = categorical_xgboost_cost_model.preprocessing_object.transform(X_train)
+    monkeypatch.setattr(model_tuner, "_worker_x", {"categorical": x})
+    monkeypatch.setattr(model_tuner, "_worker_y", np.asarray(y_train))
+    monkeypatch.setattr(model_tuner, "_worker_fold_matrices", {})
+    fixed_params = MainUtils.get_profile_params("categorical", schema_config)
+    tuning_scheduler = TuningScheduler({"XGBRegressor": {"max_depth": [3]}}, fixed_params={"XGBRegressor": fixed_params},
+                                       model_profiles={"XGBRegressor": "categorical"})
+    param_grid = tuning_scheduler.get_param_grid("XGBRegressor", {"early_stopping_rounds": 5, "max_n_estimators": 50})
+    assert param_grid["feature_types"] == [fixed_params["feature_types"]]
+
+    params = {name: values[0] for name, values in param_grid.items()}
+    result = fit_and_score({"model_name": "XGBRegressor", "candidate": 0, "params": params, "profile": "categorical",
+                            "fold": 0, "train_index": np.arange(800), "test_index": np.arange(800, len(x))})
+
+    assert result["score"] > 0.5 and 1 <= result["n_rounds"] <= 50
+    (dtrain, dstopping, dvalid), = model_tuner._worker_fold_matrices.values()
+    assert dtrain.feature_types == dvalid.feature_types == fixed_params["feature_types"]
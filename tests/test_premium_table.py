@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from insurancePrice.components.premium_table import PremiumLookupTable
+
+
+@pytest.fixture(scope="module")
+def grid_rows(insurance_split):
+    # A corner of the training data keeps the grid, and the test, small
+    X_train, _, _, _ = insurance_split
+    return X_train[X_train["age"].between(30, 34) & X_train["bmi"].between(25, 27)]
+
+
+@pytest.fixture
+def premium_table(cost_model, grid_rows, schema_config):
+    return PremiumLookupTable.build(
+        cost_model,
+        grid_rows,
+        resolution=schema_config["premium_table_resolution"],
+        categorical_columns=schema_config["categorical_columns"],
+        chunk_size=1000,
+    )
+
+
+def test_table_cells_match_cost_model(premium_table, cost_model):
+    grid = premium_table.get_grid_frame(0, premium_table.n_cells)
+
+    assert premium_table.n_cells > 1000
+    np.testing.assert_array_equal(
+        premium_table.table.reshape(-1), np.asarray(cost_model.predict(grid), dtype=np.float32)
+    )
+
+
+def test_lookup_matches_cost_model_on_the_grid(premium_table, cost_model, grid_rows):
+    expected = np.asarray(cost_model.predict(grid_rows), dtype=np.float32)
+
+    premiums, on_grid = premium_table.lookup(grid_rows)
+
+    assert on_grid.all()
+    np.testing.assert_array_equal(premiums, expected)
+
+
+def test_lookup_leaves_rows_off_the_grid_to_the_model(premium_table, grid_rows):
+    row = grid_rows.iloc[0].to_dict()
+    off_grid = [
+        {**row, "age": 99},
+        {**row, "bmi": row["bmi"] + 0.05},
+        {**row, "region": "unknown"},
+        {**row, "children": None},
+    ]
+    X = pd.DataFrame(off_grid, columns=grid_rows.columns)
+
+    premiums, on_grid = premium_table.lookup(X)
+
+    assert not on_grid.any()
+    assert np.isnan(premiums).all()
+
+
+def test_saved_table_is_served_memory_mapped(premium_table, grid_rows, tmp_path):
+    table_file_path, meta_file_path = premium_table.save(str(tmp_path / "table.npy"), str(tmp_path / "meta.json"))
+
+    loaded = PremiumLookupTable.load(table_file_path, meta_file_path)
+
+    assert isinstance(loaded.table, np.memmap)
+    np.testing.assert_array_equal(loaded.lookup(grid_rows)[0], premium_table.lookup(grid_rows)[0])
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from insurancePrice.components.model_cache import ServedModel
+from insurancePrice.components.model_predictor import RequestValidationError, insuranceRequestDecoder
+
+
+RECORD = {"age": 31, "sex": "female", "bmi": 25.7, "children": 0, "smoker": "no", "region": "southeast"}
+
+
+@pytest.fixture(scope="module")
+def decoder():
+    return insuranceRequestDecoder()
+
+
+def get_errors(decode, payload):
+    with pytest.raises(RequestValidationError) as error:
+        decode(payload)
+    return {error["field"]: error for error in error.value.errors}
+
+
+def test_form_strings_are_parsed_once(decoder):
+    batch = decoder.decode_record({column: str(value) for column, value in RECORD.items()})
+
+    assert batch.n_rows == 1
+    assert {column: values.tolist() for column, values in batch.numerical.items()} == {
+        "age": [31.0], "bmi": [25.7], "children": [0.0]
+    }
+    assert batch.get_codes(decoder.categories)["region"].tolist() == [2]
+
+
+@pytest.mark.parametrize("field, value", [
+    ("age", "thirty"),
+    ("age", None),
+    ("bmi", ""),
+    ("children", 1.5),
+    ("children", [1]),
+    ("smoker", True),
+])
+def test_bad_types_are_rejected(decoder, field, value):
+    errors = get_errors(decoder.decode_record, {**RECORD, field: value})
+
+    assert list(errors) == [field]
+
+
+def test_categories_outside_the_domain_are_rejected(decoder):
+    errors = get_errors(decoder.decode_record, {**RECORD, "region": "north", "sex": "Female"})
+
+    assert errors["region"]["error"] == "expected one of ['northeast', 'northwest', 'southeast', 'southwest']"
+    assert errors["sex"]["error"] == "expected one of ['female', 'male']"
+
+
+def test_request_limits_are_enforced(decoder):
+    # Outside the training domain but inside request_limits is accepted
+    decoder.decode_record({**RECORD, "age": 90, "bmi": 70.0, "children": 12})
+
+    errors = get_errors(decoder.decode_record, {**RECORD, "age": 121, "bmi": 9.9, "children": -1})
+
+    assert errors["age"]["error"] == "expected an integer between 0 and 120"
+    assert errors["bmi"]["error"] == "expected a number between 10 and 100"
+    assert errors["children"]["error"] == "expected an integer between 0 and 20"
+
+
+def test_batches_name_the_failing_rows(decoder):
+    records = [dict(RECORD) for _ in range(5)]
+    records[1]["age"] = "n/a"
+    records[3]["age"] = 200
+    records[4]["smoker"] = "sometimes"
+
+    errors = get_errors(decoder.decode_records, records)
+
+    assert errors["age"]["rows"] == [1, 3]
+    assert errors["smoker"]["rows"] == [4]
+    assert decoder.decode_records(records[:1]).n_rows == 1
+
+
+@pytest.mark.parametrize("records", [[], {"age": 31}, [RECORD, "not a record"]])
+def test_malformed_batches_are_rejected(decoder, records):
+    with pytest.raises(ValueError):
+        decoder.decode_records(records)
+
+
+@pytest.fixture
+def client(random_forest_cost_model):
+    from fastapi.testclient import TestClient
+    import app
+
+    app.model_cache._served = ServedModel(model=random_forest_cost_model, version="test")
+    yield TestClient(app.app)
+    app.model_cache._served = None
+
+
+def test_predict_rejects_invalid_forms_with_422(client):
+    response = client.post("/predict", data={**RECORD, "age": "abc", "region": "north"})
+
+    assert response.status_code == 422
+    body = response.json()
+    assert body["status"] is False
+    assert [error["field"] for error in body["errors"]] == ["age", "region"]
+
+
+def test_predict_batch_rejects_invalid_records_with_422(client):
+    response = client.post("/predict/batch", json={"records": [RECORD, {**RECORD, "bmi": 500}]})
+
+    assert response.status_code == 422
+    assert response.json()["errors"] == [
+        {"field": "bmi", "error": "expected a number between 10 and 100", "rows": [1]}
+    ]
+
+    response = client.post("/predict/batch", json=[])
+    assert response.status_code == 422
+    assert response.json() == {"status": False, "error": "Expected a non empty list of records"}
+
+
+def test_predict_batch_scores_valid_records(client, random_forest_cost_model):
+    response = client.post("/predict/batch", json={"records": [RECORD, {**RECORD, "smoker": "yes"}]})
+
+    assert response.status_code == 200
+    expected = random_forest_cost_model.predict(pd.DataFrame([RECORD, {**RECORD, "smoker": "yes"}])).round(2)
+    np.testing.assert_allclose(response.json()["predictions"], expected)
@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+
+from insurancePrice.components.search_strategy import (GridSearch, RandomSearch, SearchStrategy, SequentialModelSearch,
+                                                       SuccessiveHalving, get_search_strategy)
+
+
+PARAM_GRID = {"max_depth": [1, 2, 3], "learning_rate": [0.1, 0.2, 0.3], "n_estimators": [30, 90]}
+
+
+def run_rung(strategy, score_fn):
+    trials = strategy.ask(100)
+    for trial in trials:
+        strategy.tell(trial, score_fn(trial))
+    return trials
+
+
+def test_halving_promotes_the_best_third_of_every_rung():
+    strategy = get_search_strategy(PARAM_GRID, {"strategy": "halving", "factor": 3}, max_rows=1000)
+    # The deepest trees win, the highest learning rate breaks the tie: candidates are ordered (learning_rate, max_depth)
+    score = lambda trial: trial["params"]["max_depth"] + trial["params"]["learning_rate"]
+
+    rung_0 = run_rung(strategy, score)
+    assert isinstance(strategy, SuccessiveHalving)
+    assert len(rung_0) == 9
+    assert {trial["params"]["n_estimators"] for trial in rung_0} == {10}
+
+    rung_1 = run_rung(strategy, score)
+    assert sorted(trial["candidate"] for trial in rung_1) == [2, 5, 8]
+    assert {(trial["rung"], trial["params"]["n_estimators"]) for trial in rung_1} == {(1, 30)}
+    assert not strategy.finished
+
+    rung_2 = run_rung(strategy, score)
+    assert [(trial["candidate"], trial["params"]["n_estimators"]) for trial in rung_2] == [(8, 90)]
+    assert strategy.finished
+    assert strategy.ask(100) == []
+
+
+def test_halving_waits_for_every_score_of_the_rung():
+    strategy = SuccessiveHalving(PARAM_GRID, {"factor": 3}, max_rows=1000)
+    trials = strategy.ask(100)
+
+    for trial in trials[:-1]:
+        strategy.tell(trial, 1.0)
+    assert strategy.rung == 0 and strategy.ask(100) == []
+
+    # A late score of an earlier rung is ignored
+    strategy.tell(trials[-1], 0.0)
+    strategy.tell({**trials[0], "rung": -1}, 100.0)
+    assert strategy.rung == 1
+    assert len(strategy.ask(100)) == 3
+
+
+def test_halving_ranks_failed_fits_last():
+    strategy = SuccessiveHalving(PARAM_GRID, {"factor": 3}, max_rows=1000)
+
+    run_rung(strategy, lambda trial: np.nan if trial["candidate"] < 6 else -float(trial["candidate"]))
+
+    assert strategy.alive == [6, 7, 8]
+
+
+def test_halving_on_rows():
+    strategy = SuccessiveHalving({"max_depth": [1, 2, 3, 4]}, {"resource": "n_samples", "factor": 2}, max_rows=800)
+    score = lambda trial: trial["params"]["max_depth"]
+
+    rungs = []
+    while not strategy.finished:
+        rungs.append(run_rung(strategy, score))
+
+    assert [[(trial["candidate"], trial["n_samples"]) for trial in rung] for rung in rungs] == [
+        [(0, 200), (1, 200), (2, 200), (3, 200)],
+        [(2, 400), (3, 400)],
+        [(3, 800)],
+    ]
+    assert "n_samples" not in rungs[-1][0]["params"]
+    assert strategy.get_final_params({"max_depth": 4}) == {"max_depth": 4}
+
+
+def test_random_search_draws_n_iter_grid_points_once():
+    strategy = get_search_strategy(PARAM_GRID, {"strategy": "random", "n_iter": 5, "random_state": 1}, max_rows=1000)
+
+    trials = strategy.ask(2)
+    assert isinstance(strategy, RandomSearch) and not strategy.finished
+    trials += strategy.ask(100)
+
+    assert strategy.finished and strategy.ask(100) == []
+    candidates = [trial["candidate"] for trial in trials]
+    assert len(set(candidates)) == 5
+    # The longest fits go first
+    n_estimators = [trial["params"]["n_estimators"] for trial in trials]
+    assert n_estimators == sorted(n_estimators, reverse=True)
+    # Same random_state, same draw
+    same_draw = RandomSearch(PARAM_GRID, {"n_iter": 5, "random_state": 1}, max_rows=1000).ask(100)
+    assert [trial["candidate"] for trial in same_draw] == candidates
+
+
+def test_prioritized_grid_points_are_asked_first():
+    strategy = GridSearch(PARAM_GRID, {}, max_rows=1000)
+    previous_best = [{"max_depth": 2, "learning_rate": 0.1, "n_estimators": 30},
+                     {"max_depth": 3, "learning_rate": 0.3, "n_estimators": 30}]
+
+    strategy.prioritize(previous_best)
+
+    assert [trial["params"] for trial in strategy.ask(2)] == previous_best
+    assert len(strategy.ask(100)) == 16
+
+    # A random search only reorders the grid points it drew
+    strategy = RandomSearch(PARAM_GRID, {"n_iter": 4}, max_rows=1000)
+    last = strategy.queue[-1]["params"]
+    strategy.prioritize([last, {"max_depth": 99}])
+    assert strategy.ask(1)[0]["params"] == last
+
+
+def test_bayesian_search_asks_the_highest_upper_bounds_after_the_initial_points():
+    strategy = get_search_strategy(PARAM_GRID, {"strategy": "bayesian", "n_iter": 7, "n_initial": 3}, max_rows=1000)
+    assert isinstance(strategy, SequentialModelSearch)
+
+    initial = strategy.ask(100)
+    assert len(initial) == 3
+    # Nothing to fit the surrogate on yet
+    assert strategy.ask(100) == []
+
+    for trial in initial:
+        strategy.tell(trial, trial["params"]["max_depth"])
+    remaining = [candidate for candidate in range(18) if candidate not in strategy.proposed]
+    upper_bounds = np.arange(len(remaining), dtype=float)
+    strategy.get_upper_bounds = lambda candidates: upper_bounds[:len(candidates)]
+
+    assert [trial["candidate"] for trial in strategy.ask(2)] == remaining[::-1][:2]
+    assert len(strategy.ask(100)) == 2
+    assert strategy.finished and strategy.ask(100) == []
+    assert len(set(strategy.proposed)) == 7
+
+
+def test_bayesian_surrogate_prefers_the_better_region():
+    strategy = SequentialModelSearch({"max_depth": list(range(1, 11))}, {"n_iter": 10, "n_initial": 4}, max_rows=1000)
+    for trial in strategy.ask(100):
+        strategy.tell(trial, float(trial["params"]["max_depth"]))
+
+    upper_bounds = strategy.get_upper_bounds(list(range(10)))
+
+    # Deeper trees scored better
+    assert upper_bounds[-1] > upper_bounds[0]
+
+
+def test_bayesian_search_starts_from_the_prioritized_points():
+    strategy = SequentialModelSearch(PARAM_GRID, {"n_iter": 6, "n_initial": 3}, max_rows=1000)
+    strategy.prioritize([{"max_depth": 3, "learning_rate": 0.3, "n_estimators": 90}])
+
+    trials = strategy.ask(100)
+
+    assert trials[0]["params"] == {"max_depth": 3, "learning_rate": 0.3, "n_estimators": 90}
+    assert len({trial["candidate"] for trial in trials}) == 3
+
+
+def test_search_strategy_needs_ask():
+    class NoAsk(SearchStrategy):
+        pass
+
+    with pytest.raises(TypeError):
+        NoAsk(PARAM_GRID, {}, max_rows=1000)
+
+    with pytest.raises(ValueError, match="Unknown search strategy"):
+        get_search_strategy(PARAM_GRID, {"strategy": "annealing"}, max_rows=1000)
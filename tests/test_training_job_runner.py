@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+import pytest
+
+from insurancePrice.pipeline.training_job_runner import TrainingJobRunner
+
+
+# Job targets run in a spawned process, so they live at module level
+
+
+def quick_job(job_id, artifacts_dir, events):
+    events.put((job_id, "status", "running", None, time.time()))
+    for stage in ("data_ingestion", "model_trainer"):
+        events.put((job_id, "stage", stage, "running", time.time()))
+        events.put((job_id, "stage", stage, "completed", time.time()))
+    events.put((job_id, "status", "succeeded", None, time.time()))
+
+
+def failing_job(job_id, artifacts_dir, events):
+    events.put((job_id, "status", "running", None, time.time()))
+    events.put((job_id, "stage", "data_ingestion", "running", time.time()))
+    events.put((job_id, "status", "failed", "no data", time.time()))
+
+
+def get_pids_path(job_id):
+    return os.path.join(tempfile.gettempdir(), f"{job_id}.pids")
+
+
+def job_with_workers(job_id, artifacts_dir, events):
+    # Stands in for the tuning pool: workers that outlive the job unless their process group is killed
+    events.put((job_id, "status", "running", None, time.time()))
+    events.put((job_id, "stage", "model_trainer", "running", time.time()))
+    workers = [multiprocessing.get_context("spawn").Process(target=time.sleep, args=(120,)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    with open(get_pids_path(job_id) + ".tmp", "w") as file_obj:
+        file_obj.write(" ".join(str(worker.pid) for worker in workers))
+    os.replace(get_pids_path(job_id) + ".tmp", get_pids_path(job_id))
+    time.sleep(120)
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def is_running(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as file_obj:
+            # Killed orphans may linger as zombies until init reaps them
+            return file_obj.read().rsplit(")", 1)[1].split()[0] not in ("Z", "X")
+    except FileNotFoundError:
+        return False
+
+
+@pytest.fixture
+def make_runner():
+    runners = []
+
+    def make_runner(job_target):
+        runner = TrainingJobRunner(max_concurrent_jobs=1, job_target=job_target)
+        runners.append(runner)
+        return runner
+
+    yield make_runner
+    for runner in runners:
+        runner.shutdown()
+
+
+def test_job_status_follows_the_worker_events(make_runner):
+    runner = make_runner(quick_job)
+
+    job = runner.submit()
+
+    assert job.status == "queued" and runner.list() == [job]
+    assert wait_for(lambda: job.status == "succeeded")
+    assert job.submitted_at <= job.started_at <= job.finished_at and job.error is None
+    assert {stage: status["status"] for stage, status in job.stages.items()} == {
+        "data_ingestion": "completed", "model_trainer": "completed"
+    }
+    assert runner.get(job.job_id) is job and runner.get("unknown") is None
+
+
+def test_failed_job_reports_the_error(make_runner):
+    runner = make_runner(failing_job)
+
+    job = runner.submit()
+
+    assert wait_for(lambda: job.status == "failed")
+    assert job.error == "no data"
+    assert job.stages["data_ingestion"]["status"] == "failed"
+
+
+def test_second_job_is_rejected_while_one_is_active(make_runner):
+    runner = make_runner(job_with_workers)
+    job = runner.submit()
+
+    with pytest.raises(RuntimeError, match=job.job_id):
+        runner.submit()
+
+    runner.cancel(job.job_id)
+    assert runner.submit().job_id != job.job_id
+
+
+@pytest.mark.skipif(not hasattr(os, "killpg") or not os.path.isdir("/proc"), reason="needs process groups and /proc")
+def test_cancel_kills_the_processes_the_job_spawned(make_runner):
+    runner = make_runner(job_with_workers)
+    job = runner.submit()
+    pids_path = get_pids_path(job.job_id)
+    assert wait_for(lambda: os.path.exists(pids_path))
+    with open(pids_path) as file_obj:
+        worker_pids = [int(pid) for pid in file_obj.read().split()]
+    os.remove(pids_path)
+    assert all(is_running(pid) for pid in worker_pids)
+
+    runner.cancel(job.job_id)
+
+    assert job.status == "cancelled" and job.finished_at is not None
+    assert job.stages["model_trainer"]["status"] == "cancelled"
+    assert wait_for(lambda: not any(is_running(pid) for pid in worker_pids), timeout=10)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from insurancePrice.components.tree_ensemble import FlatCostModel
+from insurancePrice.constants import FLAT_MODEL_TOLERANCE
+from insurancePrice.exception import InsuranceException
+
+
+def test_flat_model_matches_cost_model(cost_model, insurance_split):
+    X_train, X_test, _, _ = insurance_split
+    flat_model = FlatCostModel.from_cost_model(cost_model)
+
+    for X in (X_train, X_test):
+        assert flat_model.verify(cost_model, X, rtol=FLAT_MODEL_TOLERANCE) == 0.0
+        np.testing.assert_allclose(flat_model.predict(X), cost_model.predict(X), rtol=FLAT_MODEL_TOLERANCE)
+
+    records = X_test.head(20).to_dict(orient="records")
+    np.testing.assert_allclose(
+        [flat_model.predict_record(record) for record in records],
+        [cost_model.predict_record(record) for record in records],
+        rtol=FLAT_MODEL_TOLERANCE,
+    )
+
+
+def test_flat_model_round_trips_through_bytes(cost_model, insurance_split, tmp_path):
+    _, X_test, _, _ = insurance_split
+    flat_model = FlatCostModel.from_cost_model(cost_model)
+
+    loaded = FlatCostModel.from_bytes(flat_model.to_bytes())
+    mapped = FlatCostModel.from_bytes(flat_model.to_bytes()).to_mmap(str(tmp_path))
+
+    np.testing.assert_array_equal(loaded.predict(X_test), flat_model.predict(X_test))
+    np.testing.assert_array_equal(mapped.predict(X_test), flat_model.predict(X_test))
+
+
+def test_categorical_splits_are_not_flattened(categorical_xgboost_cost_model):
+    with pytest.raises(InsuranceException):
+        FlatCostModel.from_cost_model(categorical_xgboost_cost_model)